@@ -220,7 +220,6 @@ class Artifact:
         size = 0
 
         filesvdir = None
-        buildtreevdir = None
 
         artifact = ArtifactProto()
 
@@ -303,9 +302,7 @@ class Artifact:
 
         # Store build tree
         if sandbox_build_dir is not None:
-            buildtreevdir = CasBasedDirectory(cas_cache=self._cas)
-            buildtreevdir._import_files_internal(sandbox_build_dir, properties=properties, collect_result=False)
-            artifact.buildtree.CopyFrom(buildtreevdir._get_digest())
+            artifact.buildtree.CopyFrom(self._capture_directory(sandbox_build_dir, properties=properties))
 
         # Store sources
         if sourcesvdir is not None:
@@ -313,16 +310,15 @@ class Artifact:
 
         # Store build root
         if buildrootvdir is not None:
-            rootvdir = CasBasedDirectory(cas_cache=self._cas)
-            rootvdir._import_files_internal(buildrootvdir, properties=properties, collect_result=False)
-            artifact.buildroot.CopyFrom(rootvdir._get_digest())
+            artifact.buildroot.CopyFrom(self._capture_directory(buildrootvdir, properties=properties))
 
         os.makedirs(os.path.dirname(os.path.join(self._artifactdir, element.get_artifact_name())), exist_ok=True)
         keys = utils._deduplicate([self._cache_key, self._weak_cache_key])
         for key in keys:
-            path = os.path.join(self._artifactdir, element.get_artifact_name(key=key))
-            with utils.save_file_atomic(path, mode="wb") as f:
+            ref = element.get_artifact_name(key=key)
+            with utils.save_file_atomic(os.path.join(self._artifactdir, ref), mode="wb") as f:
                 f.write(artifact.SerializeToString())
+            self._context.artifactcache.record_ref(ref)
 
     # cached_buildroot()
     #
@@ -689,7 +685,8 @@ class Artifact:
     def _load_proto(self):
         key = self.get_extract_key()
 
-        proto_path = os.path.join(self._artifactdir, self._element.get_artifact_name(key=key))
+        ref = self._element.get_artifact_name(key=key)
+        proto_path = os.path.join(self._artifactdir, ref)
         artifact = ArtifactProto()
         try:
             with open(proto_path, mode="r+b") as f:
@@ -697,7 +694,9 @@ class Artifact:
         except FileNotFoundError:
             return None
 
+        # Mark the artifact as recently used, for the LRU order
         os.utime(proto_path)
+        self._context.artifactcache.touch_ref(ref)
 
         return artifact
 
@@ -709,6 +708,33 @@ class Artifact:
     def _get_proto(self):
         return self._proto
 
+    # _capture_directory()
+    #
+    # Capture a directory for storing in the artifact.
+    #
+    # Sandbox directories are CAS-based, subtrees which were not modified
+    # since they were staged, as well as the build output, are already
+    # known by digest. In this case the directory is referenced by digest
+    # instead of importing it again, such that only modified directories
+    # need to be serialized. The node properties the sandbox sets on the
+    # directory itself, such as SubtreeReadOnly, are not captured, as
+    # importing the directory would not capture them either.
+    #
+    # Args:
+    #     vdir (Directory): The directory to capture
+    #     properties (list): The node properties to capture
+    #
+    # Returns:
+    #     (Digest): The digest of the captured directory
+    #
+    def _capture_directory(self, vdir, *, properties):
+        if isinstance(vdir, CasBasedDirectory):
+            return vdir._get_digest_without_properties()
+
+        capturevdir = CasBasedDirectory(cas_cache=self._cas)
+        capturevdir._import_files_internal(vdir, properties=properties, collect_result=False)
+        return capturevdir._get_digest()
+
     # _get_field_digest()
     #
     # Returns:
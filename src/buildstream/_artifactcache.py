@@ -19,6 +19,7 @@ import os
 from ._assetcache import AssetCache
 from ._cas.casremote import BlobNotFound
 from ._exceptions import ArtifactError, AssetCacheError, CASError, CASRemoteError
+from ._refindex import RefIndex
 from ._protos.buildstream.v2 import artifact_pb2
 
 from . import utils
@@ -38,6 +39,7 @@ class ArtifactCache(AssetCache):
         # create artifact directory
         self._basedir = context.artifactdir
         os.makedirs(self._basedir, exist_ok=True)
+        self._ref_index = RefIndex(self._basedir)
 
     # preflight():
     #
@@ -73,7 +75,7 @@ class ArtifactCache(AssetCache):
     #     ([str]) - A list of artifact names as generated in LRU order
     #
     def list_artifacts(self, *, glob=None):
-        return [ref for _, ref in sorted(list(self.list_refs_mtimes(self._basedir, glob_expr=glob)))]
+        return [ref for _, ref in sorted(self._ref_index.list_refs_mtimes(glob_expr=glob))]
 
     # remove():
     #
@@ -237,6 +239,7 @@ class ArtifactCache(AssetCache):
             return
 
         utils.safe_link(os.path.join(self._basedir, oldref), os.path.join(self._basedir, newref))
+        self.record_ref(newref)
 
     # fetch_missing_blobs():
     #
@@ -462,6 +465,7 @@ class ArtifactCache(AssetCache):
             os.makedirs(os.path.dirname(artifact_path), exist_ok=True)
             with utils.save_file_atomic(artifact_path, mode="wb") as f:
                 f.write(artifact.SerializeToString())
+            self.record_ref(artifact_name)
 
             if str(artifact.files):
                 self.cas._fetch_directory(remote, artifact.files)
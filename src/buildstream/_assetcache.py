@@ -14,9 +14,10 @@
 #  Authors:
 #        Raoul Hidalgo Charman <raoul.hidalgocharman@codethink.co.uk>
 #
+import concurrent.futures
 import os
 import re
-from typing import List, Dict, Tuple, Iterable, Optional
+from typing import List, Dict, Tuple, Iterable, Optional, Set
 import grpc
 
 from . import utils
@@ -24,6 +25,7 @@ from ._cas import CASRemote, CASCache, CASDProcessManager
 from ._exceptions import AssetCacheError, RemoteError
 from ._remotespec import RemoteSpec, RemoteType
 from ._remote import BaseRemote
+from ._refindex import RefIndex
 from ._protos.build.bazel.remote.asset.v1 import remote_asset_pb2, remote_asset_pb2_grpc
 from ._protos.build.buildgrid import local_cas_pb2
 from ._protos.google.rpc import code_pb2
@@ -314,14 +316,25 @@ class AssetCache:
         self._has_fetch_remotes: bool = False
         self._has_push_remotes: bool = False
 
+        # Results of remote asset lookups done ahead of time, by remote, uri and
+        # whether a directory was looked up. Misses are recorded as None.
+        self._resolved_assets: Dict[Tuple[AssetRemote, str, bool], object] = {}
+
         self._basedir = None
 
+        # Index of the refs in _basedir, if maintained by the subclass
+        self._ref_index: Optional[RefIndex] = None
+
     # release_resources():
     #
     # Release resources used by AssetCache.
     #
     def release_resources(self):
 
+        # Record the refs used in this session in the index
+        if self._ref_index:
+            self._ref_index.flush()
+
         # Close all remotes and their gRPC channels
         for remote in self._remotes.values():
             if remote.index:
@@ -399,6 +412,86 @@ class AssetCache:
 
         return index_remotes, storage_remotes
 
+    # resolve_assets():
+    #
+    # Look up assets on the index remotes of their projects ahead of time,
+    # issuing the lookups concurrently.
+    #
+    # The results are recorded, such that the next fetch_asset() call for
+    # an asset does not need a round trip to the remote. Lookups which fail
+    # are not recorded, they are retried when fetching the asset.
+    #
+    # Args:
+    #    lookups: The (project name, uri) pairs to look up
+    #    directory: Whether to look up directories rather than blobs
+    #    max_workers: The maximum number of concurrent lookups
+    #
+    # Returns:
+    #    The uris which were found on at least one remote
+    #
+    def resolve_assets(
+        self, lookups: Iterable[Tuple[str, str]], *, directory: bool = False, max_workers: int = 8
+    ) -> Set[str]:
+        keys = {}
+        for project_name, uri in lookups:
+            index_remotes, _ = self.get_remotes(project_name, False)
+            for remote in index_remotes:
+                keys[(remote, uri, directory)] = None
+
+        found = {uri for (_, uri, _), response in self._resolved_assets.items() if response is not None}
+
+        keys = [key for key in keys if key not in self._resolved_assets]
+        if not keys:
+            return found
+
+        # Initialize the remotes here rather than concurrently in the lookups
+        for remote in {remote for remote, _, _ in keys}:
+            remote.init()
+
+        with concurrent.futures.ThreadPoolExecutor(max_workers=max_workers) as executor:
+            futures = {executor.submit(self._fetch_asset_from_remote, *key): key for key in keys}
+            for future in concurrent.futures.as_completed(futures):
+                key = futures[future]
+                try:
+                    response = future.result()
+                except AssetCacheError:
+                    continue
+
+                self._resolved_assets[key] = response
+                if response is not None:
+                    found.add(key[1])
+
+        return found
+
+    # fetch_asset():
+    #
+    # Fetch an asset from an index remote, using the result of an earlier
+    # resolve_assets() call if there is one.
+    #
+    # Each recorded result is only used once, such that assets which are
+    # pushed later in the session are not reported missing.
+    #
+    # Args:
+    #    remote: The index remote
+    #    uri: The uri of the asset
+    #    directory: Whether to fetch a directory rather than a blob
+    #
+    # Returns:
+    #    The FetchBlobResponse or FetchDirectoryResponse, or None if the
+    #    asset is not available
+    #
+    # Raises:
+    #    AssetCacheError: If the lookup fails
+    #
+    def fetch_asset(self, remote: AssetRemote, uri: str, *, directory: bool = False):
+        key = (remote, uri, directory)
+        try:
+            return self._resolved_assets.pop(key)
+        except KeyError:
+            pass
+
+        return self._fetch_asset_from_remote(*key)
+
     # has_fetch_remotes():
     #
     # Check whether any remote repositories are available for fetching.
@@ -445,6 +538,11 @@ class AssetCache:
             # Check whether the specified element's project has fetch remotes
             return bool(index_remotes and storage_remotes)
 
+    def _fetch_asset_from_remote(self, remote, uri, directory):
+        if directory:
+            return remote.fetch_directory([uri])
+        return remote.fetch_blob([uri])
+
     # list_refs_mtimes()
     #
     # List refs in a directory, given a base path. Also returns the
@@ -497,6 +595,39 @@ class AssetCache:
         try:
             utils._remove_path_with_parents(self._basedir, ref)
         except FileNotFoundError as e:
+            # The index is out of date if it still lists the ref
+            if self._ref_index:
+                self._ref_index.remove(ref)
             raise AssetCacheError("Could not find ref '{}'".format(ref)) from e
         except OSError as e:
             raise AssetCacheError("System error while removing ref '{}': {}".format(ref, e)) from e
+
+        if self._ref_index:
+            self._ref_index.remove(ref)
+
+    # record_ref()
+    #
+    # Records that a ref was written, in the index of refs if one is
+    # maintained.
+    #
+    # Args:
+    #    ref (str): The ref which was written
+    #
+    def record_ref(self, ref):
+        if self._ref_index:
+            self._ref_index.add(ref)
+
+    # touch_ref()
+    #
+    # Records that a ref was used such that its modification time was
+    # updated, in the index of refs if one is maintained.
+    #
+    # Uses are batched in memory, and only recorded in the index when refs
+    # are listed or resources are released.
+    #
+    # Args:
+    #    ref (str): The ref which was used
+    #
+    def touch_ref(self, ref):
+        if self._ref_index:
+            self._ref_index.touch(ref)
@@ -19,6 +19,7 @@ import os
 import stat
 import contextlib
 import time
+from collections import OrderedDict
 from typing import Optional, List
 import threading
 
@@ -33,6 +34,7 @@ from ..types import FastEnum, SourceRef
 from .._exceptions import CASCacheError
 
 from .casremote import CASRemote, _CASBatchRead, _CASBatchUpdate, BlobNotFound
+from .casstatcache import CASStatCache
 
 _BUFFER_SIZE = 65536
 
@@ -40,6 +42,12 @@ _BUFFER_SIZE = 65536
 # Refresh interval for disk usage of local cache in seconds
 _CACHE_USAGE_REFRESH = 5
 
+# Number of unused staged trees to keep alive for reuse
+_STAGED_TREE_CACHE_SIZE = 8
+
+# Time after which unused staged trees are released, in seconds
+_STAGED_TREE_IDLE_TIMEOUT = 60
+
 
 class CASLogLevel(FastEnum):
     WARNING = "warning"
@@ -65,6 +73,11 @@ class CASCache:
 
         self._remote_cache = remote_cache
 
+        # Bytes of blobs fetched from and uploaded to remotes
+        self._fetched_bytes = 0
+        self._uploaded_bytes = 0
+        self._transfer_lock = threading.Lock()
+
         self._casd = casd
         if casd:
             self._cache_usage_monitor = _CASCacheUsageMonitor(self._casd)
@@ -75,6 +88,9 @@ class CASCache:
         self._default_remote = CASRemote(None, self)
         self._default_remote.init()
 
+        self._staged_trees = _StagedTreeCache(self, _STAGED_TREE_CACHE_SIZE, _STAGED_TREE_IDLE_TIMEOUT)
+        self._stat_cache = CASStatCache(self, os.path.join(path, "stat-cache"))
+
     # get_cas():
     #
     # Return ContentAddressableStorage stub for buildbox-casd channel.
@@ -104,6 +120,8 @@ class CASCache:
     # Release resources used by CASCache.
     #
     def release_resources(self):
+        self._staged_trees.clear()
+
         if self._cache_usage_monitor:
             self._cache_usage_monitor.stop()
             self._cache_usage_monitor.join()
@@ -300,19 +318,20 @@ class CASCache:
     #     path (str): Path to file to add
     #     buffer (bytes): Byte buffer to add
     #     instance_name (str): casd instance_name for remote CAS
+    #     move_files (bool): Whether the file may be moved into CAS, see add_objects()
     #
     # Returns:
     #     (Digest): The digest of the added object
     #
     # Either `path` or `buffer` must be passed, but not both.
     #
-    def add_object(self, *, path=None, buffer=None, instance_name=None):
+    def add_object(self, *, path=None, buffer=None, instance_name=None, move_files=False):
         # Exactly one of the two parameters has to be specified
         assert (path is None) != (buffer is None)
         if path is None:
             digests = self.add_objects(buffers=[buffer], instance_name=instance_name)
         else:
-            digests = self.add_objects(paths=[path], instance_name=instance_name)
+            digests = self.add_objects(paths=[path], instance_name=instance_name, move_files=move_files)
         assert len(digests) == 1
         return digests[0]
 
@@ -324,13 +343,16 @@ class CASCache:
     #     paths (List[str]): Paths to files to add
     #     buffers (List[bytes]): Byte buffers to add
     #     instance_name (str): casd instance_name for remote CAS
+    #     move_files (bool): Whether the files may be moved into CAS instead of
+    #                        being copied, in which case they may no longer exist
+    #                        and must not be modified afterwards
     #
     # Returns:
     #     (List[Digest]): The digests of the added objects
     #
     # Either `paths` or `buffers` must be passed, but not both.
     #
-    def add_objects(self, *, paths=None, buffers=None, instance_name=None):
+    def add_objects(self, *, paths=None, buffers=None, instance_name=None, move_files=False):
         # Exactly one of the two parameters has to be specified
         assert (paths is None) != (buffers is None)
 
@@ -348,6 +370,7 @@ class CASCache:
             request = local_cas_pb2.CaptureFilesRequest()
             if instance_name:
                 request.instance_name = instance_name
+            request.move_files = move_files
 
             for path in paths:
                 request.path.append(path)
@@ -377,38 +400,26 @@ class CASCache:
     #
     # Import directory tree into CAS.
     #
+    # With `use_stat_cache`, the digests of files and directories are
+    # remembered along with their status, such that importing the same
+    # directory again only reads the files which were modified since.
+    # This is meant for local directories which are imported repeatedly.
+    #
     # Args:
     #     path (str): Path to directory to import
     #     properties Optional[List[str]]: List of properties to request
+    #     use_stat_cache (bool): Whether to use the persistent stat cache
     #
     # Returns:
     #     (Digest): The digest of the imported directory
     #
-    def import_directory(self, path: str, properties: Optional[List[str]] = None) -> SourceRef:
-        local_cas = self.get_local_cas()
-
-        request = local_cas_pb2.CaptureTreeRequest()
-        request.path.append(path)
-
-        if properties:
-            for _property in properties:
-                request.node_properties.append(_property)
+    def import_directory(
+        self, path: str, properties: Optional[List[str]] = None, *, use_stat_cache: bool = False
+    ) -> SourceRef:
+        if use_stat_cache:
+            return self._stat_cache.import_directory(path, properties)
 
-        response = local_cas.CaptureTree(request)
-
-        if len(response.responses) != 1:
-            raise CASCacheError("Expected 1 response from CaptureTree, got {}".format(len(response.responses)))
-
-        tree_response = response.responses[0]
-        if tree_response.status.code == code_pb2.RESOURCE_EXHAUSTED:
-            raise CASCacheError("Cache too full", reason="cache-too-full")
-        if tree_response.status.code != code_pb2.OK:
-            raise CASCacheError("Failed to capture tree {}: {}".format(path, tree_response.status))
-
-        treepath = self.objpath(tree_response.tree_digest)
-        tree = remote_execution_pb2.Tree()
-        with open(treepath, "rb") as f:
-            tree.ParseFromString(f.read())
+        tree = self._capture_tree(path, properties)
 
         root_directory = tree.root.SerializeToString()
 
@@ -423,14 +434,29 @@ class CASCache:
     # depending on the system. The implementation makes sure that BuildStream
     # and subprocesses cannot corrupt the cache by modifying staged files.
     #
+    # When `reuse` is specified, the staged tree is kept for a while after
+    # it was used, and handed out to the next caller staging the same digest
+    # with `reuse` instead of asking buildbox-casd to stage it again. Staged
+    # trees are only used by one caller at a time, and are not reused if
+    # the caller modified them.
+    #
     # Args:
     #     directory_digest (Digest): The digest of a directory
+    #     reuse (bool): Whether to reuse a previously staged tree
     #
     # Yields:
     #     (str): The local filesystem path
     #
     @contextlib.contextmanager
-    def stage_directory(self, directory_digest):
+    def stage_directory(self, directory_digest, *, reuse=False):
+        if reuse:
+            staged_tree = self._staged_trees.acquire(directory_digest)
+            try:
+                yield staged_tree.path
+            finally:
+                self._staged_trees.release(staged_tree)
+            return
+
         local_cas = self.get_local_cas()
 
         request = local_cas_pb2.StageTreeRequest()
@@ -455,10 +481,11 @@ class CASCache:
         try:
             # Read primary response and yield staging location
             response = next(response_stream)
-            yield response.path
-
-            # Staged tree is no longer needed
-            done_event.set()
+            try:
+                yield response.path
+            finally:
+                # Staged tree is no longer needed
+                done_event.set()
             # Wait for cleanup to complete
             next(response_stream)
         except StopIteration as e:
@@ -569,6 +596,45 @@ class CASCache:
             os.chmod(f.name, stat.S_IRUSR | stat.S_IWUSR | stat.S_IRGRP | stat.S_IROTH)
             yield f
 
+    # _capture_tree():
+    #
+    # Capture a directory tree with buildbox-casd.
+    #
+    # Args:
+    #     path (str): Path to directory to capture
+    #     properties Optional[List[str]]: List of properties to request
+    #
+    # Returns:
+    #     (Tree): The captured tree
+    #
+    def _capture_tree(self, path, properties=None):
+        local_cas = self.get_local_cas()
+
+        request = local_cas_pb2.CaptureTreeRequest()
+        request.path.append(path)
+
+        if properties:
+            for _property in properties:
+                request.node_properties.append(_property)
+
+        response = local_cas.CaptureTree(request)
+
+        if len(response.responses) != 1:
+            raise CASCacheError("Expected 1 response from CaptureTree, got {}".format(len(response.responses)))
+
+        tree_response = response.responses[0]
+        if tree_response.status.code == code_pb2.RESOURCE_EXHAUSTED:
+            raise CASCacheError("Cache too full", reason="cache-too-full")
+        if tree_response.status.code != code_pb2.OK:
+            raise CASCacheError("Failed to capture tree {}: {}".format(path, tree_response.status))
+
+        treepath = self.objpath(tree_response.tree_digest)
+        tree = remote_execution_pb2.Tree()
+        with open(treepath, "rb") as f:
+            tree.ParseFromString(f.read())
+
+        return tree
+
     # _fetch_directory():
     #
     # Fetches remote directory and adds it to content addressable store.
@@ -706,6 +772,32 @@ class CASCache:
         assert not self._cache_usage_monitor_forbidden
         return self._cache_usage_monitor.get_cache_usage()
 
+    # get_transfer_stats():
+    #
+    # Fetches the amount of data transferred with remotes in batches of
+    # blobs. Trees fetched or uploaded as a whole are not accounted for.
+    #
+    # Returns:
+    #     (int): Bytes of blobs fetched from remotes
+    #     (int): Bytes of blobs uploaded to remotes
+    #
+    def get_transfer_stats(self):
+        with self._transfer_lock:
+            return self._fetched_bytes, self._uploaded_bytes
+
+    # add_transferred_bytes():
+    #
+    # Account for blobs transferred with remotes
+    #
+    # Args:
+    #     fetched (int): Bytes of blobs fetched from a remote
+    #     uploaded (int): Bytes of blobs uploaded to a remote
+    #
+    def add_transferred_bytes(self, *, fetched=0, uploaded=0):
+        with self._transfer_lock:
+            self._fetched_bytes += fetched
+            self._uploaded_bytes += uploaded
+
     # get_casd()
     #
     # Get the underlying buildbox-casd process
@@ -796,6 +888,157 @@ class _CASCacheUsageMonitor(threading.Thread):
                 time.sleep(0.1)
 
 
+# _StagedTree
+#
+# A directory tree staged by buildbox-casd, which can be reused by
+# later users of the _StagedTreeCache staging the same digest.
+#
+# Args:
+#    key (str): The key of the digest of the staged tree
+#
+class _StagedTree:
+    def __init__(self, key):
+        self.key = key
+        self.path = None
+        self.entries = None  # The status of the entries of the tree when it was staged
+        self.timer = None  # Releases the tree once it has been unused for too long
+        self.stack = contextlib.ExitStack()
+
+
+# _StagedTreeCache
+#
+# Keeps directory trees staged by buildbox-casd alive for a while after
+# they were used, such that staging the same digest repeatedly does not
+# cause the tree to be materialized again.
+#
+# Each staged tree is used by a single user at a time, who may modify
+# it. Trees which were modified, as detected by comparing the status of
+# their entries, are released instead of being reused. Unused staged trees are released once they
+# have not been used for `idle_timeout`, and in least recently used order
+# once there are more than `max_idle` of them.
+#
+# Args:
+#    cascache (CASCache): The CASCache to stage trees with
+#    max_idle (int): The maximum number of unused staged trees to keep
+#    idle_timeout (float): The time after which unused staged trees are released
+#
+class _StagedTreeCache:
+    def __init__(self, cascache, max_idle, idle_timeout):
+        self._cascache = cascache
+        self._max_idle = max_idle
+        self._idle_timeout = idle_timeout
+        self._idle_trees = OrderedDict()  # Unused staged trees, least recently used first
+        self._lock = threading.Lock()
+
+    # acquire():
+    #
+    # Get a staged tree for the given digest, staging it unless an unused
+    # staged tree is available. The returned tree must be released with
+    # release().
+    #
+    # Args:
+    #    directory_digest (Digest): The digest of a directory
+    #
+    # Returns:
+    #    (_StagedTree): The staged tree
+    #
+    def acquire(self, directory_digest):
+        key = "{}/{}".format(directory_digest.hash, directory_digest.size_bytes)
+
+        with self._lock:
+            for staged_tree in reversed(self._idle_trees):
+                if staged_tree.key == key:
+                    del self._idle_trees[staged_tree]
+                    staged_tree.timer.cancel()
+                    return staged_tree
+
+        staged_tree = _StagedTree(key)
+        try:
+            staged_tree.path = staged_tree.stack.enter_context(self._cascache.stage_directory(directory_digest))
+            staged_tree.entries = _list_tree_entries(staged_tree.path)
+        except BaseException:
+            staged_tree.stack.close()
+            raise
+
+        return staged_tree
+
+    # release():
+    #
+    # Release a staged tree obtained with acquire().
+    #
+    # Args:
+    #    staged_tree (_StagedTree): The staged tree
+    #
+    def release(self, staged_tree):
+        try:
+            modified = _list_tree_entries(staged_tree.path) != staged_tree.entries
+        except OSError:
+            modified = True
+
+        if modified:
+            staged_tree.stack.close()
+            return
+
+        evicted = []
+        with self._lock:
+            self._idle_trees[staged_tree] = None
+            staged_tree.timer = threading.Timer(self._idle_timeout, self._expire, args=(staged_tree,))
+            staged_tree.timer.daemon = True
+            staged_tree.timer.start()
+
+            while len(self._idle_trees) > self._max_idle:
+                evicted_tree, _ = self._idle_trees.popitem(last=False)
+                evicted_tree.timer.cancel()
+                evicted.append(evicted_tree)
+
+        # Let buildbox-casd clean up the staging locations outside of the lock
+        for evicted_tree in evicted:
+            evicted_tree.stack.close()
+
+    # clear():
+    #
+    # Release all unused staged trees.
+    #
+    def clear(self):
+        with self._lock:
+            evicted = list(self._idle_trees)
+            self._idle_trees.clear()
+
+        for evicted_tree in evicted:
+            evicted_tree.timer.cancel()
+            evicted_tree.stack.close()
+
+    # Release a staged tree which has been unused for too long
+    def _expire(self, staged_tree):
+        with self._lock:
+            if staged_tree not in self._idle_trees:
+                # Reused or evicted in the meantime
+                return
+            del self._idle_trees[staged_tree]
+
+        staged_tree.stack.close()
+
+
+# List the entries of a staged tree with their inode, mode, size and
+# modification time, such that entries which were added, removed, replaced,
+# written to, truncated or had their permissions changed can be detected.
+#
+def _list_tree_entries(path):
+    entries = {path: _entry_status(os.lstat(path))}
+    directories = [path]
+    while directories:
+        with os.scandir(directories.pop()) as it:
+            for entry in it:
+                entries[entry.path] = _entry_status(entry.stat(follow_symlinks=False))
+                if entry.is_dir(follow_symlinks=False):
+                    directories.append(entry.path)
+    return entries
+
+
+def _entry_status(st):
+    return (st.st_ino, st.st_mode, st.st_size, st.st_mtime_ns)
+
+
 def _grouper(iterable, n):
     while True:
         try:
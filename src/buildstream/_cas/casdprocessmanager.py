@@ -13,13 +13,18 @@
 #
 
 import contextlib
+import fcntl
+import hashlib
+import itertools
 import threading
 import os
 import re
 import random
 import shutil
+import socket
 import stat
 import subprocess
+import sys
 import tempfile
 import time
 from subprocess import CalledProcessError
@@ -36,10 +41,14 @@ from .._protos.google.longrunning import operations_pb2_grpc
 from .. import _site
 from .. import utils
 from .._exceptions import CASCacheError
+from .._tracing import TRACER, Categories
 
 _CASD_MAX_LOGFILES = 10
 _CASD_TIMEOUT = 300  # in seconds
 
+# Time after which a shared buildbox-casd exits if no session uses it, in seconds
+_SHARED_CASD_IDLE_TIMEOUT = 600
+
 
 #
 # Minimum required version of buildbox-casd
@@ -49,6 +58,25 @@ _REQUIRED_CASD_MINOR = 0
 _REQUIRED_CASD_MICRO = 58
 
 
+# _accepts_connections()
+#
+# Check whether a unix socket accepts connections
+#
+# Args:
+#     path (str): The path to the socket
+#
+# Returns:
+#     (bool): Whether a connection to the socket could be established
+#
+def _accepts_connections(path):
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+        try:
+            sock.connect(path)
+        except OSError:
+            return False
+    return True
+
+
 # CASDProcessManager
 #
 # This manages the subprocess that runs buildbox-casd.
@@ -61,22 +89,41 @@ _REQUIRED_CASD_MICRO = 58
 #     remote_cache_spec (RemoteSpec): Optional remote cache server
 #     protect_session_blobs (bool): Disable expiry for blobs used in the current session
 #     messenger (Messenger): The messenger to report warnings through the UI
+#     shared (bool): Whether to use a buildbox-casd shared with other sessions
+#     channels (int): The number of gRPC channels to open to buildbox-casd
+#
+# With `shared`, buildbox-casd is not terminated at the end of the session,
+# but left running for other sessions using the same cache and configuration
+# to attach to it, until it has not been used for a while. buildbox-casd
+# can only protect the blobs used since it was started, not those of each
+# session, so `shared` cannot be combined with `protect_session_blobs` and
+# a cache quota.
+#
+# Each thread is assigned one of the channels in turn, and uses it for
+# all of its requests, such that requests from concurrent jobs are spread
+# over separate connections to buildbox-casd.
 #
 class CASDProcessManager:
-    def __init__(self, path, log_dir, log_level, cache_quota, remote_cache_spec, protect_session_blobs, messenger):
+    def __init__(
+        self,
+        path,
+        log_dir,
+        log_level,
+        cache_quota,
+        remote_cache_spec,
+        protect_session_blobs,
+        messenger,
+        *,
+        shared=False,
+        channels=1
+    ):
         os.makedirs(path, exist_ok=True)
 
         self._log_dir = log_dir
-
-        self._socket_path = self._make_socket_path(path)
-        self._connection_string = "unix:" + self._socket_path
-
-        # Early version check
-        self._check_casd_version(messenger)
+        self._shared = shared
+        self._clients_lock_fd = None
 
         casd_args = [self.__buildbox_casd()]
-        casd_args.append("--bind=" + self._connection_string)
-        casd_args.append("--log-level=" + log_level.value)
 
         if cache_quota is not None:
             casd_args.append("--quota-high={}".format(int(cache_quota)))
@@ -103,32 +150,43 @@ class CASDProcessManager:
             if remote_cache_spec.keepalive_time is not None:
                 casd_args.append("--cas-keepalive-time={}".format(remote_cache_spec.keepalive_time))
 
-        casd_args.append(path)
-
         self._start_time = time.time()
-        self._logfile = self._rotate_and_get_next_logfile()
 
-        with open(self._logfile, "w", encoding="utf-8") as logfile_fp:
-            # The frontend will take care of terminating buildbox-casd.
-            # Create a new process group for it such that SIGINT won't reach it.
-            self.process = subprocess.Popen(  # pylint: disable=consider-using-with, subprocess-popen-preexec-fn
-                casd_args,
-                cwd=path,
-                stdout=logfile_fp,
-                stderr=subprocess.STDOUT,
-                preexec_fn=os.setpgrp,
-                env=self.__buildbox_casd_env(),
-            )
+        if shared:
+            if protect_session_blobs and cache_quota is not None:
+                raise CASCacheError("A shared buildbox-casd cannot protect the blobs of a session from expiry")
 
-        self._casd_channel = None
-        self._bytestream = None
-        self._casd_cas = None
-        self._local_cas = None
-        self._asset_fetch = None
-        self._asset_push = None
-        self._exec_service = None
-        self._operations_service = None
-        self._ac_service = None
+            self.process = None
+            self._shared_pid = self._attach_shared_casd(path, casd_args, log_level, messenger)
+        else:
+            self._socket_path = self._make_socket_path(path)
+            self._connection_string = "unix:" + self._socket_path
+
+            # Early version check
+            self._check_casd_version(messenger)
+
+            casd_args.append("--bind=" + self._connection_string)
+            casd_args.append("--log-level=" + log_level.value)
+            casd_args.append(path)
+
+            self._logfile = self._rotate_and_get_next_logfile()
+
+            with open(self._logfile, "w", encoding="utf-8") as logfile_fp:
+                # The frontend will take care of terminating buildbox-casd.
+                # Create a new process group for it such that SIGINT won't reach it.
+                self.process = subprocess.Popen(  # pylint: disable=consider-using-with, subprocess-popen-preexec-fn
+                    casd_args,
+                    cwd=path,
+                    stdout=logfile_fp,
+                    stderr=subprocess.STDOUT,
+                    preexec_fn=os.setpgrp,
+                    env=self.__buildbox_casd_env(),
+                )
+
+        self._num_channels = channels
+        self._channels = []
+        self._next_channel = itertools.count()
+        self._thread_local = threading.local()
         self._shutdown_requested = False
 
         self._lock = threading.Lock()
@@ -256,6 +314,173 @@ class CASDProcessManager:
         socket_name = "casserver-{}.sock".format(random_name)
         return os.path.join(self._socket_tempdir, "cas", socket_name)
 
+    # _attach_shared_casd()
+    #
+    # Attach this session to the shared buildbox-casd for the given cache
+    # and configuration, starting it if it isn't running.
+    #
+    # Sessions hold a shared lock on a clients lock file for as long as they
+    # use buildbox-casd, which the watchdog running buildbox-casd checks to
+    # know when it is idle. Starting buildbox-casd is serialized by another
+    # lock file, which is held until buildbox-casd accepts connections.
+    #
+    # Args:
+    #     path (str): The root directory for the CAS repository
+    #     casd_args (list): The arguments to buildbox-casd, without the
+    #                       socket, log level and path
+    #     log_level (LogLevel): Log level to give to buildbox-casd if it is started
+    #     messenger (Messenger): The messenger to report warnings through the UI
+    #
+    # Returns:
+    #     (int): The pid of the watchdog running buildbox-casd
+    #
+    def _attach_shared_casd(self, path, casd_args, log_level, messenger):
+        # Sessions with a different configuration need their own buildbox-casd
+        key = hashlib.sha256("\0".join(casd_args + [path]).encode("utf-8")).hexdigest()[:16]
+        state_dir = os.path.join(path, "casd", key)
+        os.makedirs(state_dir, exist_ok=True)
+
+        self._socket_path = self._make_shared_socket_path(state_dir, key)
+        self._connection_string = "unix:" + self._socket_path
+        clients_lock = os.path.join(state_dir, "clients.lock")
+        pid_file = os.path.join(state_dir, "casd.pid")
+
+        with open(os.path.join(state_dir, "start.lock"), "a", encoding="utf-8") as start_lock:
+            fcntl.flock(start_lock.fileno(), fcntl.LOCK_EX)
+
+            # This waits for a shared buildbox-casd which is shutting down
+            self._clients_lock_fd = os.open(clients_lock, os.O_RDWR | os.O_CREAT, 0o644)
+            fcntl.flock(self._clients_lock_fd, fcntl.LOCK_SH)
+
+            try:
+                return self._start_shared_casd(path, casd_args, log_level, messenger, clients_lock, pid_file)
+            except BaseException:
+                os.close(self._clients_lock_fd)
+                self._clients_lock_fd = None
+                raise
+
+    # _start_shared_casd()
+    #
+    # Start the shared buildbox-casd unless it is running already, and wait
+    # for it to accept connections.
+    #
+    # This must be called with the start lock held.
+    #
+    # Args:
+    #     path (str): The root directory for the CAS repository
+    #     casd_args (list): The arguments to buildbox-casd, without the
+    #                       socket, log level and path
+    #     log_level (LogLevel): Log level to give to buildbox-casd if it is started
+    #     messenger (Messenger): The messenger to report warnings through the UI
+    #     clients_lock (str): The clients lock file
+    #     pid_file (str): The file recording the pid of the watchdog
+    #
+    # Returns:
+    #     (int): The pid of the watchdog running buildbox-casd
+    #
+    def _start_shared_casd(self, path, casd_args, log_level, messenger, clients_lock, pid_file):
+        try:
+            with open(pid_file, "r", encoding="utf-8") as f:
+                pid = int(f.read())
+            if psutil.pid_exists(pid) and _accepts_connections(self._socket_path):
+                self._logfile = None
+                return pid
+        except (OSError, ValueError):
+            pass
+
+        # Not running, or a stale socket left behind
+        with contextlib.suppress(FileNotFoundError):
+            os.unlink(self._socket_path)
+
+        self._check_casd_version(messenger)
+        self._logfile = self._rotate_and_get_next_logfile()
+
+        watchdog_args = [
+            sys.executable,
+            os.path.join(os.path.dirname(__file__), "casdwatchdog.py"),
+            clients_lock,
+            self._socket_path,
+            str(_SHARED_CASD_IDLE_TIMEOUT),
+            self._logfile,
+            "--",
+        ]
+        watchdog_args.extend(casd_args)
+        watchdog_args.append("--bind=" + self._connection_string)
+        watchdog_args.append("--log-level=" + log_level.value)
+        watchdog_args.append(path)
+
+        # Start a new session such that buildbox-casd outlives this one
+        # and is not affected by its signals.
+        watchdog = subprocess.Popen(  # pylint: disable=consider-using-with
+            watchdog_args,
+            cwd=path,
+            stdin=subprocess.DEVNULL,
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.DEVNULL,
+            start_new_session=True,
+            env=self.__buildbox_casd_env(),
+        )
+
+        with utils.save_file_atomic(pid_file, "w", encoding="utf-8") as f:
+            f.write(str(watchdog.pid))
+
+        # Sessions waiting for the start lock check that buildbox-casd accepts
+        # connections, so they would start another one if it doesn't yet
+        while not _accepts_connections(self._socket_path):
+            if watchdog.poll() is not None:
+                raise CASCacheError(
+                    "buildbox-casd process died before connection could be established, logs: {}".format(
+                        self._logfile
+                    )
+                )
+            if time.time() > self._start_time + _CASD_TIMEOUT:
+                watchdog.terminate()
+                raise CASCacheError("Timed out waiting for buildbox-casd to become ready")
+            time.sleep(0.01)
+
+        return watchdog.pid
+
+    # _make_shared_socket_path()
+    #
+    # Create a path to the socket of a shared buildbox-casd, which is the
+    # same for all sessions of the current user using the same cache and
+    # configuration.
+    #
+    # Like for non-shared sockets, the socket is created in the state
+    # directory, through a symlink in a short runtime directory path.
+    #
+    # Args:
+    #     state_dir (str): The directory for the state of the shared buildbox-casd
+    #     key (str): The key identifying the shared buildbox-casd
+    #
+    # Returns:
+    #     (str) - The path to the CASD socket.
+    #
+    def _make_shared_socket_path(self, state_dir, key):
+        runtime_dir = os.path.join(
+            os.environ.get("XDG_RUNTIME_DIR") or tempfile.gettempdir(), "buildstream-{}".format(os.getuid())
+        )
+        with contextlib.suppress(FileExistsError):
+            os.mkdir(runtime_dir)
+            os.chmod(
+                runtime_dir,
+                stat.S_IRUSR | stat.S_IWUSR | stat.S_IXUSR | stat.S_IRGRP | stat.S_IXGRP | stat.S_IROTH | stat.S_IXOTH,
+            )
+
+        # Don't use a directory which was created by another user
+        st = os.lstat(runtime_dir)
+        if not stat.S_ISDIR(st.st_mode) or st.st_uid != os.getuid():
+            raise CASCacheError("Unsafe runtime directory for the shared buildbox-casd: {}".format(runtime_dir))
+
+        link = os.path.join(runtime_dir, key)
+        if not os.path.islink(link) or os.readlink(link) != state_dir:
+            with contextlib.suppress(FileNotFoundError):
+                os.unlink(link)
+            with contextlib.suppress(FileExistsError):
+                os.symlink(state_dir, link)
+
+        return os.path.join(link, "casd.sock")
+
     # _rotate_and_get_next_logfile()
     #
     # Get the logfile to use for casd
@@ -285,17 +510,16 @@ class CASDProcessManager:
     def release_resources(self, messenger=None):
         self._shutdown_requested = True
         with self._lock:
-            if self._casd_channel:
-                self._ac_service = None
-                self._operations_service = None
-                self._exec_service = None
-                self._asset_push = None
-                self._asset_fetch = None
-                self._local_cas = None
-                self._casd_cas = None
-                self._bytestream = None
-                self._casd_channel.close()
-                self._casd_channel = None
+            for channel in self._channels:
+                channel.close()
+            self._channels = []
+
+        if self._shared:
+            # Detach from the shared buildbox-casd, leaving it running
+            if self._clients_lock_fd is not None:
+                os.close(self._clients_lock_fd)
+                self._clients_lock_fd = None
+            return
 
         self._terminate(messenger)
         self.process = None
@@ -345,7 +569,7 @@ class CASDProcessManager:
 
     def _establish_connection(self):
         with self._lock:
-            if self._casd_channel is not None:
+            if self._channels:
                 return
 
             while not os.path.exists(self._socket_path):
@@ -360,7 +584,7 @@ class CASDProcessManager:
 
                 # check that process is still alive
                 try:
-                    proc = psutil.Process(self.process.pid)
+                    proc = psutil.Process(self._shared_pid if self._shared else self.process.pid)
                     if proc.status() == psutil.STATUS_ZOMBIE:
                         proc.wait()
 
@@ -375,80 +599,168 @@ class CASDProcessManager:
 
                 time.sleep(0.01)
 
-            self._casd_channel = grpc.insecure_channel(self._connection_string)
-            self._bytestream = bytestream_pb2_grpc.ByteStreamStub(self._casd_channel)
-            self._casd_cas = remote_execution_pb2_grpc.ContentAddressableStorageStub(self._casd_channel)
-            self._local_cas = local_cas_pb2_grpc.LocalContentAddressableStorageStub(self._casd_channel)
-            self._asset_fetch = remote_asset_pb2_grpc.FetchStub(self._casd_channel)
-            self._asset_push = remote_asset_pb2_grpc.PushStub(self._casd_channel)
-            self._exec_service = remote_execution_pb2_grpc.ExecutionStub(self._casd_channel)
-            self._operations_service = operations_pb2_grpc.OperationsStub(self._casd_channel)
-            self._ac_service = remote_execution_pb2_grpc.ActionCacheStub(self._casd_channel)
+            # Use separate subchannels, otherwise grpc would share a single
+            # connection between channels with the same target and arguments
+            self._channels = [
+                _CASDChannel(self._connection_string, [("grpc.use_local_subchannel_pool", 1)])
+                for _ in range(self._num_channels)
+            ]
+
+    # _get_channel():
+    #
+    # Get the channel to buildbox-casd assigned to the current thread
+    #
+    # Returns:
+    #     (_CASDChannel): The channel, or None if shutdown was requested
+    #                     before buildbox-casd was ready
+    #
+    def _get_channel(self):
+        channel = getattr(self._thread_local, "channel", None)
+        if channel is not None and not channel.closed:
+            return channel
+
+        if not self._channels:
+            self._establish_connection()
+
+        channels = self._channels
+        if not channels:
+            return None
+
+        channel = channels[next(self._next_channel) % len(channels)]
+        self._thread_local.channel = channel
+        return channel
 
     # get_cas():
     #
     # Return ContentAddressableStorage stub for buildbox-casd channel.
     #
     def get_cas(self):
-        if self._casd_channel is None:
-            self._establish_connection()
-        return self._casd_cas
+        channel = self._get_channel()
+        return channel.cas if channel else None
 
     # get_local_cas():
     #
     # Return LocalCAS stub for buildbox-casd channel.
     #
     def get_local_cas(self):
-        if self._local_cas is None:
-            self._establish_connection()
-        return self._local_cas
+        channel = self._get_channel()
+        return channel.local_cas if channel else None
 
     def get_bytestream(self):
-        if self._bytestream is None:
-            self._establish_connection()
-        return self._bytestream
+        channel = self._get_channel()
+        return channel.bytestream if channel else None
 
     # get_asset_fetch():
     #
     # Return Remote Asset Fetch stub for buildbox-casd channel.
     #
     def get_asset_fetch(self):
-        if self._casd_channel is None:
-            self._establish_connection()
-        return self._asset_fetch
+        channel = self._get_channel()
+        return channel.asset_fetch if channel else None
 
     # get_asset_push():
     #
     # Return Remote Asset Push stub for buildbox-casd channel.
     #
     def get_asset_push(self):
-        if self._casd_channel is None:
-            self._establish_connection()
-        return self._asset_push
+        channel = self._get_channel()
+        return channel.asset_push if channel else None
 
     # get_exec_service():
     #
     # Return Remote Execution stub for buildbox-casd channel.
     #
     def get_exec_service(self):
-        if self._casd_channel is None:
-            self._establish_connection()
-        return self._exec_service
+        channel = self._get_channel()
+        return channel.exec_service if channel else None
 
     # get_operations_service():
     #
     # Return Operations stub for buildbox-casd channel.
     #
     def get_operations_service(self):
-        if self._casd_channel is None:
-            self._establish_connection()
-        return self._operations_service
+        channel = self._get_channel()
+        return channel.operations_service if channel else None
 
     # get_ac_service():
     #
     # Return Action Cache stub for buildbox-casd channel.
     #
     def get_ac_service(self):
-        if self._casd_channel is None:
-            self._establish_connection()
-        return self._ac_service
+        channel = self._get_channel()
+        return channel.ac_service if channel else None
+
+
+# _CASDChannel
+#
+# A gRPC channel to buildbox-casd, along with the stubs for its services.
+#
+# Args:
+#     connection_string (str): The address of buildbox-casd
+#     options (list): The options for the channel
+#
+class _CASDChannel:
+    def __init__(self, connection_string, options):
+        self._channel = grpc.insecure_channel(connection_string, options=options)
+        self.closed = False
+
+        channel = self._channel
+        if TRACER.enabled:
+            channel = grpc.intercept_channel(channel, _TracingInterceptor())
+
+        self.bytestream = bytestream_pb2_grpc.ByteStreamStub(channel)
+        self.cas = remote_execution_pb2_grpc.ContentAddressableStorageStub(channel)
+        self.local_cas = local_cas_pb2_grpc.LocalContentAddressableStorageStub(channel)
+        self.asset_fetch = remote_asset_pb2_grpc.FetchStub(channel)
+        self.asset_push = remote_asset_pb2_grpc.PushStub(channel)
+        self.exec_service = remote_execution_pb2_grpc.ExecutionStub(channel)
+        self.operations_service = operations_pb2_grpc.OperationsStub(channel)
+        self.ac_service = remote_execution_pb2_grpc.ActionCacheStub(channel)
+
+    def close(self):
+        self.closed = True
+        self._channel.close()
+
+
+# _TracingInterceptor
+#
+# Records requests to buildbox-casd in the session trace.
+#
+# Requests with a single response are blocking and recorded as spans of
+# the calling thread. Requests with streamed responses are consumed while
+# the calling thread does other work, and are recorded as async spans
+# ending when the last response was received.
+#
+class _TracingInterceptor(
+    grpc.UnaryUnaryClientInterceptor,
+    grpc.UnaryStreamClientInterceptor,
+    grpc.StreamUnaryClientInterceptor,
+    grpc.StreamStreamClientInterceptor,
+):
+    def intercept_unary_unary(self, continuation, client_call_details, request):
+        with TRACER.span(_method_name(client_call_details), Categories.CASD):
+            return continuation(client_call_details, request)
+
+    def intercept_stream_unary(self, continuation, client_call_details, request_iterator):
+        with TRACER.span(_method_name(client_call_details), Categories.CASD):
+            return continuation(client_call_details, request_iterator)
+
+    def intercept_unary_stream(self, continuation, client_call_details, request):
+        return self._trace_stream(continuation(client_call_details, request), client_call_details)
+
+    def intercept_stream_stream(self, continuation, client_call_details, request_iterator):
+        return self._trace_stream(continuation(client_call_details, request_iterator), client_call_details)
+
+    def _trace_stream(self, call, client_call_details):
+        name = _method_name(client_call_details)
+        start = TRACER.now()
+        call.add_done_callback(lambda _: TRACER.complete_async(name, Categories.CASD, start, TRACER.now()))
+        return call
+
+
+# The short name of the method of a request, e.g. "FetchMissingBlobs"
+def _method_name(client_call_details):
+    method = client_call_details.method
+    if isinstance(method, bytes):
+        method = method.decode("utf-8")
+    return method.rsplit("/", 1)[-1]
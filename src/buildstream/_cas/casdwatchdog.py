@@ -0,0 +1,107 @@
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+#
+
+# Watchdog for a shared buildbox-casd
+#
+# This is run as a standalone script by the CASDProcessManager, detached
+# from the session which started it, such that buildbox-casd outlives the
+# bst invocation which started it and can be reused by later invocations.
+#
+# Sessions using the shared buildbox-casd hold a shared lock on the clients
+# lock file. Once no session held it for the given idle timeout, the
+# watchdog terminates buildbox-casd and removes its socket, while holding
+# the lock exclusively such that no new session can attach in the meantime.
+#
+# As this is run with the python interpreter directly, it must not import
+# anything from buildstream.
+#
+# Usage:
+#     casdwatchdog.py LOCK_FILE SOCKET IDLE_TIMEOUT LOG_FILE -- CASD_ARGS...
+#
+
+import fcntl
+import os
+import signal
+import subprocess
+import sys
+import time
+
+# Interval at which to check for sessions, in seconds
+_POLL_INTERVAL = 1
+
+
+def _cleanup(socket_path, pid_path):
+    for path in (socket_path, pid_path):
+        try:
+            os.unlink(path)
+        except FileNotFoundError:
+            pass
+
+
+def main(argv):
+    lock_path, socket_path, idle_timeout, log_path = argv[:4]
+    assert argv[4] == "--"
+    casd_args = argv[5:]
+    idle_timeout = float(idle_timeout)
+    pid_path = os.path.join(os.path.dirname(lock_path), "casd.pid")
+
+    with open(log_path, "w", encoding="utf-8") as logfile_fp:
+        process = subprocess.Popen(  # pylint: disable=consider-using-with
+            casd_args, cwd=casd_args[-1], stdout=logfile_fp, stderr=subprocess.STDOUT
+        )
+
+    def terminate(*_):
+        process.terminate()
+
+    signal.signal(signal.SIGTERM, terminate)
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+
+    lock_fd = os.open(lock_path, os.O_RDWR | os.O_CREAT, 0o644)
+    idle_since = None
+
+    while process.poll() is None:
+        time.sleep(_POLL_INTERVAL)
+
+        try:
+            fcntl.flock(lock_fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            # A session is attached
+            idle_since = None
+            continue
+
+        if idle_since is None:
+            idle_since = time.monotonic()
+
+        if time.monotonic() - idle_since >= idle_timeout:
+            # Shut down while holding the lock, sessions attaching in the
+            # meantime will wait and start a new buildbox-casd.
+            process.terminate()
+            try:
+                process.wait(timeout=15)
+            except subprocess.TimeoutExpired:
+                process.kill()
+                process.wait()
+            _cleanup(socket_path, pid_path)
+            return 0
+
+        fcntl.flock(lock_fd, fcntl.LOCK_UN)
+
+    # buildbox-casd exited on its own or was terminated, exit as well
+    # such that sessions notice and a new one gets started.
+    _cleanup(socket_path, pid_path)
+    return process.returncode
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
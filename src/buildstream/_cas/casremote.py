@@ -116,10 +116,12 @@ class _CASBatchRead:
         if not self._requests:
             return
 
-        local_cas = self._remote.cascache.get_local_cas()
+        cascache = self._remote.cascache
+        local_cas = cascache.get_local_cas()
 
         for request in self._requests:
             batch_response = local_cas.FetchMissingBlobs(request)
+            fetched = 0
 
             for response in batch_response.responses:
                 if response.status.code == code_pb2.NOT_FOUND:
@@ -142,6 +144,10 @@ class _CASBatchRead:
                         )
                     )
 
+                fetched += response.digest.size_bytes
+
+            cascache.add_transferred_bytes(fetched=fetched)
+
 
 # Represents a batch of blobs queued for upload.
 #
@@ -170,10 +176,12 @@ class _CASBatchUpdate:
         if not self._requests:
             return
 
-        local_cas = self._remote.cascache.get_local_cas()
+        cascache = self._remote.cascache
+        local_cas = cascache.get_local_cas()
 
         for request in self._requests:
             batch_response = local_cas.UploadMissingBlobs(request)
+            uploaded = 0
 
             for response in batch_response.responses:
                 if response.status.code != code_pb2.OK:
@@ -186,3 +194,7 @@ class _CASBatchUpdate:
                         "Failed to upload blob {}: {}".format(response.digest.hash, response.status.code),
                         reason=reason,
                     )
+
+                uploaded += response.digest.size_bytes
+
+            cascache.add_transferred_bytes(uploaded=uploaded)
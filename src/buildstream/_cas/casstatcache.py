@@ -0,0 +1,447 @@
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+#
+
+import concurrent.futures
+import hashlib
+import os
+import stat
+import threading
+import time
+
+import ujson
+
+from .._exceptions import CASCacheError
+from .._protos.build.bazel.remote.execution.v2 import remote_execution_pb2
+from .. import utils
+
+# Bump this when the format of the cache files changes
+_STAT_CACHE_VERSION = 1
+
+# Files modified this recently (in nanoseconds) when a directory is scanned
+# are not recorded, as they may still be modified without their status
+# changing on filesystems with coarse timestamps.
+_RACY_WINDOW = 2 * 1000000000
+
+# Maximum number of files to capture in a single CaptureFiles request
+_CAPTURE_BATCH_SIZE = 512
+
+# Number of threads listing directories concurrently
+_SCAN_THREADS = 8
+
+# Cache files of directories which were not imported for this many seconds
+# are removed, as are the least recently used ones beyond the maximum count
+_CACHE_FILE_EXPIRY = 30 * 24 * 60 * 60
+_MAX_CACHE_FILES = 1000
+
+
+# CASStatCache
+#
+# A persistent cache of the digests of files in local directories, keyed
+# by the status of the files (inode, size, mtime and ctime), along with the
+# digests of directories keyed by a signature of the status of everything
+# they contain.
+#
+# This allows importing a local directory into CAS without reading the
+# content of files which did not change since the directory was last
+# imported, and without serializing directories which did not change at all.
+#
+# The first import of a directory is done by buildbox-casd, and is used to
+# verify that the directory trees built here are identical to the ones
+# buildbox-casd would produce. If they aren't, the cache is not used for
+# that directory.
+#
+# There is a cache file for each imported directory. Cache files which were
+# not used for a while are removed once per session.
+#
+# Args:
+#     cascache (CASCache): The CASCache to import directories into
+#     path (str): The directory to store the cache files in
+#
+class CASStatCache:
+    def __init__(self, cascache, path):
+        self._cascache = cascache
+        self._path = path
+        self._pruned = False
+        self._lock = threading.Lock()
+
+    # import_directory():
+    #
+    # Import directory tree into CAS.
+    #
+    # Args:
+    #     path (str): Path to directory to import
+    #     properties (list): List of properties to request
+    #
+    # Returns:
+    #     (Digest): The digest of the imported directory
+    #
+    # Raises:
+    #     (CASCacheError): If the directory cannot be read
+    #
+    def import_directory(self, path, properties=None):
+        properties = sorted(properties or [])
+        start_time = time.time_ns()
+        cache_file = self._get_cache_file(path, properties)
+
+        root = _ScannedDirectory.scan(path, start_time)
+        cache = self._load(cache_file)
+
+        digest = None
+        if cache is not None:
+            builder = _TreeBuilder(self._cascache, properties, cache)
+            digest = builder.build(root)
+
+            # Blobs may have been expired from the local cache since the last import
+            if not self._cascache.contains_directory(digest, with_files=True):
+                digest = None
+
+        if digest is None:
+            tree = self._cascache._capture_tree(path, properties)
+            digest = utils._message_digest(tree.root.SerializeToString())
+
+            # Build the same tree from the digests of the captured files, this
+            # both collects the digests and verifies that trees built here match.
+            # The directory may also have been modified since it was scanned.
+            builder = _TreeBuilder(self._cascache, properties, None, tree=tree)
+            try:
+                verified = builder.build(root) == digest
+            except KeyError:
+                verified = False
+        else:
+            verified = True
+
+        self._save(cache_file, builder, verified)
+
+        return digest
+
+    # _get_cache_file()
+    #
+    # Get the path of the cache file for a directory
+    #
+    def _get_cache_file(self, path, properties):
+        key = "{}\0{}".format(os.path.abspath(path), ",".join(properties))
+        return os.path.join(self._path, hashlib.sha256(key.encode("utf-8")).hexdigest())
+
+    # _load()
+    #
+    # Load the cache for a directory
+    #
+    # Returns:
+    #     (dict): The loaded cache, or None if there is no usable cache
+    #
+    def _load(self, cache_file):
+        try:
+            with open(cache_file, "r", encoding="utf-8") as f:
+                cache = ujson.load(f)
+        except (OSError, ValueError):
+            return None
+
+        if not isinstance(cache, dict) or cache.get("version") != _STAT_CACHE_VERSION or not cache.get("verified"):
+            return None
+
+        return cache
+
+    # _save()
+    #
+    # Save the cache for a directory
+    #
+    def _save(self, cache_file, builder, verified):
+        cache = {
+            "version": _STAT_CACHE_VERSION,
+            "verified": verified,
+            "files": builder.files,
+            "directories": builder.directories,
+        }
+
+        os.makedirs(self._path, exist_ok=True)
+        with utils.save_file_atomic(cache_file, "w", encoding="utf-8", tempdir=self._cascache.tmpdir) as f:
+            ujson.dump(cache, f)
+
+        with self._lock:
+            pruned, self._pruned = self._pruned, True
+        if not pruned:
+            self._prune()
+
+    # _prune()
+    #
+    # Remove the cache files of directories which were not imported recently
+    #
+    def _prune(self):
+        cache_files = []
+        with os.scandir(self._path) as it:
+            for entry in it:
+                try:
+                    cache_files.append((entry.stat().st_mtime, entry.path))
+                except FileNotFoundError:
+                    # Removed by a concurrent session
+                    pass
+
+        # Most recently used first
+        cache_files.sort(reverse=True)
+
+        expiry = time.time() - _CACHE_FILE_EXPIRY
+        for index, (mtime, cache_file) in enumerate(cache_files):
+            if index >= _MAX_CACHE_FILES or mtime < expiry:
+                try:
+                    os.unlink(cache_file)
+                except FileNotFoundError:
+                    pass
+
+
+# _ScannedDirectory
+#
+# The status of a local directory tree.
+#
+# Args:
+#     path (str): The path of the directory
+#
+class _ScannedDirectory:
+    def __init__(self, path):
+        self.path = path
+        self.files = {}  # File status by name
+        self.symlinks = {}  # Symlink targets by name
+        self.directories = {}  # _ScannedDirectory by name
+        self.signature = None
+        self.racy_files = set()  # Names of files which were modified too recently
+        self.racy = False  # Whether any file in the tree was modified too recently
+
+    # scan()
+    #
+    # Scan a local directory tree.
+    #
+    # Directories are listed concurrently, which mostly matters for large
+    # trees which are not in the kernel's caches, as listing directories and
+    # getting the status of files does not hold the GIL.
+    #
+    # Args:
+    #     path (str): The path of the directory
+    #     start_time (int): The time at which the import started, in nanoseconds
+    #
+    # Returns:
+    #     (_ScannedDirectory): The scanned directory
+    #
+    @classmethod
+    def scan(cls, path, start_time):
+        root = cls(path)
+
+        with concurrent.futures.ThreadPoolExecutor(max_workers=_SCAN_THREADS) as executor:
+            pending = {executor.submit(root._list)}
+            while pending:
+                done, pending = concurrent.futures.wait(pending, return_when=concurrent.futures.FIRST_COMPLETED)
+                for future in done:
+                    for subdir in future.result():
+                        pending.add(executor.submit(subdir._list))
+
+        root._compute_signature(start_time)
+        return root
+
+    # List the entries of the directory, getting the status of files only,
+    # and return the subdirectories, which still need to be listed
+    def _list(self):
+        try:
+            with os.scandir(self.path) as it:
+                for entry in it:
+                    # The file type is usually known from listing the directory,
+                    # without getting the status of each entry
+                    if entry.is_dir(follow_symlinks=False):
+                        self.directories[entry.name] = _ScannedDirectory(entry.path)
+                    elif entry.is_file(follow_symlinks=False):
+                        self.files[entry.name] = entry.stat(follow_symlinks=False)
+                    elif entry.is_symlink():
+                        self.symlinks[entry.name] = os.readlink(entry.path)
+                    # Other file types cannot be stored in CAS
+        except OSError as e:
+            raise CASCacheError("Failed to read directory {}: {}".format(self.path, e)) from e
+
+        return list(self.directories.values())
+
+    # Compute the signatures of the directory and its subdirectories
+    def _compute_signature(self, start_time):
+        sha = hashlib.sha256()
+        for name, st in sorted(self.files.items()):
+            sha.update("f\0{}\0{}\0{}\0".format(name, _stat_key(st), st.st_mode).encode("utf-8"))
+            if st.st_mtime_ns >= start_time - _RACY_WINDOW:
+                self.racy_files.add(name)
+                self.racy = True
+        for name, target in sorted(self.symlinks.items()):
+            sha.update("l\0{}\0{}\0".format(name, target).encode("utf-8"))
+        for name, subdir in sorted(self.directories.items()):
+            subdir._compute_signature(start_time)
+            sha.update("d\0{}\0{}\0".format(name, subdir.signature).encode("utf-8"))
+            self.racy = self.racy or subdir.racy
+
+        self.signature = sha.hexdigest()
+
+
+# _TreeBuilder
+#
+# Builds CAS directory trees for scanned directories, reusing digests from
+# the cache where the status of files and directories did not change.
+#
+# The digests in use are collected in `files` and `directories`, in the
+# format of the cache.
+#
+# Args:
+#     cascache (CASCache): The CASCache to store blobs in
+#     properties (list): List of properties to include
+#     cache (dict): The loaded cache, if any
+#     tree (Tree): A tree captured by buildbox-casd to take file digests from
+#
+class _TreeBuilder:
+    def __init__(self, cascache, properties, cache, *, tree=None):
+        self._cascache = cascache
+        self._properties = properties
+        self._cached_files = cache["files"] if cache else {}
+        self._cached_directories = cache["directories"] if cache else {}
+        self._tree = tree
+
+        self.files = {}
+        self.directories = {}
+
+    # build():
+    #
+    # Build the tree for a scanned directory
+    #
+    # Returns:
+    #     (Digest): The digest of the root directory
+    #
+    def build(self, root):
+        if self._tree is not None:
+            captured = self._collect_captured(root)
+        else:
+            captured = self._capture(self._find_modified_files(root, ""))
+
+        directory_buffers = []
+        digest = self._build_directory(root, "", captured, directory_buffers)
+
+        # Directories were already stored by buildbox-casd when a tree was captured
+        if self._tree is None:
+            for i in range(0, len(directory_buffers), _CAPTURE_BATCH_SIZE):
+                self._cascache.add_objects(buffers=directory_buffers[i : i + _CAPTURE_BATCH_SIZE])
+
+        return digest
+
+    # Get the paths of all files whose digests are not known from the cache,
+    # skipping directories which did not change at all
+    def _find_modified_files(self, directory, relpath):
+        cached_directory = self._cached_directories.get(relpath)
+        if cached_directory and cached_directory[0] == directory.signature:
+            return []
+
+        modified_files = []
+        for name, st in directory.files.items():
+            cached_file = self._cached_files.get(os.path.join(relpath, name))
+            if not cached_file or cached_file[0] != _stat_key(st):
+                modified_files.append(os.path.join(directory.path, name))
+        for name, subdir in directory.directories.items():
+            modified_files.extend(self._find_modified_files(subdir, os.path.join(relpath, name)))
+
+        return modified_files
+
+    # Capture the given files into CAS
+    def _capture(self, paths):
+        captured = {}
+        for i in range(0, len(paths), _CAPTURE_BATCH_SIZE):
+            batch = paths[i : i + _CAPTURE_BATCH_SIZE]
+            digests = self._cascache.add_objects(paths=batch)
+            captured.update(zip(batch, digests))
+        return captured
+
+    # Collect the digests of files from a tree captured by buildbox-casd
+    def _collect_captured(self, root):
+        children = {}
+        for child in self._tree.children:
+            children[utils._message_digest(child.SerializeToString()).hash] = child
+
+        captured = {}
+
+        def collect(directory, pb2_directory):
+            for filenode in pb2_directory.files:
+                captured[os.path.join(directory.path, filenode.name)] = filenode.digest
+            for dirnode in pb2_directory.directories:
+                subdir = directory.directories.get(dirnode.name)
+                if subdir is not None:
+                    collect(subdir, children[dirnode.digest.hash])
+
+        collect(root, self._tree.root)
+        return captured
+
+    # Build the Directory proto for a scanned directory and its subdirectories
+    def _build_directory(self, directory, relpath, captured, directory_buffers):
+        cached_directory = self._cached_directories.get(relpath)
+        if cached_directory and cached_directory[0] == directory.signature:
+            self._reuse_directory(directory, relpath)
+            return _make_digest(cached_directory[1], cached_directory[2])
+
+        pb2_directory = remote_execution_pb2.Directory()
+
+        for name, st in sorted(directory.files.items()):
+            filepath = os.path.join(relpath, name)
+            digest = captured.get(os.path.join(directory.path, name))
+            if digest is None:
+                cached_file = self._cached_files[filepath]
+                digest = _make_digest(cached_file[1], cached_file[2])
+
+            filenode = pb2_directory.files.add()
+            filenode.name = name
+            filenode.digest.CopyFrom(digest)
+            filenode.is_executable = bool(st.st_mode & stat.S_IXUSR)
+            if "mtime" in self._properties:
+                filenode.node_properties.mtime.seconds = st.st_mtime_ns // 1000000000
+                filenode.node_properties.mtime.nanos = st.st_mtime_ns % 1000000000
+
+            if name not in directory.racy_files:
+                self.files[filepath] = [_stat_key(st), digest.hash, digest.size_bytes]
+
+        for name, subdir in sorted(directory.directories.items()):
+            dirnode = pb2_directory.directories.add()
+            dirnode.name = name
+            dirnode.digest.CopyFrom(
+                self._build_directory(subdir, os.path.join(relpath, name), captured, directory_buffers)
+            )
+
+        for name, target in sorted(directory.symlinks.items()):
+            symlinknode = pb2_directory.symlinks.add()
+            symlinknode.name = name
+            symlinknode.target = target
+
+        buffer = pb2_directory.SerializeToString()
+        digest = utils._message_digest(buffer)
+        directory_buffers.append(buffer)
+
+        if not directory.racy:
+            self.directories[relpath] = [directory.signature, digest.hash, digest.size_bytes]
+
+        return digest
+
+    # Carry over the cache entries of an unchanged directory
+    def _reuse_directory(self, directory, relpath):
+        self.directories[relpath] = self._cached_directories[relpath]
+        for name in directory.files:
+            filepath = os.path.join(relpath, name)
+            self.files[filepath] = self._cached_files[filepath]
+        for name, subdir in directory.directories.items():
+            self._reuse_directory(subdir, os.path.join(relpath, name))
+
+
+# The part of the status of a file which identifies its content
+def _stat_key(st):
+    return "{}:{}:{}:{}".format(st.st_ino, st.st_size, st.st_mtime_ns, st.st_ctime_ns)
+
+
+def _make_digest(hash_, size_bytes):
+    digest = remote_execution_pb2.Digest()
+    digest.hash = hash_
+    digest.size_bytes = size_bytes
+    return digest
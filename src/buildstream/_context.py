@@ -29,6 +29,10 @@ from ._platform import Platform
 from ._artifactcache import ArtifactCache
 from ._elementsourcescache import ElementSourcesCache
 from ._remotespec import RemoteSpec, RemoteExecutionSpec
+from ._refwriter import RefWriter
+from ._mirrorhealth import MirrorHealth
+from ._fetchpool import FetchPool
+from ._trackinggroups import TrackingGroups
 from ._sourcecache import SourceCache
 from ._cas import CASCache, CASDProcessManager, CASLogLevel
 from .types import _CacheBuildTrees, _PipelineSelection, _SchedulerErrorAction, _SourceUriPolicy
@@ -161,6 +165,9 @@ class Context:
         # Maximum number of retries for network tasks
         self.sched_network_retries: Optional[int] = None
 
+        # File to export metrics of the session to
+        self.sched_metrics_file: Optional[str] = None
+
         # What to do when a build fails in non interactive mode
         self.sched_error_action: Optional[str] = None
 
@@ -176,9 +183,15 @@ class Context:
         # Control which URIs can be accessed when fetching sources
         self.fetch_source: Optional[str] = None
 
+        # Whether the order in which mirrors are tried adapts to their health
+        self.adaptive_mirrors: Optional[bool] = None
+
         # Control which URIs can be accessed when tracking sources
         self.track_source: Optional[str] = None
 
+        # Minimum number of seconds between writes of tracked refs to project files
+        self.track_checkpoint_interval: Optional[int] = None
+
         # Size of the artifact cache in bytes
         self.config_cache_quota: Optional[int] = None
 
@@ -194,6 +207,12 @@ class Context:
         # Whether or not to cache build trees on artifact creation
         self.cache_buildtrees: Optional[str] = None
 
+        # Whether to use a buildbox-casd shared across invocations
+        self.shared_casd: bool = False
+
+        # The number of gRPC channels to open to buildbox-casd
+        self.casd_channels: int = 1
+
         # Don't shoot the messenger
         self.messenger: Messenger = Messenger()
 
@@ -223,6 +242,10 @@ class Context:
         self._project_overrides: MappingNode = Node.from_dict({})
         self._workspaces: Optional[Workspaces] = None
         self._workspace_project_cache: WorkspaceProjectCache = WorkspaceProjectCache()
+        self._ref_writer: Optional[RefWriter] = None
+        self._mirror_health: Optional[MirrorHealth] = None
+        self._fetch_pool: Optional[FetchPool] = None
+        self._tracking_groups: TrackingGroups = TrackingGroups()
         self._casd: Optional[CASDProcessManager] = None
         self._cascache: Optional[CASCache] = None
 
@@ -238,6 +261,13 @@ class Context:
     # Called when exiting the with-statement context.
     #
     def __exit__(self, exc_type, exc_value, traceback) -> None:
+        if self._mirror_health:
+            try:
+                self._mirror_health.save()
+            except OSError:
+                # The table only serves to order mirrors, losing it is harmless
+                pass
+
         if self._artifactcache:
             self._artifactcache.release_resources()
 
@@ -362,7 +392,9 @@ class Context:
         # We need to find the first existing directory in the path of our
         # casdir - the casdir may not have been created yet.
         cache = defaults.get_mapping("cache")
-        cache.validate_keys(["quota", "storage-service", "pull-buildtrees", "cache-buildtrees"])
+        cache.validate_keys(
+            ["quota", "storage-service", "pull-buildtrees", "cache-buildtrees", "shared-casd", "casd-channels"]
+        )
 
         cas_volume = self.casdir
         while not os.path.exists(cas_volume):
@@ -401,6 +433,23 @@ class Context:
         # Load cache build trees configuration
         self.cache_buildtrees = cache.get_enum("cache-buildtrees", _CacheBuildTrees)
 
+        # Load shared casd configuration
+        self.shared_casd = cache.get_bool("shared-casd")
+        if self.shared_casd and self.config_cache_quota is not None:
+            provenance = cache.get_scalar("shared-casd").get_provenance()
+            raise LoadError(
+                "{}: shared-casd cannot be used with a cache quota, as blobs in use could be expired".format(
+                    provenance
+                ),
+                LoadErrorReason.INVALID_DATA,
+            )
+
+        # Load the number of channels to buildbox-casd
+        self.casd_channels = cache.get_int("casd-channels")
+        if self.casd_channels < 1:
+            provenance = cache.get_scalar("casd-channels").get_provenance()
+            raise LoadError("{}: casd-channels must be at least 1".format(provenance), LoadErrorReason.INVALID_DATA)
+
         # Load logging config
         logging = defaults.get_mapping("logging")
         logging.validate_keys(
@@ -450,13 +499,20 @@ class Context:
 
         # Load fetch config
         fetch = defaults.get_mapping("fetch")
-        fetch.validate_keys(["source"])
+        fetch.validate_keys(["source", "adaptive-mirrors"])
         self.fetch_source = fetch.get_enum("source", _SourceUriPolicy)
+        self.adaptive_mirrors = fetch.get_bool("adaptive-mirrors")
 
         # Load track config
         track = defaults.get_mapping("track")
-        track.validate_keys(["source"])
+        track.validate_keys(["source", "checkpoint-interval"])
         self.track_source = track.get_enum("source", _SourceUriPolicy)
+        self.track_checkpoint_interval = track.get_int("checkpoint-interval")
+        if self.track_checkpoint_interval < 0:
+            provenance = track.get_scalar("checkpoint-interval").get_provenance()
+            raise LoadError(
+                "{}: checkpoint-interval must not be negative".format(provenance), LoadErrorReason.INVALID_DATA
+            )
 
         # Load per-projects overrides
         self._project_overrides = defaults.get_mapping("projects", default={})
@@ -648,6 +704,55 @@ class Context:
     def get_workspace_project_cache(self) -> WorkspaceProjectCache:
         return self._workspace_project_cache
 
+    # get_ref_writer():
+    #
+    # Return the RefWriter used to write tracked refs back to project files
+    #
+    # Returns:
+    #    The RefWriter object
+    #
+    def get_ref_writer(self) -> RefWriter:
+        if self._ref_writer is None:
+            assert self.track_checkpoint_interval is not None
+            self._ref_writer = RefWriter(self.track_checkpoint_interval)
+        return self._ref_writer
+
+    # get_mirror_health():
+    #
+    # Return the MirrorHealth table used to order mirrors
+    #
+    # Returns:
+    #    The MirrorHealth object
+    #
+    def get_mirror_health(self) -> MirrorHealth:
+        if self._mirror_health is None:
+            self._mirror_health = MirrorHealth(os.path.join(self.cachedir, "mirror-health"))
+        return self._mirror_health
+
+    # get_fetch_pool():
+    #
+    # Return the FetchPool used to fetch independent sources concurrently,
+    # within the budget of concurrent fetches of the session
+    #
+    # Returns:
+    #    The FetchPool object
+    #
+    def get_fetch_pool(self) -> FetchPool:
+        if self._fetch_pool is None:
+            assert self.sched_fetchers is not None
+            self._fetch_pool = FetchPool(self.messenger, self.sched_fetchers)
+        return self._fetch_pool
+
+    # get_tracking_groups():
+    #
+    # Return the TrackingGroups used to share tracking queries between sources
+    #
+    # Returns:
+    #    The TrackingGroups object
+    #
+    def get_tracking_groups(self) -> TrackingGroups:
+        return self._tracking_groups
+
     # get_overrides():
     #
     # Fetch the override dictionary for the active project. This returns
@@ -701,6 +806,8 @@ class Context:
                 self.remote_cache_spec,
                 protect_session_blobs=True,
                 messenger=self.messenger,
+                shared=self.shared_casd,
+                channels=self.casd_channels,
             )
         return self._casd
 
@@ -11,6 +11,7 @@
 #  See the License for the specific language governing permissions and
 #  limitations under the License.
 
+import functools
 import os
 from contextlib import contextmanager
 from typing import TYPE_CHECKING, Iterator
@@ -232,10 +233,19 @@ class ElementSources:
     #    SourceError: If one of the element sources has an error
     #
     def fetch_sources(self, *, fetch_original=False, stop=None):
+        # Sources are fetched concurrently, except for sources which
+        # require the previous sources to be fetched first
+        fetch_pool = self._context.get_fetch_pool()
+        operations = []
+
         for source in self._sources:
             if source == stop:
                 break
 
+            if source.BST_REQUIRES_PREVIOUS_SOURCES_FETCH:
+                fetch_pool.run(operations)
+                operations = []
+
             if (
                 fetch_original
                 or source.BST_REQUIRES_PREVIOUS_SOURCES_FETCH
@@ -245,9 +255,29 @@ class ElementSources:
                 # CAS-based source cache on its own. Fetch original source
                 # if it's not in the plugin-specific cache yet.
                 if not source._is_cached():
-                    self._fetch_original_source(source)
+                    operations.append(functools.partial(self._fetch_original_source, source))
             else:
-                self._fetch_source(source)
+                operations.append(functools.partial(self._fetch_source, source))
+
+        fetch_pool.run(operations)
+
+    # get_uncached_sources():
+    #
+    # Get the individual sources which fetch_sources() would try to pull
+    # from remote source caches, as they are not cached locally.
+    #
+    # Returns:
+    #    (list): The uncached sources
+    #
+    def get_uncached_sources(self):
+        return [
+            source
+            for source in self._sources
+            if not source.BST_REQUIRES_PREVIOUS_SOURCES_FETCH
+            and not source.BST_REQUIRES_PREVIOUS_SOURCES_STAGE
+            and not self._sourcecache.contains(source)
+            and not source._is_cached()
+        ]
 
     # get_unique_key():
     #
@@ -499,5 +529,7 @@ class ElementSources:
             yield vdir
         else:
             cas = self._context.get_cascache()
-            with cas.stage_directory(vdir._get_digest()) as tempdir:
+            # Sources requiring the same previous sources, or the same source
+            # when tracked and fetched, can reuse the staged tree
+            with cas.stage_directory(vdir._get_digest(), reuse=True) as tempdir:
                 yield tempdir
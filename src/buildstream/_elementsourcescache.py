@@ -88,7 +88,7 @@ class ElementSourcesCache(AssetCache):
             remote.init()
             try:
                 plugin.status("Pulling source {} <- {}".format(display_key, remote))
-                response = remote.fetch_blob([uri])
+                response = self.fetch_asset(remote, uri)
                 if response:
                     source_digest = response.blob_digest
                     break
@@ -135,6 +135,25 @@ class ElementSourcesCache(AssetCache):
 
         return False
 
+    # resolve_remote():
+    #
+    # Look up the given element sources on the remote source caches ahead
+    # of pulling them.
+    #
+    # Args:
+    #    sources_list (list): The ElementSources to look up
+    #    max_workers (int): The maximum number of concurrent lookups
+    #
+    # Returns:
+    #    (list): The ElementSources which are not available remotely
+    #
+    def resolve_remote(self, sources_list, *, max_workers):
+        uris = {sources: REMOTE_ASSET_SOURCE_URN_TEMPLATE.format(sources.get_cache_key()) for sources in sources_list}
+        found = self.resolve_assets(
+            [(sources.get_project().name, uri) for sources, uri in uris.items()], max_workers=max_workers
+        )
+        return [sources for sources, uri in uris.items() if uri not in found]
+
     # push():
     #
     # Push sources to remote repository.
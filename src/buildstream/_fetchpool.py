@@ -0,0 +1,184 @@
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+#
+import concurrent.futures
+import threading
+from contextlib import contextmanager
+from typing import Callable, Iterator, List, Optional, Sequence, Set, Tuple
+
+from ._messenger import Messenger
+from ._signals import TerminateException
+from ._utils import terminate_thread
+
+# Interval at which a thread waiting for a slot checks whether it was
+# terminated, as blocking on a semaphore cannot be interrupted
+_SLOT_POLL_INTERVAL = 0.5
+
+
+# _FetchPoolLocal
+#
+# Thread local storage for the fetch pool
+#
+class _FetchPoolLocal(threading.local):
+    def __init__(self) -> None:
+        super().__init__()
+
+        # Whether the current thread holds a fetch slot
+        self.holding_slot: bool = False
+
+
+# FetchPool()
+#
+# Runs independent fetch operations concurrently, such as the sources of
+# an element, within a budget of concurrent fetch operations shared by all
+# fetch jobs of the session.
+#
+# The calling thread takes a slot of the budget, waiting for one to be
+# available if needed, and hands over operations to additional threads for
+# as long as further slots are free. Operations which could not be handed
+# over are run in the calling thread, such that a fetch job always makes
+# progress, and such that nested use of the pool cannot deadlock.
+#
+# Args:
+#    messenger: The messenger, whose thread local state is propagated
+#    max_concurrent: The maximum number of concurrent fetch operations
+#
+class FetchPool:
+    def __init__(self, messenger: Messenger, max_concurrent: int):
+        self._messenger: Messenger = messenger
+        self._slots = threading.BoundedSemaphore(max(max_concurrent, 1))
+        self._locals: _FetchPoolLocal = _FetchPoolLocal()
+
+    # run()
+    #
+    # Run the given operations, returning once all of them completed.
+    #
+    # If operations fail, no further operations are started, and the error
+    # of the first failing operation in the given order is raised once the
+    # running operations completed.
+    #
+    # Args:
+    #    operations: The operations to run
+    #
+    def run(self, operations: Sequence[Callable[[], None]]) -> None:
+        if not operations:
+            return
+
+        if self._locals.holding_slot:
+            self._run_holding_slot(operations)
+            return
+
+        acquired = False
+        try:
+            while not acquired:
+                acquired = self._slots.acquire(timeout=_SLOT_POLL_INTERVAL)  # pylint: disable=consider-using-with
+
+            self._locals.holding_slot = True
+            self._run_holding_slot(operations)
+        finally:
+            self._locals.holding_slot = False
+            if acquired:
+                self._slots.release()
+
+    def _run_holding_slot(self, operations):
+        if len(operations) == 1:
+            operations[0]()
+            return
+
+        pending = list(enumerate(operations))
+        futures: List[Tuple[int, concurrent.futures.Future]] = []
+        error: Optional[Tuple[int, BaseException]] = None
+        thread_context = self._messenger.get_thread_context()
+        workers = _Workers()
+        executor = concurrent.futures.ThreadPoolExecutor(max_workers=len(operations) - 1)
+
+        try:
+            while pending and error is None:
+                # Hand over as many operations as there are free slots, keeping one to run here
+                while len(pending) > 1 and self._slots.acquire(blocking=False):  # pylint: disable=consider-using-with
+                    index, operation = pending.pop()
+                    future = executor.submit(self._run_in_worker, thread_context, operation, workers)
+                    futures.append((index, future))
+
+                index, operation = pending.pop(0)
+                try:
+                    operation()
+                except Exception as e:  # pylint: disable=broad-except
+                    error = (index, e)
+
+            for index, future in futures:
+                e = future.exception()
+                if e is not None and (error is None or index < error[0]):
+                    error = (index, e)
+        except BaseException:
+            # The job is being terminated, stop the operations handed over
+            # to other threads instead of waiting for them to complete
+            for _, future in futures:
+                if future.cancel():
+                    self._slots.release()
+            workers.terminate()
+            executor.shutdown(wait=False)
+            raise
+
+        executor.shutdown()
+
+        if error is not None:
+            raise error[1]
+
+    def _run_in_worker(self, thread_context, operation, workers):
+        self._locals.holding_slot = True
+        try:
+            with workers.running(), self._messenger.inherit_thread_context(thread_context):
+                operation()
+        finally:
+            self._locals.holding_slot = False
+            self._slots.release()
+
+
+# _Workers
+#
+# The threads running operations handed over by a FetchPool.run() call,
+# such that they can be terminated along with the calling thread.
+#
+class _Workers:
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._threads: Set[int] = set()
+        self._terminated: bool = False
+
+    # running()
+    #
+    # Context manager to register the current thread while it runs an operation
+    #
+    @contextmanager
+    def running(self) -> Iterator[None]:
+        with self._lock:
+            if self._terminated:
+                raise TerminateException()
+            self._threads.add(threading.get_ident())
+        try:
+            yield
+        finally:
+            with self._lock:
+                self._threads.discard(threading.get_ident())
+
+    # terminate()
+    #
+    # Terminate the threads running operations, and prevent further
+    # operations from starting.
+    #
+    def terminate(self) -> None:
+        with self._lock:
+            self._terminated = True
+            for thread_id in self._threads:
+                terminate_thread(thread_id)
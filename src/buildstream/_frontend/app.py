@@ -26,10 +26,12 @@ from click import UsageError
 
 # Import various buildstream internals
 from .._context import Context
+from .._logwriter import LogWriter
+from .._tracing import TRACER
 from .._project import Project
 from .._exceptions import BstError, StreamError, LoadError, AppError
 from ..exceptions import LoadErrorReason
-from .._message import Message, MessageType, unconditional_messages
+from .._message import Message, MessageType, flushed_messages, unconditional_messages
 from .._stream import Stream
 from ..types import _SchedulerErrorAction, _Scope
 from .. import node
@@ -39,6 +41,7 @@ from ..utils import UtilError
 # Import frontend assets
 from .profile import Profile
 from .status import Status
+from .eventstream import EventStream
 from .widget import LogLine
 
 # Intendation for all logging
@@ -78,6 +81,7 @@ class App:
         self._started = False  # Whether a session has started
         self._set_project_dir = False  # Whether -C option was used
         self._state = None  # Frontend reads this and registers callbacks
+        self._events = None  # The EventStream, if enabled with --event-file
 
         # UI Colors Profiles
         self._content_profile = Profile(fg="yellow")
@@ -171,7 +175,7 @@ class App:
         self._session_name = session_name
 
         # Instantiate Context
-        with Context() as context:
+        with self._traced(), Context() as context, self._buffered_log_file(), self._event_stream():
             self.context = context
 
             #
@@ -197,6 +201,7 @@ class App:
                 "pushers": "sched_pushers",
                 "max_jobs": "build_max_jobs",
                 "network_retries": "sched_network_retries",
+                "metrics_file": "sched_metrics_file",
                 "pull_buildtrees": "pull_buildtrees",
                 "cache_buildtrees": "cache_buildtrees",
             }
@@ -222,6 +227,8 @@ class App:
 
             # Register callbacks with the State
             self._state.register_task_failed_callback(self._job_failed)
+            if self._events:
+                self._events.connect(self._state)
 
             # Create the logger right before setting the message handler
             self.logger = LogLine(
@@ -822,6 +829,60 @@ class App:
 
         sys.exit(-1)
 
+    #
+    # Record a timeline of the session to the file given with --trace-file,
+    # if any, for the duration of the context manager
+    #
+    @contextmanager
+    def _traced(self):
+        trace_file = self._main_options.get("trace_file")
+        if trace_file is None:
+            yield
+            return
+
+        TRACER.start(trace_file)
+        try:
+            yield
+        finally:
+            TRACER.stop()
+
+    #
+    # Buffer writes to the main log file given with --log-file, if any,
+    # for the duration of the context manager
+    #
+    @contextmanager
+    def _buffered_log_file(self):
+        log_file = self._main_options["log_file"]
+        if log_file is None:
+            yield
+            return
+
+        log_writer = LogWriter(log_file)
+        self._main_options["log_file"] = log_writer
+        try:
+            yield
+        finally:
+            log_writer.close()
+            self._main_options["log_file"] = log_file
+
+    #
+    # Write the progress of the session to the file given with --event-file,
+    # if any, for the duration of the context manager
+    #
+    @contextmanager
+    def _event_stream(self):
+        event_file = self._main_options.get("event_file")
+        if event_file is None:
+            yield
+            return
+
+        self._events = EventStream(event_file)
+        try:
+            yield
+        finally:
+            self._events.close()
+            self._events = None
+
     #
     # Handle messages from the pipeline
     #
@@ -847,9 +908,9 @@ class App:
         if not self._cache_messages or not self.stream.running:
             self._render_cached_messages()
 
-        # Additionally log to a file
+        # Additionally log to a file, failures are written out immediately
         if self._main_options["log_file"]:
-            click.echo(text, file=self._main_options["log_file"], color=False, nl=False)
+            self._main_options["log_file"].write(click.unstyle(text), flush=message.message_type in flushed_messages)
 
     @contextmanager
     def _interrupted(self):
@@ -18,9 +18,10 @@ from functools import partial
 
 import shutil
 import click
-from .. import _yaml
 from .._exceptions import BstError, LoadError, AppError, RemoteError
+from .._refindex import RefIndex
 from .complete import main_bashcomplete, complete_path, CompleteUnhandled
+from .completioncache import CompletionCache
 from ..types import _CacheBuildTrees, _SchedulerErrorAction, _PipelineSelection, _HostMount, _Scope
 from .._remotespec import RemoteSpec, RemoteSpecPurpose
 from ..utils import UtilError
@@ -151,8 +152,16 @@ def complete_target(args, incomplete):
         # No project_conf was found in base_directory or its parents, no need
         # to try loading any project conf and avoid os.path NoneType TypeError.
         return []
-    else:
-        project_file = os.path.join(base_directory, project_conf)
+
+    # Avoid loading the project conf, and importing the YAML parser to do
+    # so, when we already know its element-path
+    project_file = os.path.join(base_directory, project_conf)
+    completion_cache = CompletionCache()
+    element_directory = completion_cache.get_element_path(project_file)
+
+    if element_directory is None:
+        from .. import _yaml
+
         try:
             project = _yaml.load(project_file, shortname=project_conf)
         except LoadError:
@@ -160,8 +169,10 @@ def complete_target(args, incomplete):
             # even bother trying to complete anything.
             return []
 
-    # The project is not required to have an element-path
-    element_directory = project.get_str("element-path", default="")
+        # The project is not required to have an element-path
+        element_directory = project.get_str("element-path", default="")
+        completion_cache.set_element_path(project_file, element_directory)
+        completion_cache.save()
 
     # If a project was loaded, use its element-path to
     # adjust our completion's base directory
@@ -176,32 +187,43 @@ def complete_target(args, incomplete):
 
 
 def complete_artifact(orig_args, args, incomplete):
-    from .._context import Context
-
-    with Context(use_casd=False) as ctx:
-
-        config = None
-        if orig_args:
-            for i, arg in enumerate(orig_args):
-                if arg in ("-c", "--config"):
-                    try:
-                        config = orig_args[i + 1]
-                    except IndexError:
-                        pass
-        if args:
-            for i, arg in enumerate(args):
-                if arg in ("-c", "--config"):
-                    try:
-                        config = args[i + 1]
-                    except IndexError:
-                        pass
-        ctx.load(config)
-
-        # element targets are valid artifact names
-        complete_list = complete_target(args, incomplete)
-        complete_list.extend(ref for ref in ctx.artifactcache.list_artifacts() if ref.startswith(incomplete))
-
-        return complete_list
+    config = None
+    if orig_args:
+        for i, arg in enumerate(orig_args):
+            if arg in ("-c", "--config"):
+                try:
+                    config = orig_args[i + 1]
+                except IndexError:
+                    pass
+    if args:
+        for i, arg in enumerate(args):
+            if arg in ("-c", "--config"):
+                try:
+                    config = args[i + 1]
+                except IndexError:
+                    pass
+
+    # element targets are valid artifact names
+    complete_list = complete_target(args, incomplete)
+
+    # Avoid loading the user configuration, and everything the Context
+    # imports, when we already know where artifacts are stored
+    completion_cache = CompletionCache()
+    artifactdir = completion_cache.get_artifactdir(config)
+
+    if artifactdir is None:
+        from .._context import Context
+
+        with Context(use_casd=False) as ctx:
+            ctx.load(config)
+            artifactdir = ctx.artifactdir
+
+        completion_cache.set_artifactdir(config, artifactdir)
+        completion_cache.save()
+
+    complete_list.extend(ref for _, ref in RefIndex(artifactdir).list_refs_mtimes() if ref.startswith(incomplete))
+
+    return complete_list
 
 
 def override_completions(orig_args, cmd, cmd_param, args, incomplete):
@@ -330,6 +352,21 @@ def print_version(ctx, param, value):
     type=click.File(mode="w", encoding="UTF-8"),
     help="A file to store the main log (allows storing the main log while in interactive mode)",
 )
+@click.option(
+    "--trace-file",
+    type=click.Path(dir_okay=False, writable=True),
+    help="A file to store a timeline of the session, in the Chrome trace event format",
+)
+@click.option(
+    "--metrics-file",
+    type=click.Path(dir_okay=False, writable=True),
+    help="A file to export metrics of the session to, in the OpenMetrics text format",
+)
+@click.option(
+    "--event-file",
+    type=click.File(mode="w", encoding="UTF-8"),
+    help="A file to write the progress of the session to, as JSON lines",
+)
 @click.option("--colors/--no-colors", default=None, help="Force enable/disable ANSI color codes in output")
 @click.option(
     "--strict/--no-strict",
@@ -0,0 +1,159 @@
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+#
+import json
+import os
+import tempfile
+from typing import Dict, List, Optional
+
+# Version of the format of the cache file, to discard caches written by
+# other versions of BuildStream
+_FORMAT_VERSION = 1
+
+
+# CompletionCache()
+#
+# Remembers what shell completion learned from loading configuration files,
+# such that completing does not need to load them again, nor import the
+# modules needed to load them, for as long as they are unchanged:
+#
+#   * The element path of projects, valid as long as the project.conf
+#     file is unchanged
+#
+#   * The artifact directory resolved from the user configuration, valid
+#     as long as the user configuration files and the environment
+#     variables which locate them are unchanged
+#
+# This only uses the standard library, as importing anything else would
+# defeat its purpose. Errors reading or writing the cache are ignored,
+# completion then falls back to loading the configuration.
+#
+# Args:
+#    path: The cache file, or None for the default location
+#
+class CompletionCache:
+    def __init__(self, path: Optional[str] = None) -> None:
+        if path is None:
+            cache_home = os.environ.get("XDG_CACHE_HOME") or os.path.expanduser("~/.cache")
+            path = os.path.join(cache_home, "buildstream", "completion.json")
+
+        self._path: str = path
+        self._data: Dict[str, Dict] = {"element-paths": {}, "artifactdirs": {}}
+        self._dirty: bool = False
+
+        try:
+            with open(self._path, encoding="utf-8") as f:
+                data = json.load(f)
+            if data.get("version") == _FORMAT_VERSION:
+                self._data = data
+        except (OSError, ValueError, AttributeError):
+            pass
+
+    # get_element_path()
+    #
+    # Args:
+    #    project_conf: The path to the project.conf file
+    #
+    # Returns:
+    #    The element path of the project, or None if it is not cached
+    #
+    def get_element_path(self, project_conf: str) -> Optional[str]:
+        return self._get("element-paths", os.path.abspath(project_conf), _file_keys([project_conf]))
+
+    # set_element_path()
+    #
+    # Args:
+    #    project_conf: The path to the project.conf file
+    #    element_path: The element path of the project
+    #
+    def set_element_path(self, project_conf: str, element_path: str) -> None:
+        self._set("element-paths", os.path.abspath(project_conf), _file_keys([project_conf]), element_path)
+
+    # get_artifactdir()
+    #
+    # Args:
+    #    config: The user specified configuration file, if any
+    #
+    # Returns:
+    #    The artifact directory, or None if it is not cached
+    #
+    def get_artifactdir(self, config: Optional[str]) -> Optional[str]:
+        return self._get("artifactdirs", config or "", self._config_keys(config))
+
+    # set_artifactdir()
+    #
+    # Args:
+    #    config: The user specified configuration file, if any
+    #    artifactdir: The artifact directory resolved from the configuration
+    #
+    def set_artifactdir(self, config: Optional[str], artifactdir: str) -> None:
+        self._set("artifactdirs", config or "", self._config_keys(config), artifactdir)
+
+    # save()
+    #
+    # Save the cache, if it was modified
+    #
+    def save(self) -> None:
+        if not self._dirty:
+            return
+
+        self._data["version"] = _FORMAT_VERSION
+        directory = os.path.dirname(self._path)
+        try:
+            os.makedirs(directory, exist_ok=True)
+            fd, tempname = tempfile.mkstemp(dir=directory, prefix=".completion-")
+            try:
+                with os.fdopen(fd, "w", encoding="utf-8") as f:
+                    json.dump(self._data, f)
+                os.replace(tempname, self._path)
+            except BaseException:
+                os.unlink(tempname)
+                raise
+        except OSError:
+            return
+
+        self._dirty = False
+
+    def _get(self, section: str, name: str, keys: List) -> Optional[str]:
+        entry = self._data.get(section, {}).get(name)
+        if entry is None or entry["keys"] != keys:
+            return None
+        return entry["value"]
+
+    def _set(self, section: str, name: str, keys: List, value: str) -> None:
+        self._data.setdefault(section, {})[name] = {"keys": keys, "value": value}
+        self._dirty = True
+
+    # The keys an artifact directory resolved from the user configuration
+    # depends on, mirroring how Context.load() locates configuration files
+    def _config_keys(self, config: Optional[str]) -> List:
+        environment = [os.environ.get(name) for name in ("HOME", "XDG_CACHE_HOME", "XDG_CONFIG_HOME")]
+        if config:
+            files = [config]
+        else:
+            config_home = os.environ.get("XDG_CONFIG_HOME") or os.path.expanduser("~/.config")
+            files = [os.path.join(config_home, name) for name in ("buildstream2.conf", "buildstream.conf")]
+        return [environment, _file_keys(files)]
+
+
+# Identify the content of files by their path and modification time
+#
+def _file_keys(paths: List[str]) -> List:
+    keys = []
+    for path in paths:
+        try:
+            mtime = os.stat(path).st_mtime_ns
+        except OSError:
+            mtime = None
+        keys.append([os.path.abspath(path), mtime])
+    return keys
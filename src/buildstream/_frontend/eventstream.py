@@ -0,0 +1,123 @@
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+#
+from typing import TYPE_CHECKING, Dict, Optional, TextIO, Tuple
+
+import ujson
+
+from .._logwriter import LogWriter
+
+if TYPE_CHECKING:
+    from .._state import State, Task
+
+
+# EventStream()
+#
+# Writes the progress of the session as a stream of JSON objects, one per
+# line, for tools wrapping BuildStream to follow without parsing the
+# terminal output.
+#
+# Every event has an "event" member naming the type of the event, and a
+# "time" member with the time elapsed since the start of the session, in
+# seconds. The types of events are:
+#
+#   task-added:   A task was started, with its "id", the "action" of the
+#                 queue it belongs to and the "name" of what it processes
+#
+#   task-removed: A task ended, with the same members as task-added
+#
+#   task-failed:  A task failed, with the same members as task-added,
+#                 this is followed by its task-removed event
+#
+#   queue:        The counts of tasks a queue completed changed, with the
+#                 "name" of the queue and its "processed", "skipped" and
+#                 "failed" counts
+#
+# Events are buffered and written out in batches, except for failures
+# which are written out immediately.
+#
+# Args:
+#    file: The file to write events to
+#
+class EventStream:
+    def __init__(self, file: TextIO) -> None:
+        self._writer: LogWriter = LogWriter(file)
+        self._state: Optional["State"] = None
+        self._tasks: Dict[str, "Task"] = {}
+        self._queues: Dict[str, Tuple[int, int, int]] = {}
+
+    # connect()
+    #
+    # Start writing events for the given state
+    #
+    # Args:
+    #    state: The state of the session
+    #
+    def connect(self, state: "State") -> None:
+        self._state = state
+        state.register_task_added_callback(self._task_added)
+        state.register_task_removed_callback(self._task_removed)
+        state.register_task_failed_callback(self._task_failed)
+        state.register_task_groups_changed_callback(self._task_groups_changed)
+
+    # close()
+    #
+    # Stop writing events, and write out buffered events
+    #
+    def close(self) -> None:
+        if self._state:
+            self._state.unregister_task_added_callback(self._task_added)
+            self._state.unregister_task_removed_callback(self._task_removed)
+            self._state.unregister_task_failed_callback(self._task_failed)
+            self._state.unregister_task_groups_changed_callback(self._task_groups_changed)
+            self._state = None
+
+        self._writer.close()
+
+    def _task_added(self, task_id: str) -> None:
+        task = self._state.tasks[task_id]
+        self._tasks[task_id] = task
+        self._task_event("task-added", task)
+
+    def _task_removed(self, task_id: str) -> None:
+        # The task is already removed from the state
+        task = self._tasks.pop(task_id, None)
+        if task:
+            self._task_event("task-removed", task)
+
+    def _task_failed(self, task_id: str, element=None) -> None:
+        task = self._tasks.get(task_id)
+        if task:
+            self._task_event("task-failed", task, flush=True)
+
+    def _task_groups_changed(self) -> None:
+        for group in self._state.task_groups.values():
+            counts = (group.processed_tasks, group.skipped_tasks, len(group.failed_tasks))
+            if self._queues.get(group.name) != counts:
+                self._queues[group.name] = counts
+                self._write(
+                    {
+                        "event": "queue",
+                        "name": group.name,
+                        "processed": counts[0],
+                        "skipped": counts[1],
+                        "failed": counts[2],
+                    }
+                )
+
+    def _task_event(self, event: str, task: "Task", *, flush: bool = False) -> None:
+        self._write({"event": event, "id": task.id, "action": task.action_name, "name": task.full_name}, flush=flush)
+
+    def _write(self, event: Dict, *, flush: bool = False) -> None:
+        event["time"] = self._state.elapsed_time().total_seconds()
+        self._writer.write(ujson.dumps(event) + "\n", flush=flush)
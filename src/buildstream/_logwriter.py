@@ -0,0 +1,172 @@
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+#
+import atexit
+import threading
+import time
+import weakref
+from contextlib import contextmanager
+from typing import Iterator, List, Optional, TextIO
+
+# Interval at which buffered text is written out, in seconds
+_FLUSH_INTERVAL = 0.5
+
+# Amount of buffered text above which it is written out immediately
+_MAX_PENDING = 64 * 1024
+
+
+# LogWriter()
+#
+# Buffers text written to a log file, such that frequent messages do not
+# each cost a write and a flush of the file.
+#
+# Buffered text is written out by a single thread shared by all log
+# writers at a regular interval, or by the writing thread as soon as too
+# much text is buffered. Text is written out in the order in which it was
+# written to the log writer.
+#
+# The file handle remains owned by the caller, which must close() the log
+# writer before closing the file.
+#
+# Args:
+#    file: The file to write to
+#
+class LogWriter:
+    def __init__(self, file: TextIO) -> None:
+        self.file: TextIO = file
+
+        # This is reentrant as SIGTERM handlers may flush from the main
+        # thread while it was writing
+        self._lock = threading.RLock()
+        self._pending: List[str] = []
+        self._pending_size: int = 0
+        self._direct_depth: int = 0
+        self._closed: bool = False
+
+        _flusher.add(self)
+
+    # write()
+    #
+    # Write text to the log
+    #
+    # Args:
+    #    text: The text to write
+    #    flush: Whether to write out the text immediately
+    #
+    def write(self, text: str, *, flush: bool = False) -> None:
+        with self._lock:
+            self._pending.append(text)
+            self._pending_size += len(text)
+
+            if flush or self._direct_depth or self._pending_size >= _MAX_PENDING:
+                self._flush_locked()
+
+    # flush()
+    #
+    # Write out any buffered text and flush the file
+    #
+    def flush(self) -> None:
+        with self._lock:
+            self._flush_locked()
+
+    # direct()
+    #
+    # Context manager giving access to the file, for other writers such as
+    # subprocesses to write to it directly.
+    #
+    # Buffered text is written out first, and text is written out
+    # immediately for as long as the file is in use, such that the
+    # content of the log remains ordered.
+    #
+    # Yields:
+    #    The file handle
+    #
+    @contextmanager
+    def direct(self) -> Iterator[TextIO]:
+        with self._lock:
+            self._flush_locked()
+            self._direct_depth += 1
+        try:
+            yield self.file
+        finally:
+            with self._lock:
+                self._direct_depth -= 1
+
+    # close()
+    #
+    # Write out any buffered text, and stop using the file
+    #
+    def close(self) -> None:
+        with self._lock:
+            self._flush_locked()
+            self._closed = True
+        _flusher.discard(self)
+
+    def _flush_locked(self) -> None:
+        if self._closed or not self._pending:
+            return
+
+        text = "".join(self._pending)
+        self._pending = []
+        self._pending_size = 0
+        self.file.write(text)
+        self.file.flush()
+
+
+# _LogFlusher()
+#
+# The thread writing out the buffered text of all log writers
+#
+class _LogFlusher:
+    def __init__(self) -> None:
+        self._writers: "weakref.WeakSet[LogWriter]" = weakref.WeakSet()
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+
+    def add(self, writer: LogWriter) -> None:
+        with self._lock:
+            self._writers.add(writer)
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="LogFlusher", daemon=True)
+                self._thread.start()
+
+    def discard(self, writer: LogWriter) -> None:
+        with self._lock:
+            self._writers.discard(writer)
+
+    # flush_all()
+    #
+    # Write out the buffered text of all log writers
+    #
+    def flush_all(self) -> None:
+        with self._lock:
+            writers = list(self._writers)
+
+        for writer in writers:
+            try:
+                writer.flush()
+            except (OSError, ValueError):
+                # The file may have been closed or may not be writable
+                # anymore, there is nothing we can do about it here
+                pass
+
+    def _run(self) -> None:
+        while True:
+            time.sleep(_FLUSH_INTERVAL)
+            self.flush_all()
+
+
+_flusher = _LogFlusher()
+
+# Don't lose buffered text when exiting without closing log writers
+atexit.register(_flusher.flush_all)
@@ -43,6 +43,11 @@ class MessageType:
 # they are currently silenced or not
 unconditional_messages = [MessageType.INFO, MessageType.WARN, MessageType.FAIL, MessageType.ERROR, MessageType.BUG]
 
+# Messages which are written out to log files immediately, such that
+# they are not lost if the process is killed before buffered text is
+# written out
+flushed_messages = [MessageType.FAIL, MessageType.ERROR, MessageType.BUG]
+
 
 # Message object
 #
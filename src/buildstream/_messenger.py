@@ -18,12 +18,14 @@ import os
 import datetime
 import threading
 from contextlib import contextmanager
-from typing import Optional, Callable, Iterator, TextIO
+from typing import Optional, Callable, Iterator, TextIO, Tuple
 
 from .types import _DisplayKey
 from . import _signals
 from ._exceptions import BstError
-from ._message import Message, MessageType, unconditional_messages
+from ._logwriter import LogWriter
+from ._tracing import TRACER, Categories
+from ._message import Message, MessageType, flushed_messages, unconditional_messages
 from ._state import State, Task
 from ._version import get_versions
 
@@ -67,8 +69,8 @@ class _MessengerLocal(threading.local):
     def __init__(self) -> None:
         super().__init__()
 
-        # The open file handle for this task
-        self.log_handle: Optional[TextIO] = None
+        # The writer for the open log file of this task
+        self.log_writer: Optional[LogWriter] = None
 
         # The filename for this task
         self.log_filename: Optional[str] = None
@@ -129,6 +131,42 @@ class Messenger:
         self._locals.silence_scope_depth = 0
         self._locals.job = _JobInfo(action_name, element_name, element_key)
 
+    # get_thread_context()
+    #
+    # Get the thread local context of the calling thread, such that work
+    # done on behalf of the current task in other threads can be attributed
+    # to the task with inherit_thread_context().
+    #
+    # Returns:
+    #    An opaque object representing the thread local context
+    #
+    def get_thread_context(self) -> Tuple:
+        return (
+            self._locals.job,
+            self._locals.log_writer,
+            self._locals.log_filename,
+            self._locals.silence_scope_depth,
+        )
+
+    # inherit_thread_context()
+    #
+    # Context manager to use the thread local context of another thread in
+    # the calling thread.
+    #
+    # Args:
+    #    thread_context: The context obtained with get_thread_context()
+    #
+    @contextmanager
+    def inherit_thread_context(self, thread_context: Tuple) -> Iterator[None]:
+        locals_ = self._locals
+        saved_context = self.get_thread_context()
+
+        locals_.job, locals_.log_writer, locals_.log_filename, locals_.silence_scope_depth = thread_context
+        try:
+            yield
+        finally:
+            locals_.job, locals_.log_writer, locals_.log_filename, locals_.silence_scope_depth = saved_context
+
     # set_message_handler()
     #
     # Sets the handler for any status messages propagated through
@@ -299,7 +337,7 @@ class Messenger:
     def timed_activity(
         self, activity_name: str, *, detail: str = None, silent_nested: bool = False, **kwargs
     ) -> Iterator[None]:
-        with self.timed_suspendable() as timedata:
+        with self.timed_suspendable() as timedata, self._trace_activity(activity_name, kwargs):
             try:
                 # Push activity depth for status messages
                 message = Message(MessageType.START, activity_name, detail=detail, **kwargs)
@@ -389,10 +427,13 @@ class Messenger:
     #
     # In addition to automatically writing all messages to the
     # specified logging file, an open file handle for process stdout
-    # and stderr will be available via the Messenger.get_log_handle() API,
+    # and stderr will be available via the Messenger.direct_log_handle() API,
     # and the full logfile path will be available via the
     # Messenger.get_log_filename() API.
     #
+    # Messages are buffered and written out to the log file in the
+    # background, except for failures which are written out immediately.
+    #
     # Args:
     #    filename: A logging directory relative filename,
     #              the pid and .log extension will be automatically
@@ -407,7 +448,7 @@ class Messenger:
     def recorded_messages(self, filename: str, logdir: str) -> Iterator[str]:
         # We dont allow recursing in this context manager, and
         # we also do not allow it in the main process.
-        assert not hasattr(self._locals, "log_handle") or self._locals.log_handle is None
+        assert not hasattr(self._locals, "log_writer") or self._locals.log_writer is None
         assert not hasattr(self._locals, "log_filename") or self._locals.log_filename is None
 
         # Create the fully qualified logfile in the log directory,
@@ -422,6 +463,7 @@ class Messenger:
         os.makedirs(directory, exist_ok=True)
 
         with open(self._locals.log_filename, "a", encoding="utf-8") as logfile:
+            log_writer = LogWriter(logfile)
 
             # Write one last line to the log and flush it to disk
             def flush_log():
@@ -431,36 +473,48 @@ class Messenger:
                 #
                 # So just try to flush as well as we can at SIGTERM time
                 try:
-                    logfile.write("\n\nForcefully terminated\n")
-                    logfile.flush()
+                    log_writer.write("\n\nForcefully terminated\n", flush=True)
                 except RuntimeError:
                     os.fsync(logfile.fileno())
 
             # Unconditionally record date and buildstream version at the beginning of any log file
             #
             starttime = datetime.datetime.now()
-            logfile.write(
+            log_writer.write(
                 "BuildStream {} - {}\n".format(self._bst_version, starttime.strftime("%A, %d-%m-%Y at %H:%M:%S"))
             )
 
-            self._locals.log_handle = logfile
-            with _signals.terminator(flush_log):
-                yield self._locals.log_filename
-
-            self._locals.log_handle = None
-            self._locals.log_filename = None
+            self._locals.log_writer = log_writer
+            try:
+                with _signals.terminator(flush_log):
+                    yield self._locals.log_filename
+            finally:
+                log_writer.close()
+                self._locals.log_writer = None
+                self._locals.log_filename = None
 
-    # get_log_handle()
+    # direct_log_handle()
     #
-    # Fetches the active log handle, this will return the active
-    # log file handle when the Messenger.recorded_messages() context
-    # manager is active
+    # Context manager giving access to the active log file handle when
+    # the Messenger.recorded_messages() context manager is active, for
+    # subprocesses to write their output to it.
     #
-    # Returns:
+    # Messages are written out to the log file immediately while the
+    # handle is in use, such that they remain ordered with the output
+    # written to the handle.
+    #
+    # Yields:
     #    The active logging file handle, or None
     #
-    def get_log_handle(self) -> Optional[TextIO]:
-        return self._locals.log_handle
+    @contextmanager
+    def direct_log_handle(self) -> Iterator[Optional[TextIO]]:
+        log_writer = self._locals.log_writer
+        if log_writer is None:
+            yield None
+            return
+
+        with log_writer.direct() as log_handle:
+            yield log_handle
 
     # get_log_filename()
     #
@@ -508,6 +562,23 @@ class Messenger:
     def _silent_messages(self) -> bool:
         return self._locals.silence_scope_depth > 0
 
+    # _trace_activity()
+    #
+    # Record an activity in the session trace, if tracing is enabled
+    #
+    # Args:
+    #    activity_name: The name of the activity
+    #    kwargs: The Message() constructor keyword arguments of the activity
+    #
+    def _trace_activity(self, activity_name: str, kwargs: dict):
+        element_name = kwargs.get("element_name")
+        if element_name is None and self._locals.job is not None:
+            element_name = self._locals.job.element_name
+
+        if element_name is None:
+            return TRACER.span(activity_name, Categories.ACTIVITY)
+        return TRACER.span(activity_name, Categories.ACTIVITY, element=element_name)
+
     # _record_message()
     #
     # Records the message if recording is enabled
@@ -517,7 +588,7 @@ class Messenger:
     #
     def _record_message(self, message: Message) -> None:
 
-        if self._locals.log_handle is None:
+        if self._locals.log_writer is None:
             return
 
         INDENT = "    "
@@ -560,9 +631,9 @@ class Messenger:
             detail=detail,
         )
 
-        # Write to the open log file
-        self._locals.log_handle.write("{}\n".format(text))
-        self._locals.log_handle.flush()
+        # Write to the open log file, failures are written out immediately
+        # such that they are not lost if the process dies.
+        self._locals.log_writer.write("{}\n".format(text), flush=message.message_type in flushed_messages)
 
     # _render_status()
     #
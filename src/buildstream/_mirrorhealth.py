@@ -0,0 +1,321 @@
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+#
+import os
+import socket
+import threading
+import time
+import urllib.error
+import urllib.parse
+from contextlib import contextmanager
+from typing import Dict, List, Optional, Sequence
+
+import ujson
+
+from . import utils
+
+# Bump this when the format of the health file changes
+_MIRROR_HEALTH_VERSION = 1
+
+# Weight of the latest sample in the moving averages of measurements
+_SMOOTHING = 0.3
+
+# Transfers smaller than this only measure the latency of a host
+_THROUGHPUT_MIN_SIZE = 64 * 1024
+
+# The size of a typical download, used to weigh the latency of a
+# host against its throughput
+_REFERENCE_SIZE = 4 * 1024 * 1024
+
+# Mirrors are skipped for this many seconds after failing, doubling
+# with each consecutive failure up to the maximum
+_BACKOFF_BASE = 60
+_BACKOFF_MAX = 3600
+
+# The operation running in the current thread, see MirrorHealth.measure()
+_current = threading.local()
+
+
+# _HostHealth
+#
+# The health of a single mirror host.
+#
+class _HostHealth:
+    def __init__(
+        self, latency=None, throughput=None, successes=0, failures=0, consecutive_failures=0, retry_after=0.0
+    ):
+        self.latency: Optional[float] = latency  # Moving average until the host responds, in seconds
+        self.throughput: Optional[float] = throughput  # Moving average of transfers, in bytes per second
+        self.successes: int = successes
+        self.failures: int = failures
+        self.consecutive_failures: int = consecutive_failures
+        self.retry_after: float = retry_after  # Wall clock time until which the host is skipped
+
+    def to_list(self):
+        return [
+            self.latency,
+            self.throughput,
+            self.successes,
+            self.failures,
+            self.consecutive_failures,
+            self.retry_after,
+        ]
+
+    # The expected duration of downloading a typical file from the host,
+    # or None if it was not measured yet
+    def expected_duration(self) -> Optional[float]:
+        if self.latency is None or self.throughput is None:
+            return None
+        return self.latency + _REFERENCE_SIZE / self.throughput
+
+
+# MirrorHealth
+#
+# A table of the health of the hosts which sources are fetched and tracked
+# from, recording their latency and throughput, and how often they could
+# not be reached.
+#
+# It is used to order the URIs an alias can be substituted with, such that
+# the mirrors which transfer fastest are tried first, and such that mirrors
+# which could not be reached recently are only tried once all others have
+# failed. Unreachable mirrors are given an exponential back-off.
+#
+# Reachability is recorded for all sources, whereas the latency and
+# throughput are only known for sources which report their transfers
+# with record_transfer().
+#
+# The table is shared by all fetch and track jobs of a session, and it is
+# persisted in the cache directory for the next sessions.
+#
+# Args:
+#    path (str): The file to persist the table in
+#
+class MirrorHealth:
+    def __init__(self, path: str):
+        self._path: str = path
+        self._lock = threading.Lock()
+        self._hosts: Dict[str, _HostHealth] = self._load()
+        self._dirty: bool = False
+
+    # order()
+    #
+    # Order the substitutions of an alias by health.
+    #
+    # Substitutions of hosts which are in back-off are moved to the end.
+    # When `by_speed` is set, the other substitutions are ordered by the
+    # expected duration of a download, hosts which were not measured yet
+    # keeping their configured position relative to the fastest host which
+    # is not in back-off. Substitutions of the default mirror are never
+    # moved, such that they are still tried first.
+    #
+    # Args:
+    #    substitutions (list): The AliasSubstitution objects, in configured order
+    #    by_speed (bool): Whether to prefer the fastest hosts
+    #
+    # Returns:
+    #    (list): The ordered substitutions
+    #
+    def order(self, substitutions: Sequence, *, by_speed: bool = True) -> List:
+        if len(substitutions) < 2:
+            return list(substitutions)
+
+        now = time.time()
+        with self._lock:
+            health = [self._hosts.get(_host_key(substitution)) for substitution in substitutions]
+            durations = [h.expected_duration() if h is not None else None for h in health]
+
+        backoff = [h is not None and h.retry_after > now for h in health]
+        measured = [d for d, b in zip(durations, backoff) if d is not None and not b]
+        best = min(measured) if measured else 0.0
+
+        def sort_key(index):
+            substitution = substitutions[index]
+            if substitution is not None and substitution._default_mirror:
+                return (False, 0.0, index)
+            duration = 0.0
+            if by_speed:
+                duration = durations[index] if durations[index] is not None else best
+            return (backoff[index], duration, index)
+
+        return [substitutions[index] for index in sorted(range(len(substitutions)), key=sort_key)]
+
+    # record_success()
+    #
+    # Record a successful operation, ending any back-off of the host.
+    #
+    # Args:
+    #    substitution (AliasSubstitution): The substitution which was used
+    #
+    def record_success(self, substitution) -> None:
+        key = _host_key(substitution)
+        if key is None:
+            return
+
+        with self._lock:
+            h = self._hosts.setdefault(key, _HostHealth())
+            h.successes += 1
+            h.consecutive_failures = 0
+            h.retry_after = 0.0
+            self._dirty = True
+
+    # measure()
+    #
+    # Attribute the transfers reported with record_transfer() in the current
+    # thread to the host of a substitution, for the duration of the context.
+    #
+    # Args:
+    #    substitution (AliasSubstitution): The substitution which is used
+    #
+    @contextmanager
+    def measure(self, substitution):
+        previous = getattr(_current, "operation", None)
+        _current.operation = (self, _host_key(substitution))
+        try:
+            yield
+        finally:
+            _current.operation = previous
+
+    # record_failure()
+    #
+    # Record that a host could not be reached, putting it in back-off.
+    #
+    # Args:
+    #    substitution (AliasSubstitution): The substitution which was used
+    #
+    def record_failure(self, substitution) -> None:
+        key = _host_key(substitution)
+        if key is None:
+            return
+
+        with self._lock:
+            h = self._hosts.setdefault(key, _HostHealth())
+            h.failures += 1
+            h.consecutive_failures += 1
+            backoff = min(_BACKOFF_BASE * 2 ** (h.consecutive_failures - 1), _BACKOFF_MAX)
+            h.retry_after = time.time() + backoff
+            self._dirty = True
+
+    # save()
+    #
+    # Persist the table, if it was modified.
+    #
+    # Raises:
+    #    (OSError): If writing the file fails
+    #
+    def save(self) -> None:
+        with self._lock:
+            if not self._dirty:
+                return
+
+            data = {
+                "version": _MIRROR_HEALTH_VERSION,
+                "hosts": {key: h.to_list() for key, h in self._hosts.items()},
+            }
+            self._dirty = False
+
+        os.makedirs(os.path.dirname(self._path), exist_ok=True)
+        with utils.save_file_atomic(self._path, "w", encoding="utf-8") as f:
+            ujson.dump(data, f)
+
+    def _record_transfer(self, key: str, latency: float, size: int, duration: float) -> None:
+        with self._lock:
+            h = self._hosts.setdefault(key, _HostHealth())
+            h.latency = _smooth(h.latency, latency)
+            transfer_time = duration - latency
+            if size >= _THROUGHPUT_MIN_SIZE and transfer_time > 0:
+                h.throughput = _smooth(h.throughput, size / transfer_time)
+            self._dirty = True
+
+    def _load(self) -> Dict[str, _HostHealth]:
+        try:
+            with open(self._path, "r", encoding="utf-8") as f:
+                data = ujson.load(f)
+        except (OSError, ValueError):
+            return {}
+
+        if not isinstance(data, dict) or data.get("version") != _MIRROR_HEALTH_VERSION:
+            return {}
+
+        try:
+            return {key: _HostHealth(*values) for key, values in data["hosts"].items()}
+        except (KeyError, TypeError, AttributeError):
+            return {}
+
+
+# record_transfer()
+#
+# Report a transfer from the host which is being measured in the current
+# thread, if any, see MirrorHealth.measure().
+#
+# Args:
+#    latency (float): How long the host took to respond, in seconds
+#    size (int): The number of bytes transferred
+#    duration (float): How long the whole transfer took, in seconds
+#
+def record_transfer(latency: float, size: int, duration: float) -> None:
+    operation = getattr(_current, "operation", None)
+    if operation is None:
+        return
+
+    health, key = operation
+    if key is not None:
+        health._record_transfer(key, latency, size, duration)
+
+
+# Update a moving average with a new sample
+def _smooth(average: Optional[float], sample: float) -> float:
+    if average is None:
+        return sample
+    return _SMOOTHING * sample + (1 - _SMOOTHING) * average
+
+
+# The key under which the health of the host of a substitution is recorded
+def _host_key(substitution) -> Optional[str]:
+    if substitution is None:
+        return None
+
+    mirror = substitution._mirror
+    if not isinstance(mirror, str):
+        # Source mirror plugins may translate to any host
+        return "plugin:{}".format(mirror.name)
+
+    netloc = urllib.parse.urlsplit(mirror).netloc
+    if not netloc:
+        # Local paths and file: urls
+        return None
+
+    return netloc
+
+
+# is_connection_failure()
+#
+# Whether an error was caused by a host not being reachable, as opposed to
+# the host reporting an error such as a missing file, or the fetched content
+# being wrong. Only the former puts a mirror in back-off.
+#
+# Args:
+#    error (BaseException): The error
+#
+# Returns:
+#    (bool): Whether the error, or any error it was raised from, is a
+#            connection or timeout error
+#
+def is_connection_failure(error: Optional[BaseException]) -> bool:
+    while error is not None:
+        if isinstance(error, urllib.error.URLError) and not isinstance(error, urllib.error.HTTPError):
+            if is_connection_failure(error.reason if isinstance(error.reason, BaseException) else None):
+                return True
+        elif isinstance(error, (ConnectionError, TimeoutError, socket.timeout, socket.gaierror, socket.herror)):
+            return True
+        error = error.__cause__ or error.__context__
+    return False
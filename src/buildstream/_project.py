@@ -475,6 +475,7 @@ class Project:
                 return [None]
 
         uri_list: List[Union[SourceMirror, str]] = []
+        default_uris: List[Union[SourceMirror, str]] = []
         policy = self._context.track_source if tracking else self._context.fetch_source
 
         if policy in (_SourceUriPolicy.ALL, _SourceUriPolicy.MIRRORS) or (
@@ -484,14 +485,16 @@ class Project:
                 list_to_add = mirror._get_alias_uris(alias)
 
                 if mirror_name == config.default_mirror:
-                    uri_list = list_to_add + uri_list
+                    default_uris = list_to_add
                 else:
                     uri_list += list_to_add
 
         if policy in (_SourceUriPolicy.ALL, _SourceUriPolicy.ALIASES):
             uri_list.append(config._aliases.get_str(alias))
 
-        return [AliasSubstitution(alias, mirror) for mirror in uri_list]
+        return [AliasSubstitution(alias, mirror, _default_mirror=True) for mirror in default_uris] + [
+            AliasSubstitution(alias, mirror) for mirror in uri_list
+        ]
 
     # load_elements()
     #
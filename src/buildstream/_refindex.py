@@ -0,0 +1,319 @@
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+#
+import fcntl
+import os
+import re
+import threading
+from contextlib import contextmanager
+from typing import Dict, Iterator, List, Optional, Set, Tuple
+
+from . import utils
+
+# The journal is compacted once it holds this many more entries than refs and directories
+_COMPACT_THRESHOLD = 4096
+
+
+# RefIndex()
+#
+# An index of the refs stored as files in a directory tree, along with
+# their modification times, such that listing refs does not need to walk
+# the directory tree and stat every ref.
+#
+# The index is a journal of the refs written, used and removed, which
+# multiple processes sharing the cache append to. It is built by walking
+# the directory tree the first time it is needed, and compacted once it
+# holds many more entries than there are refs.
+#
+# The journal also records the modification times of the directories of
+# the tree, which change whenever a ref is created or removed. Listing
+# refs compares them with the directories on disk, which only needs to
+# stat the directories, and rebuilds the index if refs were created or
+# removed without it being updated, for instance by older versions of
+# BuildStream.
+#
+# Each line of the journal either records a ref which was written or
+# used, as "+ <mtime> <ref>", a ref which was removed, as "- <ref>", or
+# the modification time of a directory, as "d <mtime_ns> <directory>",
+# with "-" as the time of removed directories. Refs never contain
+# spaces or newlines.
+#
+# Refs which are used are only recorded in memory, and appended to the
+# journal all at once when the index is flushed, as refs are used much
+# more often than they are written.
+#
+# When the index cannot be written, for instance as the cache is read
+# only, refs are listed by walking the directory tree instead.
+#
+# Args:
+#    refdir: The directory containing the refs
+#
+class RefIndex:
+    def __init__(self, refdir: str) -> None:
+        self._refdir: str = refdir
+        self._path: str = os.path.normpath(refdir) + ".index"
+        self._lock_path: str = self._path + ".lock"
+        self._touched: Set[str] = set()  # Refs used since the index was last flushed
+        self._touched_lock = threading.Lock()
+
+    # add()
+    #
+    # Record that a ref was written
+    #
+    # Args:
+    #    ref: The ref which was written
+    #
+    def add(self, ref: str) -> None:
+        try:
+            mtime = os.path.getmtime(os.path.join(self._refdir, ref))
+        except FileNotFoundError:
+            # Removed again in the meantime
+            return
+        self._append(["+ {} {}\n".format(mtime, ref)], ref)
+
+    # touch()
+    #
+    # Record that a ref was used such that its modification time was
+    # updated. This is only recorded in the journal by flush().
+    #
+    # Args:
+    #    ref: The ref which was used
+    #
+    def touch(self, ref: str) -> None:
+        with self._touched_lock:
+            self._touched.add(ref)
+
+    # flush()
+    #
+    # Record the modification times of the refs used since the index was
+    # last flushed in the journal
+    #
+    def flush(self) -> None:
+        with self._touched_lock:
+            touched, self._touched = self._touched, set()
+
+        lines = []
+        for ref in sorted(touched):
+            try:
+                mtime = os.path.getmtime(os.path.join(self._refdir, ref))
+            except FileNotFoundError:
+                # Removed in the meantime
+                continue
+            lines.append("+ {} {}\n".format(mtime, ref))
+
+        if lines:
+            self._append(lines)
+
+    # remove()
+    #
+    # Record that a ref was removed
+    #
+    # Args:
+    #    ref: The ref which was removed
+    #
+    def remove(self, ref: str) -> None:
+        self._append(["- {}\n".format(ref)], ref)
+
+    # list_refs_mtimes()
+    #
+    # List the refs in the index
+    #
+    # Args:
+    #    glob_expr: Optional glob expression the refs must match
+    #
+    # Returns:
+    #    An iterator of tuples of mtime and ref
+    #
+    def list_refs_mtimes(self, *, glob_expr: Optional[str] = None) -> Iterator[Tuple[float, str]]:
+        self.flush()
+        try:
+            refs = self._load()
+        except OSError:
+            refs = self._walk()[0]
+
+        if not glob_expr:
+            return ((mtime, ref) for ref, mtime in refs.items())
+
+        # Only the refs in the directory given by the glob can match, when
+        # it contains no glob characters
+        prefix = os.path.dirname(glob_expr)
+        if any(c in "*?[" for c in prefix):
+            prefix = ""
+        elif prefix:
+            prefix += "/"
+
+        regexer = re.compile(utils._glob2re(glob_expr))
+        return ((mtime, ref) for ref, mtime in refs.items() if ref.startswith(prefix) and regexer.match(ref))
+
+    # Load the refs from the journal, building, rebuilding or compacting
+    # it as needed
+    #
+    def _load(self) -> Dict[str, float]:
+        with self._lock(fcntl.LOCK_SH):
+            if os.path.exists(self._path):
+                refs, dirs, entries = self._read()
+            else:
+                refs, dirs, entries = None, {}, 0
+
+        if refs is None or self._is_stale(dirs):
+            return self._rebuild()
+        if entries > len(refs) + len(dirs) + _COMPACT_THRESHOLD:
+            return self._compact()
+        return refs
+
+    # Append lines to the journal, along with the modification times of the
+    # directories of the given ref, if any. The journal is built first if it
+    # does not exist yet.
+    #
+    # Failing to write to the journal is ignored, the index is rebuilt once
+    # it is found to be stale.
+    #
+    def _append(self, lines: List[str], ref: Optional[str] = None) -> None:
+        try:
+            with self._lock(fcntl.LOCK_SH):
+                if os.path.exists(self._path):
+                    if ref is not None:
+                        lines = lines + self._dir_lines(ref)
+                    with open(self._path, "a", encoding="utf-8") as f:
+                        f.write("".join(lines))
+                    return
+
+            self._rebuild()
+        except OSError:
+            pass
+
+    # The lines recording the modification times of the directories
+    # containing a ref, up to the root of the tree
+    #
+    def _dir_lines(self, ref: str) -> List[str]:
+        lines = []
+        directory = ref
+        while directory:
+            directory = os.path.dirname(directory)
+            try:
+                mtime = str(os.stat(os.path.join(self._refdir, directory or ".")).st_mtime_ns)
+            except FileNotFoundError:
+                mtime = "-"
+            lines.append("d {} {}\n".format(mtime, directory or "."))
+        return lines
+
+    # Whether refs were created or removed without updating the journal
+    #
+    def _is_stale(self, dirs: Dict[str, int]) -> bool:
+        if "." not in dirs:
+            return True
+
+        for directory, mtime in dirs.items():
+            try:
+                if os.stat(os.path.join(self._refdir, directory)).st_mtime_ns != mtime:
+                    return True
+            except FileNotFoundError:
+                return True
+        return False
+
+    # Read the journal, must be called with the lock held
+    #
+    # Returns:
+    #    The refs and their mtimes, the directories and their mtimes,
+    #    and the number of entries in the journal
+    #
+    def _read(self) -> Tuple[Dict[str, float], Dict[str, int], int]:
+        refs: Dict[str, float] = {}
+        dirs: Dict[str, int] = {}
+        entries = 0
+        with open(self._path, encoding="utf-8") as f:
+            for line in f:
+                # Ignore lines left incomplete by interrupted writers
+                if not line.endswith("\n"):
+                    continue
+                entries += 1
+                if line.startswith("+ "):
+                    _, mtime, ref = line[:-1].split(" ", 2)
+                    refs[ref] = float(mtime)
+                elif line.startswith("- "):
+                    refs.pop(line[2:-1], None)
+                elif line.startswith("d "):
+                    _, mtime, directory = line[:-1].split(" ", 2)
+                    if mtime == "-":
+                        dirs.pop(directory, None)
+                    else:
+                        dirs[directory] = int(mtime)
+        return refs, dirs, entries
+
+    # Write a new journal listing the given refs and directories, must be
+    # called with the lock held exclusively
+    #
+    def _write(self, refs: Dict[str, float], dirs: Dict[str, int]) -> None:
+        with utils.save_file_atomic(self._path, "w", encoding="utf-8") as f:
+            for ref, mtime in refs.items():
+                f.write("+ {} {}\n".format(mtime, ref))
+            for directory, dir_mtime in dirs.items():
+                f.write("d {} {}\n".format(dir_mtime, directory))
+
+    # Walk the directory tree
+    #
+    # Returns:
+    #    The refs and their mtimes, and the directories and their mtimes
+    #
+    def _walk(self) -> Tuple[Dict[str, float], Dict[str, int]]:
+        refs: Dict[str, float] = {}
+        dirs: Dict[str, int] = {}
+        for root, _, files in os.walk(self._refdir):
+            try:
+                dirs[os.path.relpath(root, self._refdir)] = os.stat(root).st_mtime_ns
+            except FileNotFoundError:
+                continue
+            for filename in files:
+                ref_path = os.path.join(root, filename)
+                try:
+                    refs[os.path.relpath(ref_path, self._refdir)] = os.path.getmtime(ref_path)
+                except FileNotFoundError:
+                    pass
+        return refs, dirs
+
+    # Build the journal from the refs in the directory tree, unless another
+    # process built it in the meantime
+    #
+    def _rebuild(self) -> Dict[str, float]:
+        with self._lock(fcntl.LOCK_EX):
+            if os.path.exists(self._path):
+                refs, dirs, _ = self._read()
+                if not self._is_stale(dirs):
+                    return refs
+
+            refs, dirs = self._walk()
+            self._write(refs, dirs)
+            return refs
+
+    # Rewrite the journal without the entries of refs which were
+    # overwritten or removed
+    #
+    def _compact(self) -> Dict[str, float]:
+        with self._lock(fcntl.LOCK_EX):
+            refs, dirs, _ = self._read()
+            self._write(refs, dirs)
+            return refs
+
+    # Writers hold the lock shared while appending to the journal, such
+    # that their entries are not lost when the journal is replaced by a
+    # process holding the lock exclusively.
+    #
+    @contextmanager
+    def _lock(self, operation: int) -> Iterator[None]:
+        os.makedirs(os.path.dirname(self._lock_path), exist_ok=True)
+        fd = os.open(self._lock_path, os.O_RDONLY | os.O_CREAT, 0o644)
+        try:
+            fcntl.flock(fd, operation)
+            yield
+        finally:
+            os.close(fd)
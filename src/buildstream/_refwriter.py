@@ -0,0 +1,97 @@
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+#
+import time
+from typing import Dict, Iterable, Optional, Set
+
+from . import _yaml
+
+
+# RefWriter()
+#
+# Coalesces the writing of tracked source references back to the
+# project files which store them.
+#
+# The YAML files which are modified are loaded for round tripping only
+# once, and are kept in memory for the rest of the session. Modified
+# files are written back at most once per checkpoint interval, and
+# whatever remains to be written is written back by flush() at the end
+# of the session.
+#
+# This avoids rewriting the same file once per tracked source, which is
+# particularly costly with a large project.refs file.
+#
+# Args:
+#    checkpoint_interval (int): The minimum number of seconds between two writes,
+#                               or 0 to write every change immediately
+#
+class RefWriter:
+    def __init__(self, checkpoint_interval: int):
+        self._checkpoint_interval: int = checkpoint_interval
+        self._files: Dict[str, dict] = {}  # Round trip file contents by filename
+        self._dirty: Set[str] = set()  # Filenames which need to be written back
+        self._last_write: Optional[float] = None  # Time of the last write back
+
+    # load()
+    #
+    # Load a YAML file for round tripping, or get the previously loaded
+    # contents, including any changes which were not written back yet.
+    #
+    # Args:
+    #    filename (str): The file to load
+    #
+    # Returns:
+    #    (dict): The round trip contents, which may be modified in place
+    #
+    def load(self, filename: str) -> dict:
+        contents = self._files.get(filename)
+        if contents is None:
+            contents = self._files[filename] = _yaml.roundtrip_load(filename, allow_missing=True)
+        return contents
+
+    # save()
+    #
+    # Mark files previously obtained with load() as modified.
+    #
+    # The files are written back immediately if the checkpoint interval
+    # has elapsed since the last write back, otherwise they are written
+    # back at the next checkpoint or flush().
+    #
+    # Args:
+    #    filenames (iterable): The modified files
+    #
+    # Raises:
+    #    (OSError): If writing a file fails
+    #
+    def save(self, filenames: Iterable[str]) -> None:
+        self._dirty.update(filenames)
+
+        now = time.monotonic()
+        if self._last_write is None or now - self._last_write >= self._checkpoint_interval:
+            self.flush()
+
+    # flush()
+    #
+    # Write back all modified files.
+    #
+    # Raises:
+    #    (OSError): If writing a file fails
+    #
+    def flush(self) -> None:
+        self._last_write = time.monotonic()
+
+        # Files are written atomically, such that an interrupted session
+        # leaves either the previous or the new contents behind.
+        for filename in sorted(self._dirty):
+            _yaml.roundtrip_dump(self._files[filename], filename)
+            self._dirty.discard(filename)
@@ -13,16 +13,19 @@
 #
 
 import os
-from typing import Optional, Tuple, List, cast
+from typing import TYPE_CHECKING, Optional, Tuple, List, cast
 from urllib.parse import urlparse
-import grpc
-from grpc import ChannelCredentials, Channel
 
 from ._exceptions import LoadError, RemoteError
 from .exceptions import LoadErrorReason
 from .types import FastEnum
 from .node import MappingNode
 
+# gRPC is only imported when a channel is opened, as this module is
+# imported by shell completion which must start quickly
+if TYPE_CHECKING:
+    from grpc import ChannelCredentials, Channel
+
 
 # RemoteType():
 #
@@ -115,7 +118,7 @@ class RemoteSpec:
         self._cred_files_loaded: bool = False
 
         # The grpc credentials object
-        self._credentials: Optional[ChannelCredentials] = None
+        self._credentials: Optional["ChannelCredentials"] = None
 
         # Various connection parameters for grpc connection
         self._connection_config: Optional[MappingNode] = connection_config
@@ -178,7 +181,9 @@ class RemoteSpec:
     # credentials()
     #
     @property
-    def credentials(self) -> ChannelCredentials:
+    def credentials(self) -> "ChannelCredentials":
+        import grpc
+
         if not self._credentials:
             self._credentials = grpc.ssl_channel_credentials(
                 root_certificates=self.server_cert,
@@ -199,7 +204,9 @@ class RemoteSpec:
     #
     # Opens a gRPC channel based on this spec.
     #
-    def open_channel(self) -> Channel:
+    def open_channel(self) -> "Channel":
+        import grpc
+
         url = urlparse(self.url)
 
         if url.scheme == "http":
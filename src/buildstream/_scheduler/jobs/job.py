@@ -31,6 +31,7 @@ from ..._exceptions import ImplError, BstError, set_last_task_error, SkipJob
 from ..._message import Message, MessageType
 from ...types import FastEnum
 from ..._signals import TerminateException
+from ..._tracing import TRACER, Categories
 
 
 # Return code values of child tasks of a job
@@ -314,6 +315,8 @@ class Job:
         )
 
         with ExitStack() as stack:
+            stack.enter_context(TRACER.span(self.action_name, Categories.JOB, element=self._message_element_name))
+
             # Time, log and and run the action function
             #
             timeinfo = stack.enter_context(self._messenger.timed_suspendable())
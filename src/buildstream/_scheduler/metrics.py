@@ -0,0 +1,175 @@
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+#
+import time
+from collections import Counter
+from typing import TYPE_CHECKING, List, Optional
+
+from .. import utils
+from .resources import Resources, ResourceType
+
+if TYPE_CHECKING:
+    from .._cas import CASCache
+    from .._messenger import Messenger
+    from .._state import State
+
+
+# Names of the resources, as used in labels
+_RESOURCE_NAMES = {
+    ResourceType.CACHE: "cache",
+    ResourceType.DOWNLOAD: "download",
+    ResourceType.PROCESS: "process",
+    ResourceType.UPLOAD: "upload",
+}
+
+
+# MetricsExporter()
+#
+# Exports metrics about the session in the OpenMetrics text format, to a
+# file which can be picked up by the textfile collector of the Prometheus
+# node exporter, or read by any other tool.
+#
+# The file is replaced atomically every time the metrics are written,
+# such that readers never see a partially written file. Failing to write
+# the file does not interrupt the session, a warning is issued the first
+# time it fails.
+#
+# Args:
+#    filename: The file to write the metrics to
+#    state: The state of the session
+#    resources: The resources of the scheduler
+#    cascache: The CAS cache, if cache usage and transfers should be reported
+#    messenger: The messenger to warn about failures with
+#
+class MetricsExporter:
+    def __init__(
+        self,
+        filename: str,
+        state: "State",
+        resources: Resources,
+        cascache: Optional["CASCache"] = None,
+        *,
+        messenger: Optional["Messenger"] = None,
+    ) -> None:
+        self._filename: str = filename
+        self._state: "State" = state
+        self._resources: Resources = resources
+        self._cascache: Optional["CASCache"] = cascache
+        self._messenger: Optional["Messenger"] = messenger
+        self._start_time: float = time.monotonic()
+        self._warned: bool = False  # Whether a failure to write the file was reported
+
+    # write()
+    #
+    # Write the current metrics to the file
+    #
+    def write(self) -> None:
+        try:
+            with utils.save_file_atomic(self._filename, "w", encoding="utf-8") as f:
+                f.write(self.render())
+        except OSError as e:
+            if not self._warned and self._messenger:
+                self._messenger.warn("Failed to write metrics to {}".format(self._filename), detail=str(e))
+            self._warned = True
+
+    # render()
+    #
+    # Returns:
+    #    The current metrics, in the OpenMetrics text format
+    #
+    def render(self) -> str:
+        lines: List[str] = []
+        self._render_queues(lines)
+        self._render_resources(lines)
+        self._render_cache(lines)
+        lines.append("# EOF")
+        return "\n".join(lines) + "\n"
+
+    def _render_queues(self, lines: List[str]) -> None:
+        groups = list(self._state.task_groups.values())
+        active = Counter(task.action_name for task in self._state.tasks.values())
+        elapsed = max(time.monotonic() - self._start_time, 1.0)
+
+        _family(lines, "bst_queue_tasks", "counter", "Tasks completed by each queue, by status")
+        for group in groups:
+            for status, count in (
+                ("processed", group.processed_tasks),
+                ("skipped", group.skipped_tasks),
+                ("failed", len(group.failed_tasks)),
+            ):
+                _sample(lines, "bst_queue_tasks_total", count, queue=group.name, status=status)
+
+        _family(lines, "bst_queue_active_tasks", "gauge", "Tasks currently running in each queue")
+        for group in groups:
+            _sample(lines, "bst_queue_active_tasks", active[group.name], queue=group.name)
+
+        _family(lines, "bst_queue_throughput", "gauge", "Tasks processed per second by each queue, on average")
+        for group in groups:
+            _sample(lines, "bst_queue_throughput", group.processed_tasks / elapsed, queue=group.name)
+
+        # Elements are skipped by the build queue when their artifact is
+        # cached, either from the start or after being pulled
+        build = self._state.task_groups.get("Build")
+        if build is not None:
+            total = build.processed_tasks + build.skipped_tasks + len(build.failed_tasks)
+            if total:
+                _family(
+                    lines, "bst_artifact_cache_hit_ratio", "gauge", "Ratio of elements which did not need building"
+                )
+                _sample(lines, "bst_artifact_cache_hit_ratio", build.skipped_tasks / total)
+
+    def _render_resources(self, lines: List[str]) -> None:
+        _family(lines, "bst_resource_tokens_used", "gauge", "Tokens of each resource currently in use")
+        for resource, used in self._resources._used_resources.items():
+            _sample(lines, "bst_resource_tokens_used", used, resource=_RESOURCE_NAMES[resource])
+
+        # A maximum of 0 means that the resource is unlimited
+        _family(lines, "bst_resource_tokens_limit", "gauge", "Tokens of each resource available")
+        for resource, limit in self._resources._max_resources.items():
+            if limit > 0:
+                _sample(lines, "bst_resource_tokens_limit", limit, resource=_RESOURCE_NAMES[resource])
+
+    def _render_cache(self, lines: List[str]) -> None:
+        if self._cascache is None:
+            return
+
+        usage = self._cascache.get_cache_usage()
+        if usage.used_size is not None:
+            _family(lines, "bst_cache_used_bytes", "gauge", "Size of the local cache")
+            _sample(lines, "bst_cache_used_bytes", usage.used_size)
+        if usage.quota_size is not None:
+            _family(lines, "bst_cache_quota_bytes", "gauge", "Quota of the local cache")
+            _sample(lines, "bst_cache_quota_bytes", usage.quota_size)
+
+        fetched, uploaded = self._cascache.get_transfer_stats()
+        _family(lines, "bst_cas_fetched_bytes", "counter", "Bytes of blobs fetched from remotes")
+        _sample(lines, "bst_cas_fetched_bytes_total", fetched)
+        _family(lines, "bst_cas_uploaded_bytes", "counter", "Bytes of blobs uploaded to remotes")
+        _sample(lines, "bst_cas_uploaded_bytes_total", uploaded)
+
+
+def _family(lines: List[str], name: str, metric_type: str, description: str) -> None:
+    lines.append("# TYPE {} {}".format(name, metric_type))
+    lines.append("# HELP {} {}".format(name, description))
+
+
+def _sample(lines: List[str], name: str, value: float, **labels: str) -> None:
+    if labels:
+        label_list = ",".join('{}="{}"'.format(key, _escape(label)) for key, label in labels.items())
+        lines.append("{}{{{}}} {}".format(name, label_list, value))
+    else:
+        lines.append("{} {}".format(name, value))
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
@@ -29,6 +29,7 @@ from ..resources import ResourceType
 # BuildStream toplevel imports
 from ..._exceptions import BstError, ImplError, set_last_task_error
 from ..._message import Message, MessageType
+from ..._tracing import TRACER, Categories
 from ...types import FastEnum
 
 if TYPE_CHECKING:
@@ -73,6 +74,7 @@ class Queue:
         self._done_queue = deque()  # Processed / Skipped elements
         self._max_retries = 0
         self._queued_elements = 0  # Number of elements queued
+        self._enqueue_times = {}  # Times at which elements were enqueued, when tracing
 
         self._required_element_check = False  # Whether we should check that elements are required before enqueuing
 
@@ -231,9 +233,12 @@ class Queue:
             if not reserved:
                 break
 
-            _, _, element = heapq.heappop(self._ready_queue)
+            _, _, element, ready_time = heapq.heappop(self._ready_queue)
             ready.append(element)
 
+            if TRACER.enabled:
+                self._trace_wait(element, ready_time)
+
         return [
             ElementJob(
                 self._scheduler,
@@ -382,14 +387,37 @@ class Queue:
     def _enqueue_element(self, element):
         status = self.status(element)
 
+        if TRACER.enabled and status != QueueStatus.SKIP:
+            self._enqueue_times.setdefault(element, TRACER.now())
+
         if status == QueueStatus.SKIP:
             # Place skipped elements into the done queue immediately
             self._task_group.add_skipped_task()
             self._done_queue.append(element)  # Elements to proceed to the next queue
         elif status == QueueStatus.READY:
             # Push elements which are ready to be processed immediately into the queue
-            heapq.heappush(self._ready_queue, (element._depth, self._queued_elements, element))
+            heapq.heappush(self._ready_queue, (element._depth, self._queued_elements, element, TRACER.now()))
             self._queued_elements += 1
         else:
             # Register a queue specific callback for pending elements
             self.register_pending_element(element)
+
+    # _trace_wait()
+    #
+    # Record the time an element waited in this queue in the session trace,
+    # first for the element to be ready, then for resources to process it
+    #
+    # Args:
+    #    element (Element): The element about to be processed
+    #    ready_time (float): The time at which the element was ready
+    #
+    def _trace_wait(self, element, ready_time):
+        enqueue_time = self._enqueue_times.pop(element, ready_time)
+        name = element._get_full_name()
+        if ready_time > enqueue_time:
+            TRACER.complete_async(
+                "Waiting to be ready", Categories.QUEUE, enqueue_time, ready_time, queue=self.action_name, element=name
+            )
+        TRACER.complete_async(
+            "Waiting for resources", Categories.QUEUE, ready_time, TRACER.now(), queue=self.action_name, element=name
+        )
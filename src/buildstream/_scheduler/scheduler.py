@@ -29,6 +29,7 @@ from concurrent.futures import ThreadPoolExecutor
 
 # Local imports
 from .resources import Resources
+from .metrics import MetricsExporter
 from .jobs import JobStatus
 from ..types import FastEnum
 from .._profile import Topics, PROFILER
@@ -106,6 +107,7 @@ class Scheduler:
 
         self._ticker_callback = ticker_callback
         self._interrupt_callback = interrupt_callback
+        self._metrics = None  # Exporter of metrics about the session, if enabled
 
         self.resources = Resources(context.sched_builders, context.sched_fetchers, context.sched_pushers)
 
@@ -149,6 +151,16 @@ class Scheduler:
         self.loop = asyncio.new_event_loop()
         asyncio.set_event_loop(self.loop)
 
+        # Export metrics if requested
+        if self.context.sched_metrics_file:
+            self._metrics = MetricsExporter(
+                self.context.sched_metrics_file,
+                self._state,
+                self.resources,
+                self.context.get_cascache(),
+                messenger=self.context.messenger,
+            )
+
         # Add timeouts
         self.loop.call_later(1, self._tick)
 
@@ -158,14 +170,16 @@ class Scheduler:
         # Handle unix signals while running
         self._connect_signals()
 
-        # Watch casd while running to ensure it doesn't die
+        # Watch casd while running to ensure it doesn't die, this is
+        # not possible for a shared casd which is not our child process
         self._casd_process = casd_process_manager.process
         _watcher = asyncio.get_child_watcher()
 
         def abort_casd(pid, returncode):
             asyncio.get_event_loop().call_soon(self._abort_on_casd_failure, pid, returncode)
 
-        _watcher.add_child_handler(self._casd_process.pid, abort_casd)
+        if self._casd_process:
+            _watcher.add_child_handler(self._casd_process.pid, abort_casd)
 
         # Start the profiler
         with PROFILER.profile(Topics.SCHEDULER, "_".join(queue.action_name for queue in self.queues)):
@@ -185,9 +199,15 @@ class Scheduler:
             # Invoke the ticker callback a final time to render pending messages
             self._ticker_callback()
 
+        # Export the final metrics
+        if self._metrics:
+            self._metrics.write()
+            self._metrics = None
+
         # Stop watching casd
-        _watcher.remove_child_handler(self._casd_process.pid)
-        self._casd_process = None
+        if self._casd_process:
+            _watcher.remove_child_handler(self._casd_process.pid)
+            self._casd_process = None
 
         # Stop handling unix signals
         self._disconnect_signals()
@@ -524,6 +544,8 @@ class Scheduler:
     # Regular timeout for driving status in the UI
     def _tick(self):
         self._ticker_callback()
+        if self._metrics:
+            self._metrics.write()
         self.loop.call_later(1, self._tick)
 
     def _handle_exception(self, loop, context: dict) -> None:
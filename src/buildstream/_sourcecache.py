@@ -21,9 +21,11 @@ from .storage._casbaseddirectory import CasBasedDirectory
 from ._assetcache import AssetCache
 from ._exceptions import CASError, CASRemoteError, SourceCacheError, AssetCacheError
 from . import utils
+from ._protos.build.bazel.remote.execution.v2 import remote_execution_pb2
 from ._protos.buildstream.v2 import source_pb2
 
 REMOTE_ASSET_SOURCE_URN_TEMPLATE = "urn:fdc:buildstream.build:2020:source:{}"
+REMOTE_ASSET_DOWNLOAD_URN_TEMPLATE = "urn:fdc:buildstream.build:2020:download:sha256:{}"
 
 
 # Class that keeps config of remotes and deals with caching of sources.
@@ -144,6 +146,25 @@ class SourceCache(AssetCache):
 
         return False
 
+    # resolve_remote()
+    #
+    # Look up the given sources on the remote source caches ahead of
+    # pulling them.
+    #
+    # Args:
+    #    sources (list): The sources to look up
+    #    max_workers (int): The maximum number of concurrent lookups
+    #
+    def resolve_remote(self, sources, *, max_workers):
+        self.resolve_assets(
+            [
+                (source._get_project().name, REMOTE_ASSET_SOURCE_URN_TEMPLATE.format(source._get_source_name()))
+                for source in sources
+            ],
+            directory=True,
+            max_workers=max_workers,
+        )
+
     # push()
     #
     # Push a source to configured remote source caches
@@ -194,6 +215,132 @@ class SourceCache(AssetCache):
 
         return pushed_index and pushed_storage
 
+    # lookup_download()
+    #
+    # Look up a downloaded file by its sha256 checksum, first in the local
+    # cache and then on the remote source caches of the source's project.
+    #
+    # Downloaded files are stored in CAS, which is addressed by sha256, such
+    # that a file only needs to be downloaded once regardless of the url,
+    # alias or project it is downloaded for.
+    #
+    # Args:
+    #    source (Source): The source which needs the file
+    #    sha256 (str): The sha256 checksum of the file
+    #
+    # Returns:
+    #    (str): The path of the file in the local cache, or None
+    #
+    def lookup_download(self, source, sha256):
+        digest = remote_execution_pb2.Digest(hash=sha256)
+        path = self.cas.objpath(digest)
+        if os.path.isfile(path):
+            return path
+
+        project = source._get_project()
+        index_remotes, storage_remotes = self.get_remotes(project.name, False)
+        uri = REMOTE_ASSET_DOWNLOAD_URN_TEMPLATE.format(sha256)
+
+        digest = None
+        for remote in index_remotes:
+            remote.init()
+            try:
+                response = remote.fetch_blob([uri])
+            except AssetCacheError as e:
+                source.info("Failed to look up download {} on {}: {}".format(sha256, remote, e))
+                continue
+
+            # Only trust remotes which agree on the checksum
+            if response and response.blob_digest.hash == sha256:
+                digest = response.blob_digest
+                break
+
+        if digest is None:
+            return None
+
+        for remote in storage_remotes:
+            remote.init()
+            source.status("Pulling download {} <- {}".format(sha256, remote))
+            try:
+                self.cas.fetch_blobs(remote, [digest])
+            except BlobNotFound:
+                continue
+            except CASError as e:
+                source.info("Failed to pull download {} <- {}: {}".format(sha256, remote, e))
+                continue
+
+            if os.path.isfile(path):
+                return path
+
+        return None
+
+    # commit_download()
+    #
+    # Store a downloaded file in the local cache, and push it to the remote
+    # source caches of the source's project if pushing is enabled.
+    #
+    # The file is moved into the local cache rather than copied, when
+    # possible, such that storing it does not write it again. The caller
+    # must not use the downloaded file afterwards if a path in the local
+    # cache is returned.
+    #
+    # Failing to push the file is not an error, as it was downloaded
+    # successfully.
+    #
+    # Args:
+    #    source (Source): The source which downloaded the file
+    #    sha256 (str): The sha256 checksum of the file
+    #    path (str): The path of the downloaded file
+    #
+    # Returns:
+    #    (str): The path of the file in the local cache, or None if it
+    #           is not stored locally, in which case the downloaded file
+    #           is left in place
+    #
+    def commit_download(self, source, sha256, path):
+        digest = self.cas.add_object(path=path, move_files=True)
+        if digest.hash != sha256:
+            # CAS does not use sha256, the file cannot be looked up by checksum,
+            # put the file back if it was moved
+            if not os.path.exists(path):
+                utils.safe_copy(self.cas.objpath(digest), path)
+            return None
+
+        if self.has_push_remotes(plugin=source):
+            self._push_download(source, digest)
+
+        path = self.cas.objpath(digest)
+        if not os.path.isfile(path):
+            return None
+
+        return path
+
+    def _push_download(self, source, digest):
+        project = source._get_project()
+        index_remotes, storage_remotes = self.get_remotes(project.name, True)
+        uri = REMOTE_ASSET_DOWNLOAD_URN_TEMPLATE.format(digest.hash)
+
+        pushed_storage = False
+        for remote in storage_remotes:
+            remote.init()
+            source.status("Pushing download {} -> {}".format(digest.hash, remote))
+            try:
+                self.cas.send_blobs(remote, [digest])
+                pushed_storage = True
+            except CASRemoteError as e:
+                source.info("Failed to push download {} -> {}: {}".format(digest.hash, remote, e))
+
+        # Only announce the file on index remotes when its content is available
+        if not pushed_storage:
+            return
+
+        for remote in index_remotes:
+            remote.init()
+            try:
+                remote.push_blob([uri], digest)
+            except AssetCacheError as e:
+                source.info("Failed to push download {} -> {}: {}".format(digest.hash, remote, e))
+
     def _store_source(self, ref, digest):
         source_proto = source_pb2.Source()
         source_proto.files.CopyFrom(digest)
@@ -224,7 +371,7 @@ class SourceCache(AssetCache):
 
         remote.init()
         try:
-            response = remote.fetch_directory([uri])
+            response = self.fetch_asset(remote, uri, directory=True)
         except AssetCacheError as e:
             raise SourceCacheError("Failed to pull source: {}".format(e), temporary=True) from e
 
@@ -22,6 +22,7 @@ import sys
 import stat
 import shlex
 import shutil
+import subprocess
 import tarfile
 import tempfile
 from contextlib import contextmanager, suppress
@@ -51,6 +52,16 @@ from .types import _KeyStrength, _PipelineSelection, _Scope, _HostMount
 from .plugin import Plugin
 from . import utils, node, _yaml, _site, _pipeline
 
+# Buffer size used when writing tarballs
+_TAR_BUFFER_SIZE = 1024 * 1024
+
+# Host tools used to compress tarballs using multiple threads, by compression type
+_PARALLEL_COMPRESSORS = {
+    "gz": ["pigz", "-c"],
+    "xz": ["xz", "-T0", "-c"],
+    "bz2": ["pbzip2", "-c"],
+}
+
 
 # Stream()
 #
@@ -507,7 +518,21 @@ class Stream:
         track_queue = TrackQueue(self._scheduler)
         self._add_queue(track_queue, track=True)
         self._enqueue_plan(elements, queue=track_queue)
-        self._run(announce_session=True)
+        # Write back the refs which were tracked since the last checkpoint,
+        # even when tracking failed, without hiding the original error
+        try:
+            self._run(announce_session=True)
+        except BaseException:
+            try:
+                self._context.get_ref_writer().flush()
+            except OSError as e:
+                self._context.messenger.warn("Error saving source references: {}".format(e))
+            raise
+
+        try:
+            self._context.get_ref_writer().flush()
+        except OSError as e:
+            raise StreamError("Error saving source references: {}".format(e)) from e
 
     # source_push()
     #
@@ -762,21 +787,20 @@ class Stream:
                     raise StreamError("Failed to checkout files: '{}'".format(e)) from e
         else:
             to_stdout = location == "-"
-            mode = _handle_compression(compression, to_stream=to_stdout)
             with target.timed_activity("Creating tarball"):
                 if to_stdout:
                     # Save the stdout FD to restore later
                     saved_fd = os.dup(sys.stdout.fileno())
                     try:
                         with os.fdopen(sys.stdout.fileno(), "wb") as fo:
-                            with tarfile.open(fileobj=fo, mode=mode) as tf:
+                            with _open_tarball(fo, compression) as tf:
                                 virdir.export_to_tar(tf, ".")
                     finally:
                         # No matter what, restore stdout for further use
                         os.dup2(saved_fd, sys.stdout.fileno())
                         os.close(saved_fd)
                 else:
-                    with tarfile.open(location, mode=mode) as tf:
+                    with open(location, "wb") as fo, _open_tarball(fo, compression) as tf:
                         virdir.export_to_tar(tf, ".")
 
     # artifact_show()
@@ -1828,6 +1852,9 @@ class Stream:
         # Assert consistency for the fetch elements
         _pipeline.assert_consistent(self._context, elements)
 
+        if not fetch_original:
+            self._resolve_source_cache_lookups(elements)
+
         # Construct queues, enqueue and run
         #
         self._reset()
@@ -1835,6 +1862,48 @@ class Stream:
         self._enqueue_plan(elements)
         self._run(announce_session=announce_session)
 
+    # _resolve_source_cache_lookups()
+    #
+    # Look up the sources which need to be fetched on the remote source
+    # caches ahead of running the fetch queue, concurrently rather than one
+    # by one in each fetch job, such that fetch jobs only need to transfer
+    # the sources which are available remotely.
+    #
+    # Individual sources are only looked up for elements whose staged
+    # sources are not available remotely.
+    #
+    # This is only done for sessions which fetch all the given elements.
+    # When building, whether an element needs to fetch its sources is only
+    # known once its artifact was looked up and possibly pulled, and its
+    # fetch job looks up its sources itself.
+    #
+    # Args:
+    #    elements (list of Element): Elements to fetch
+    #
+    def _resolve_source_cache_lookups(self, elements):
+        if not self._elementsourcescache.has_fetch_remotes() and not self._sourcecache.has_fetch_remotes():
+            return
+
+        sources_list = []
+        for element in elements:
+            sources = element._get_sources_to_fetch()
+            if sources is not None:
+                sources_list.append(sources)
+
+        if not sources_list:
+            return
+
+        max_workers = self._context.sched_fetchers
+        with self._context.messenger.simple_task("Resolving remote sources", silent_nested=True):
+            if self._elementsourcescache.has_fetch_remotes():
+                sources_list = self._elementsourcescache.resolve_remote(sources_list, max_workers=max_workers)
+
+            if self._sourcecache.has_fetch_remotes():
+                uncached_sources = []
+                for sources in sources_list:
+                    uncached_sources.extend(sources.get_uncached_sources())
+                self._sourcecache.resolve_remote(uncached_sources, max_workers=max_workers)
+
     # _check_location_writable()
     #
     # Check if given location is writable.
@@ -1930,11 +1999,8 @@ class Stream:
 
     # Create a tarball from the content of directory
     def _create_tarball(self, directory, tar_name, compression):
-        if compression is None:
-            compression = ""
-        mode = _handle_compression(compression)
         try:
-            with utils.save_file_atomic(tar_name, mode="wb") as f, tarfile.open(fileobj=f, mode=mode) as tarball:
+            with utils.save_file_atomic(tar_name, mode="wb") as f, _open_tarball(f, compression) as tarball:
                 for item in os.listdir(str(directory)):
                     file_to_add = os.path.join(directory, item)
                     tarball.add(file_to_add, arcname=item)
@@ -2098,17 +2164,59 @@ class Stream:
         return list(element_names), list(artifact_names)
 
 
-# _handle_compression()
+# _open_tarball()
 #
-# Return the tarfile mode str to be used when creating a tarball
+# A context manager to write a tarball to a file object.
+#
+# The tarball is written as a stream with large buffers. If a host tool
+# which is able to compress using multiple threads is available for the
+# requested compression, the uncompressed stream is piped through it,
+# otherwise compression is done by the tarfile module.
 #
 # Args:
-#    compression (str): The type of compression (either 'gz', 'xz' or 'bz2')
-#    to_stdout (bool): Whether we want to open a stream for writing
+#    fileobj (file): The binary file object to write the tarball to
+#    compression (str): The type of compression (either 'gz', 'xz' or 'bz2'),
+#                       or an empty string or None for no compression
 #
-# Returns:
-#    (str): The tarfile mode string
+# Yields:
+#    (TarFile): The TarFile to add members to
 #
-def _handle_compression(compression, *, to_stream=False):
-    mode_prefix = "w|" if to_stream else "w:"
-    return mode_prefix + compression
+@contextmanager
+def _open_tarball(fileobj, compression):
+    compression = compression or ""
+
+    compressor_args = _PARALLEL_COMPRESSORS.get(compression)
+    compressor = None
+    if compressor_args:
+        try:
+            compressor = utils.get_host_tool(compressor_args[0])
+        except utils.ProgramNotFoundError:
+            pass
+
+    if compressor is None:
+        with tarfile.open(
+            fileobj=fileobj, mode="w|" + compression, bufsize=_TAR_BUFFER_SIZE, copybufsize=_TAR_BUFFER_SIZE
+        ) as tf:
+            yield tf
+        return
+
+    # Make sure anything already buffered is written before the compressor output
+    fileobj.flush()
+
+    with subprocess.Popen(  # pylint: disable=consider-using-with
+        [compressor] + compressor_args[1:], stdin=subprocess.PIPE, stdout=fileobj.fileno()
+    ) as process:
+        try:
+            with tarfile.open(
+                fileobj=process.stdin, mode="w|", bufsize=_TAR_BUFFER_SIZE, copybufsize=_TAR_BUFFER_SIZE
+            ) as tf:
+                yield tf
+        finally:
+            process.stdin.close()
+            returncode = process.wait()
+
+    if returncode != 0:
+        raise StreamError(
+            "Failed to compress tarball with {}".format(compressor_args[0]),
+            detail="{} exited with status {}".format(compressor, returncode),
+        )
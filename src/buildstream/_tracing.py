@@ -0,0 +1,189 @@
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+#
+import contextlib
+import itertools
+import os
+import threading
+import time
+from typing import Dict, Iterator, List, Optional
+
+import ujson
+
+from . import utils
+
+
+# Categories of trace events
+#
+class Categories:
+    JOB = "job"
+    QUEUE = "queue"
+    ACTIVITY = "activity"
+    CASD = "casd"
+
+
+# _Tracer()
+#
+# Records a timeline of the session in the Chrome trace event format,
+# which can be opened with Perfetto or chrome://tracing.
+#
+# Spans of work done in a thread are recorded as complete events of that
+# thread, and are expected to nest properly. Spans which are not bound to
+# a thread, such as the time elements wait in queues, or which may overlap
+# other spans of the thread, such as streaming RPCs, are recorded as async
+# events.
+#
+# Tracing is disabled unless started, in which case recording spans costs
+# next to nothing.
+#
+class _Tracer:
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._events: Optional[List[Dict]] = None
+        self._filename: Optional[str] = None
+        self._thread_names: Dict[int, str] = {}
+        self._async_ids = itertools.count()
+        self._pid = os.getpid()
+
+    # enabled
+    #
+    # Whether the tracer is recording events
+    #
+    @property
+    def enabled(self) -> bool:
+        return self._events is not None
+
+    # start()
+    #
+    # Start recording events
+    #
+    # Args:
+    #    filename: The file to save the trace to
+    #
+    def start(self, filename: str) -> None:
+        self._filename = filename
+        self._events = []
+        self._thread_names = {}
+
+    # stop()
+    #
+    # Stop recording events and save the trace
+    #
+    def stop(self) -> None:
+        if self._events is None:
+            return
+
+        with self._lock:
+            events = self._events
+            self._events = None
+
+        metadata = [
+            {"ph": "M", "name": "thread_name", "pid": self._pid, "tid": tid, "args": {"name": name}}
+            for tid, name in self._thread_names.items()
+        ]
+
+        with utils.save_file_atomic(self._filename, "w", encoding="utf-8") as f:
+            ujson.dump({"traceEvents": metadata + events, "displayTimeUnit": "ms"}, f)
+
+    # now()
+    #
+    # Returns:
+    #    The current time, in the unit of trace timestamps
+    #
+    def now(self) -> float:
+        return time.monotonic_ns() / 1000
+
+    # span()
+    #
+    # Context manager recording a span of work done in the calling thread
+    #
+    # Args:
+    #    name: The name of the span
+    #    category: The category of the span, see Categories
+    #    args: Additional information about the span
+    #
+    @contextlib.contextmanager
+    def span(self, name: str, category: str, **args) -> Iterator[None]:
+        if self._events is None:
+            yield
+            return
+
+        start = self.now()
+        try:
+            yield
+        finally:
+            self.complete(name, category, start, self.now(), **args)
+
+    # complete()
+    #
+    # Record a span of work which was done in the calling thread
+    #
+    # Args:
+    #    name: The name of the span
+    #    category: The category of the span, see Categories
+    #    start: The start of the span, as returned by now()
+    #    end: The end of the span, as returned by now()
+    #    args: Additional information about the span
+    #
+    def complete(self, name: str, category: str, start: float, end: float, **args) -> None:
+        if self._events is None:
+            return
+
+        event = {
+            "ph": "X",
+            "name": name,
+            "cat": category,
+            "ts": start,
+            "dur": end - start,
+            "pid": self._pid,
+            "tid": self._get_tid(),
+        }
+        if args:
+            event["args"] = args
+        self._record(event)
+
+    # complete_async()
+    #
+    # Record a span which is not bound to a thread
+    #
+    # Args:
+    #    name: The name of the span
+    #    category: The category of the span, see Categories
+    #    start: The start of the span, as returned by now()
+    #    end: The end of the span, as returned by now()
+    #    args: Additional information about the span
+    #
+    def complete_async(self, name: str, category: str, start: float, end: float, **args) -> None:
+        if self._events is None:
+            return
+
+        span_id = next(self._async_ids)
+        begin = {"ph": "b", "name": name, "cat": category, "ts": start, "pid": self._pid, "id": span_id}
+        if args:
+            begin["args"] = args
+        self._record(begin)
+        self._record({"ph": "e", "name": name, "cat": category, "ts": end, "pid": self._pid, "id": span_id})
+
+    def _get_tid(self) -> int:
+        tid = threading.get_ident()
+        if tid not in self._thread_names:
+            self._thread_names[tid] = threading.current_thread().name
+        return tid
+
+    def _record(self, event: Dict) -> None:
+        with self._lock:
+            if self._events is not None:
+                self._events.append(event)
+
+
+TRACER = _Tracer()
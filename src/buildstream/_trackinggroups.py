@@ -0,0 +1,118 @@
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+#
+import threading
+from typing import Any, Callable, Dict, Hashable, Optional
+
+
+# _GroupQuery
+#
+# The state of the query of a single tracking group.
+#
+class _GroupQuery:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result: Any = None
+        self.completed: bool = False
+        self.error: Optional[BaseException] = None
+        self.owner: Any = None
+
+
+# SharedQueryError
+#
+# Raised to the sources waiting for the query of a tracking group, when
+# the query failed in the source which ran it.
+#
+# Args:
+#    error: The error raised by the query
+#    owner: The source which ran the query
+#
+class SharedQueryError(Exception):
+    def __init__(self, error: BaseException, owner: Any):
+        super().__init__(str(error))
+        self.error: BaseException = error
+        self.owner: Any = owner
+
+
+# TrackingGroups()
+#
+# Shares the results of tracking queries between the sources of a session.
+#
+# Sources which track from the same upstream, such as multiple branches of
+# the same repository, declare a shared tracking group and a query which
+# obtains what all sources of the group need, such as all the refs of the
+# repository. The query of a group is run only once per session, by the
+# first source needing it, while the other sources of the group wait for
+# its result, or reuse it if it is already available.
+#
+# A failed query is not recorded, such that it is run again by the next
+# source needing it, for instance when the tracking job is retried.
+#
+class TrackingGroups:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._queries: Dict[Hashable, _GroupQuery] = {}
+
+    # query()
+    #
+    # Get the result of the query of a tracking group, running the query
+    # if no other source ran it yet.
+    #
+    # Args:
+    #    group: The key identifying the tracking group
+    #    query: The query to run for the tracking group
+    #    owner: The source running the query, to report failures
+    #
+    # Returns:
+    #    The result of the query
+    #
+    # Raises:
+    #    The error raised by the query, if it failed when run by the caller,
+    #    or a SharedQueryError, if it failed when run by another source
+    #
+    def query(self, group: Hashable, query: Callable[[], Any], *, owner: Any = None) -> Any:
+        while True:
+            with self._lock:
+                group_query = self._queries.get(group)
+                run_query = group_query is None
+                if run_query:
+                    group_query = self._queries[group] = _GroupQuery()
+                    group_query.owner = owner
+
+            if run_query:
+                try:
+                    group_query.result = query()
+                    group_query.completed = True
+                except BaseException as e:
+                    # Only share actual errors, not the termination of the job running the query
+                    if isinstance(e, Exception):
+                        group_query.error = e
+                    with self._lock:
+                        del self._queries[group]
+                    raise
+                finally:
+                    group_query.done.set()
+
+                return group_query.result
+
+            # Wait with a timeout, such that terminating the job
+            # waiting here is not delayed
+            while not group_query.done.wait(timeout=1):
+                pass
+
+            if group_query.error is not None:
+                raise SharedQueryError(group_query.error, group_query.owner) from group_query.error
+            if group_query.completed:
+                return group_query.result
+
+            # The source running the query was terminated, run it here instead
@@ -84,15 +84,34 @@ DownloadableFileSource will add the following header to the ``GET`` request to d
 """
 
 
+import concurrent.futures
+import hashlib
+import http.client
 import os
+import stat
+import threading
+import time
 import urllib.request
 import urllib.error
 import contextlib
-import shutil
 import netrc
 
 from .source import Source, SourceError
 from . import utils
+from ._mirrorhealth import is_connection_failure, record_transfer
+
+# Size of the chunks in which downloads are read, written and hashed
+_BUFFER_SIZE = 1024 * 1024
+
+# Files at least this large are downloaded with parallel range
+# requests if the server supports them
+_RANGED_DOWNLOAD_THRESHOLD = 64 * 1024 * 1024
+
+# Number of parallel range requests for large files
+_RANGED_DOWNLOAD_PARTS = 4
+
+# Maximum number of persistent connections kept open per host
+_CONNECTIONS_PER_HOST = _RANGED_DOWNLOAD_PARTS
 
 
 class _NetrcFTPOpener(urllib.request.FTPHandler):
@@ -144,9 +163,183 @@ class _NetrcPasswordManager:
             return login, password
 
 
-def _download_file(opener_creator, url, etag, directory, bearer_auth):
-    opener = opener_creator.get_url_opener(bearer_auth)
-    default_name = os.path.basename(url)
+# _PooledResponse
+#
+# A response received on a pooled connection.
+#
+# The connection cannot be reused for another request if the response is
+# closed before it was read completely, as the remaining data would be read
+# as the response to the next request.
+#
+class _PooledResponse(http.client.HTTPResponse):
+    pooled_connection = None
+
+    def close(self):
+        if self.fp is not None and self.pooled_connection is not None:
+            self.pooled_connection.close()
+        super().close()
+
+
+# _ConnectionPool
+#
+# Keeps HTTP connections open between requests to the same host, such
+# that downloading many files from the same server does not require a new
+# TCP connection and TLS handshake for every file.
+#
+# A connection is only handed out again once the response to its last
+# request was read completely and closed. Connections on which a request
+# failed, or whose response was closed early, are removed from the pool.
+#
+class _ConnectionPool:
+    def __init__(self):
+        self._connections = {}  # Lists of [connection, response] by host key
+        self._lock = threading.Lock()
+
+    # acquire()
+    #
+    # Get an idle connection for the given host key, or a new connection
+    # created with `create` if none is available.
+    #
+    # The response to the request sent on the connection must be passed
+    # to release().
+    #
+    # Args:
+    #    key (tuple): The host key
+    #    create (callable): A function creating a new connection
+    #    reuse (bool): Whether an idle connection may be handed out
+    #
+    # Returns:
+    #    (HTTPConnection): The connection
+    #    (bool): Whether the connection already completed a request
+    #
+    def acquire(self, key, create, *, reuse=True):
+        with self._lock:
+            entries = self._connections.setdefault(key, [])
+
+            # Forget about connections which were closed
+            entries[:] = [entry for entry in entries if entry[0].sock is not None or entry[1] is None]
+
+            if reuse:
+                for entry in entries:
+                    connection, response = entry
+                    if response is not None and response.isclosed():
+                        entry[1] = None
+                        return connection, True
+
+            connection = create()
+            connection.response_class = _PooledResponse
+            if len(entries) < _CONNECTIONS_PER_HOST:
+                entries.append([connection, None])
+            return connection, False
+
+    # release()
+    #
+    # Hand a connection back to the pool along with the response to the
+    # last request sent on it, the connection becomes available again once
+    # the response is closed.
+    #
+    # Args:
+    #    key (tuple): The host key the connection was acquired for
+    #    connection (HTTPConnection): The connection
+    #    response (HTTPResponse): The response, or None if the request failed,
+    #                             in which case the connection is closed and
+    #                             removed from the pool
+    #
+    def release(self, key, connection, response):
+        if response is None:
+            connection.close()
+        else:
+            response.pooled_connection = connection
+
+        with self._lock:
+            entries = self._connections.get(key, [])
+            for entry in entries:
+                if entry[0] is connection:
+                    if response is None:
+                        entries.remove(entry)
+                    else:
+                        entry[1] = response
+                    break
+
+
+_CONNECTION_POOL = _ConnectionPool()
+
+
+# _KeepAliveMixin
+#
+# Replaces AbstractHTTPHandler.do_open() to send requests over pooled
+# persistent connections instead of opening a new connection for every
+# request.
+#
+class _KeepAliveMixin:
+    def do_open(self, http_class, req, **http_conn_args):
+        host = req.host
+        if not host:
+            raise urllib.error.URLError("no host given")
+
+        headers = dict(req.unredirected_hdrs)
+        headers.update({k: v for k, v in req.headers.items() if k not in headers})
+        headers = {name.title(): val for name, val in headers.items()}
+
+        tunnel_headers = {}
+        if req._tunnel_host and "Proxy-Authorization" in headers:
+            # Proxy-Authorization should not be sent to origin server
+            tunnel_headers["Proxy-Authorization"] = headers.pop("Proxy-Authorization")
+
+        def create():
+            connection = http_class(host, timeout=req.timeout, **http_conn_args)
+            if req._tunnel_host:
+                connection.set_tunnel(req._tunnel_host, headers=tunnel_headers)
+            return connection
+
+        key = (http_class, host, req._tunnel_host)
+
+        retry = True
+        while True:
+            connection, reused = _CONNECTION_POOL.acquire(key, create, reuse=retry)
+            try:
+                connection.request(
+                    req.get_method(),
+                    req.selector,
+                    req.data,
+                    headers,
+                    encode_chunked=req.has_header("Transfer-encoding"),
+                )
+                response = connection.getresponse()
+            except (OSError, http.client.HTTPException) as err:
+                _CONNECTION_POOL.release(key, connection, None)
+
+                # The server may have closed an idle connection, retry
+                # once on a new connection
+                if reused and retry:
+                    retry = False
+                    continue
+
+                # Report errors like urllib does
+                if isinstance(err, OSError):
+                    raise urllib.error.URLError(err)
+                raise
+            except BaseException:
+                _CONNECTION_POOL.release(key, connection, None)
+                raise
+
+            _CONNECTION_POOL.release(key, connection, response)
+            break
+
+        response.url = req.get_full_url()
+        response.msg = response.reason
+        return response
+
+
+class _KeepAliveHTTPHandler(_KeepAliveMixin, urllib.request.HTTPHandler):
+    pass
+
+
+class _KeepAliveHTTPSHandler(_KeepAliveMixin, urllib.request.HTTPSHandler):
+    pass
+
+
+def _create_request(opener_creator, url, bearer_auth):
     request = urllib.request.Request(url)
     request.add_header("Accept", "*/*")
     request.add_header("User-Agent", "BuildStream/2")
@@ -159,16 +352,108 @@ def _download_file(opener_creator, url, etag, directory, bearer_auth):
             auth_header = "Bearer " + password
             request.add_header("Authorization", auth_header)
 
+    return request
+
+
+# Copy up to `limit` bytes of a response to a file, hashing them as they are written
+def _copy_and_hash(response, dest, sha256, limit=None):
+    while limit is None or limit > 0:
+        size = _BUFFER_SIZE if limit is None else min(_BUFFER_SIZE, limit)
+        data = response.read(size)
+        if not data:
+            break
+        dest.write(data)
+        sha256.update(data)
+        if limit is not None:
+            limit -= len(data)
+
+
+# Raised when a server answers a range request with something else than the range,
+# for instance when its ETags are weak or differ between load balanced servers
+class _RangeNotHonoredError(ValueError):
+    pass
+
+
+# Download a byte range of a file into the given file descriptor
+def _download_range(opener, request, etag, fd, start, end):
+    request.add_header("Range", "bytes={}-{}".format(start, end - 1))
+    if etag:
+        # Make sure all ranges are taken from the same version of the file
+        request.add_header("If-Range", etag)
+
+    with contextlib.closing(opener.open(request, timeout=10 * 60)) as response:
+        content_range = response.info().get("Content-Range", "")
+        if response.status != 206 or not content_range.startswith("bytes {}-".format(start)):
+            raise _RangeNotHonoredError("Server did not honor range request for bytes {}-{}".format(start, end - 1))
+
+        offset = start
+        while offset < end:
+            data = response.read(min(_BUFFER_SIZE, end - offset))
+            if not data:
+                raise ValueError("Partial range {}/{} at offset {}".format(offset - start, end - start, start))
+            os.pwrite(fd, data, offset)
+            offset += len(data)
+
+
+# Download the remainder of a large file using parallel range requests,
+# while the first part is read from the initial response
+def _download_ranges(opener_creator, opener, response, dest, length, etag, bearer_auth, sha256):
+    part_size = -(-length // _RANGED_DOWNLOAD_PARTS)
+    dest.truncate(length)
+
+    url = response.url
+    with concurrent.futures.ThreadPoolExecutor(max_workers=_RANGED_DOWNLOAD_PARTS - 1) as executor:
+        futures = [
+            executor.submit(
+                _download_range,
+                opener,
+                _create_request(opener_creator, url, bearer_auth),
+                etag,
+                dest.fileno(),
+                start,
+                min(start + part_size, length),
+            )
+            for start in range(part_size, length, part_size)
+        ]
+
+        _copy_and_hash(response, dest, sha256, limit=part_size)
+        if dest.tell() < part_size:
+            raise ValueError("Partial file {}/{}".format(dest.tell(), length))
+        response.close()
+
+        for future in futures:
+            future.result()
+
+    # The other parts were written out of order, hash them now
+    # while they are still in the page cache
+    dest.flush()
+    offset = part_size
+    while offset < length:
+        data = os.pread(dest.fileno(), min(_BUFFER_SIZE, length - offset), offset)
+        sha256.update(data)
+        offset += len(data)
+    dest.seek(length)
+
+
+def _download_file(opener_creator, url, etag, directory, bearer_auth):
+    opener = opener_creator.get_url_opener(bearer_auth)
+    default_name = os.path.basename(url)
+    request = _create_request(opener_creator, url, bearer_auth)
+
     if etag is not None:
         request.add_header("If-None-Match", etag)
 
+    # The latency and throughput of the host are reported for adaptive mirror ordering
+    start_time = time.monotonic()
     try:
         with contextlib.closing(opener.open(request, timeout=10 * 60)) as response:
+            latency = time.monotonic() - start_time
             info = response.info()
 
             # some servers don't honor the 'If-None-Match' header
             if etag and info["ETag"] == etag:
-                return None, None, None
+                record_transfer(latency, 0, latency)
+                return None, None, None, None, None
 
             etag = info["ETag"]
             length = info.get("Content-Length")
@@ -176,27 +461,60 @@ def _download_file(opener_creator, url, etag, directory, bearer_auth):
             filename = info.get_filename(default_name)
             filename = os.path.basename(filename)
             local_file = os.path.join(directory, filename)
-            with open(local_file, "wb") as dest:
-                shutil.copyfileobj(response, dest)
+
+            # The file is hashed as it is written, to avoid reading it again
+            sha256 = hashlib.sha256()
+            with open(local_file, "w+b") as dest:
+                if (
+                    length
+                    and int(length) >= _RANGED_DOWNLOAD_THRESHOLD
+                    and getattr(response, "status", None) == 200
+                    and info.get("Accept-Ranges") == "bytes"
+                    and not info.get("Content-Encoding")
+                ):
+                    try:
+                        _download_ranges(
+                            opener_creator, opener, response, dest, int(length), etag, bearer_auth, sha256
+                        )
+                    except _RangeNotHonoredError:
+                        # Fall back to downloading the file in a single stream
+                        dest.seek(0)
+                        dest.truncate()
+                        sha256 = hashlib.sha256()
+                        request = _create_request(opener_creator, response.url, bearer_auth)
+                        with contextlib.closing(opener.open(request, timeout=10 * 60)) as full_response:
+                            _copy_and_hash(full_response, dest, sha256)
+                else:
+                    _copy_and_hash(response, dest, sha256)
 
                 actual_length = dest.tell()
                 if length and actual_length < int(length):
                     raise ValueError(f"Partial file {actual_length}/{length}")
 
+            record_transfer(latency, actual_length, time.monotonic() - start_time)
+
     except urllib.error.HTTPError as e:
         if e.code == 304:
             # 304 Not Modified.
             # Because we use etag only for matching ref, currently specified ref is what
             # we would have downloaded.
-            return None, None, None
+            latency = time.monotonic() - start_time
+            record_transfer(latency, 0, latency)
+            return None, None, None, None, None
 
-        return None, None, str(e)
-    except (urllib.error.URLError, OSError, ValueError) as e:
+        return None, None, None, str(e), None
+    except (urllib.error.URLError, OSError, ValueError, http.client.HTTPException) as e:
         # Note that urllib.request.Request in the try block may throw a
         # ValueError for unknown url types, so we handle it here.
-        return None, None, str(e)
+        #
+        # Only pass back the cause of errors reaching the server, which
+        # tells the mirror health tracking to back off from this host.
+        cause = e.reason if isinstance(e, urllib.error.URLError) else e
+        if not isinstance(cause, OSError) or not is_connection_failure(cause):
+            cause = None
+        return None, None, None, str(e), cause
 
-    return local_file, etag, None
+    return local_file, etag, sha256.hexdigest(), None, None
 
 
 class DownloadableFileSource(Source):
@@ -238,7 +556,8 @@ class DownloadableFileSource(Source):
         # there is no 'track' field in the source to determine what/whether
         # or not to update refs, because tracking a ref is always a conscious
         # decision by the user.
-        new_ref = self._ensure_mirror("Tracking {}".format(self.url))
+        # Sources downloading the same url track the same ref, only download it once
+        new_ref = self.query_tracking_group(self.url, lambda: self._ensure_mirror("Tracking {}".format(self.url)))
 
         if self.ref and self.ref != new_ref:
             detail = (
@@ -260,6 +579,20 @@ class DownloadableFileSource(Source):
         if os.path.isfile(self._get_mirror_file()):
             return  # pragma: nocover
 
+        # The same file may already have been downloaded by another source,
+        # possibly from another url or project, or be available from a
+        # remote source cache.
+        sourcecache = self._get_context().sourcecache
+        cached_file = sourcecache.lookup_download(self, self.ref)
+        if cached_file is not None:
+            with self.tempdir() as td:
+                try:
+                    self._store_mirror_file(cached_file, self.ref, td)
+                    return
+                except utils.UtilError:
+                    # The file may have been expired from the cache in the meantime
+                    pass
+
         # Download the file, raise hell if the sha256sums don't match,
         # and mirror the file otherwise.
         sha256 = self._ensure_mirror(
@@ -297,12 +630,14 @@ class DownloadableFileSource(Source):
 
             url_opener_creator = _UrlOpenerCreator(self._parse_netrc())
 
-            local_file, new_etag, error = self.blocking_activity(
+            local_file, new_etag, sha256, error, cause = self.blocking_activity(
                 _download_file, (url_opener_creator, self.url, etag, td, self.bearer_auth), activity_name
             )
 
             if error:
-                raise SourceError("{}: Error mirroring {}: {}".format(self, self.url, error), temporary=True)
+                raise SourceError(
+                    "{}: Error mirroring {}: {}".format(self, self.url, error), temporary=True
+                ) from cause
 
             if local_file is None:
                 return self.ref
@@ -315,16 +650,51 @@ class DownloadableFileSource(Source):
                     "{}: Mirror directory exists but is not a directory: {}".format(self, self._mirror_dir)
                 ) from e
 
-            # Store by sha256sum
-            sha256 = utils.sha256sum(local_file)
+            # Store by sha256sum, which was computed while downloading.
             # Even if the file already exists, move the new file over.
             # In case the old file was corrupted somehow.
-            os.rename(local_file, self._get_mirror_file(sha256))
+            sourcecache = self._get_context().sourcecache
+            cached_file = sourcecache.commit_download(self, sha256, local_file)
+            if cached_file is not None:
+                # Share a single copy of the file with other sources, the
+                # downloaded file was possibly moved into the cache already
+                with contextlib.suppress(FileNotFoundError):
+                    os.unlink(local_file)
+                self._store_mirror_file(cached_file, sha256, td)
+            else:
+                os.rename(local_file, self._get_mirror_file(sha256))
 
             if new_etag:
                 self._store_etag(sha256, new_etag)
             return sha256
 
+    # Store a file from the download cache in the mirror directory, linking
+    # it if possible rather than copying it.
+    #
+    # The linked mirror file shares its content with the object in the
+    # download cache, it is made read-only such that modifying it in place
+    # cannot corrupt the cache. Mirror files must be replaced rather than
+    # modified.
+    def _store_mirror_file(self, cached_file, sha256, tempdir):
+        try:
+            os.makedirs(self._mirror_dir, exist_ok=True)
+        except FileExistsError as e:
+            raise SourceError(
+                "{}: Mirror directory exists but is not a directory: {}".format(self, self._mirror_dir)
+            ) from e
+
+        # Link to a temporary file first, such that the mirror file is replaced atomically
+        temp_file = os.path.join(tempdir, sha256)
+        utils.safe_link(cached_file, temp_file)
+
+        mode = stat.S_IMODE(os.stat(temp_file).st_mode)
+        if mode & (stat.S_IWUSR | stat.S_IWGRP | stat.S_IWOTH):
+            # Objects in a cache shared with other users may not be ours
+            with contextlib.suppress(PermissionError):
+                os.chmod(temp_file, mode & ~(stat.S_IWUSR | stat.S_IWGRP | stat.S_IWOTH))
+
+        os.rename(temp_file, self._get_mirror_file(sha256))
+
     def _parse_netrc(self):
         netrc_config = None
         try:
@@ -359,5 +729,5 @@ class _UrlOpenerCreator:
             netrc_pw_mgr = _NetrcPasswordManager(self.netrc_config)
             http_auth = urllib.request.HTTPBasicAuthHandler(netrc_pw_mgr)
             ftp_handler = _NetrcFTPOpener(self.netrc_config)
-            return urllib.request.build_opener(http_auth, ftp_handler)
-        return urllib.request.build_opener()
+            return urllib.request.build_opener(_KeepAliveHTTPHandler, _KeepAliveHTTPSHandler, http_auth, ftp_handler)
+        return urllib.request.build_opener(_KeepAliveHTTPHandler, _KeepAliveHTTPSHandler)
@@ -2341,6 +2341,20 @@ class Element(Plugin):
             return not self.__sources.cached_original()
         return not self.__sources.cached()
 
+    # _get_sources_to_fetch():
+    #
+    # Get the element sources if the fetch stage will need to fetch them,
+    # such that they can be looked up on remote source caches ahead of time.
+    #
+    # Returns:
+    #    (ElementSources): The element sources, or None
+    #
+    def _get_sources_to_fetch(self):
+        if not self._can_query_source_cache() or not self._should_fetch():
+            return None
+
+        return self.__sources
+
     # _set_required_callback()
     #
     #
@@ -2643,17 +2657,22 @@ class Element(Plugin):
         if not artifact.cached():
             return None
 
-        if not artifact.cached_buildtree():
-            return None
-
-        if not artifact.cached_sources():
-            return None
-
         # Don't perform an incremental build if there has been a change in
         # build dependencies.
+        #
+        # This is checked first, as checking whether all blobs of the
+        # sources and buildtree are present can be expensive for large
+        # workspaces.
         old_dep_refs = artifact.get_dependency_artifact_names()
         new_dep_refs = self.__get_dependency_artifact_names()
         if old_dep_refs != new_dep_refs:
+            self.info("Not performing incremental build: build dependencies changed since the last build")
+            return None
+
+        if not artifact.cached_sources():
+            return None
+
+        if not artifact.cached_buildtree():
             return None
 
         return artifact
@@ -118,18 +118,19 @@ import itertools
 # case stack trace bugs from occurring.
 #
 import multiprocessing
+import multiprocessing.connection
 import multiprocessing.queues
 import multiprocessing.synchronize
 import multiprocessing.popen_forkserver  # type: ignore
 
 import os
-import queue
 import signal
 import subprocess
 import sys
+import threading
 import traceback
 from contextlib import contextmanager, suppress
-from typing import IO, Any, Callable, Generator, Optional, Sequence, Dict, Tuple, TypeVar, Union, TYPE_CHECKING
+from typing import IO, Any, Callable, Generator, List, Optional, Sequence, Dict, Tuple, TypeVar, Union, TYPE_CHECKING
 from weakref import WeakValueDictionary
 
 from . import utils, _signals
@@ -165,26 +166,148 @@ else:
     # See: https://bugs.python.org/issue31961
     _CMD = Union[_TXT, Sequence[_STR_BYTES_PATH]]
 
-# _background_job_wrapper()
+# Maximum number of idle worker processes kept for running blocking activities
+_MAX_IDLE_WORKERS = 8
+
+
+# _blocking_activity_worker()
 #
-# Wrapper for running jobs in the background, transparently for users
+# Main function of the worker processes running blocking activities.
 #
-# This method will put on the queue a response of the form:
-#   (PickleError, OtherError, Result)
+# This receives (target, args) tuples from the connection until it is closed,
+# and sends back a response of the form (Error, Result) for each of them.
 #
 # Args:
-#   result_queue: The queue in which to pass back the result
-#   target: function to execute in the background
-#   args: positional arguments to give to the target function
+#   connection: The connection to the process requesting the activities
 #
-def _background_job_wrapper(result_queue: multiprocessing.Queue, target: Callable[..., T1], args: Any) -> None:
-    result = None
+def _blocking_activity_worker(connection: multiprocessing.connection.Connection) -> None:
+    while True:
+        try:
+            target, args = connection.recv()
+        except EOFError:
+            return
 
-    try:
-        result = target(*args)
-        result_queue.put((None, result))
-    except Exception:  # pylint: disable=broad-except
-        result_queue.put((traceback.format_exc(), None))
+        try:
+            result = target(*args)
+            connection.send((None, result))
+        except Exception:  # pylint: disable=broad-except
+            connection.send((traceback.format_exc(), None))
+
+
+# _BlockingActivityWorker()
+#
+# A persistent process which runs blocking activities one after another.
+#
+# Args:
+#   mp_context: The multiprocessing context to start the process with
+#
+class _BlockingActivityWorker:
+    def __init__(self, mp_context: multiprocessing.context.BaseContext):
+        self._connection, child_connection = mp_context.Pipe()
+        self._process = mp_context.Process(target=_blocking_activity_worker, args=(child_connection,), daemon=True)
+        self._process.start()
+        child_connection.close()
+
+    # run()
+    #
+    # Run a function in the worker process and wait for its result.
+    #
+    # The wait is interrupted regularly, to give the calling thread the
+    # opportunity to handle termination.
+    #
+    # Returns:
+    #   (str): The formatted traceback if the function raised an exception
+    #   (object): The return value of the function
+    #
+    def run(self, target: Callable[..., T1], args: Any) -> Tuple[Optional[str], Optional[T1]]:
+        self._connection.send((target, args))
+
+        while True:
+            ready = multiprocessing.connection.wait([self._connection, self._process.sentinel], timeout=1)
+            if self._connection in ready:
+                try:
+                    return self._connection.recv()
+                except EOFError:
+                    pass
+            if self._process.sentinel in ready:
+                self._process.join()
+                raise PluginError("Background process died with error code {}".format(self._process.exitcode))
+
+    # is_alive()
+    #
+    # Returns:
+    #   (bool): Whether the worker process is still running
+    #
+    def is_alive(self) -> bool:
+        return self._process.is_alive()
+
+    def kill(self) -> None:
+        if self._process.is_alive():
+            self._process.kill()
+            self._process.join()
+        self._connection.close()
+
+    def suspend(self) -> None:
+        if self._process.is_alive():
+            with suppress(ProcessLookupError):
+                os.kill(self._process.pid, signal.SIGSTOP)
+
+    def resume(self) -> None:
+        if self._process.is_alive():
+            with suppress(ProcessLookupError):
+                os.kill(self._process.pid, signal.SIGCONT)
+
+
+# _BlockingActivityPool()
+#
+# A pool of persistent worker processes for running blocking activities,
+# such that each activity does not need to start a new process.
+#
+# Workers are started on demand, when all existing workers are busy,
+# and up to `max_idle` of them are kept running for later activities.
+#
+# Args:
+#   mp_context: The multiprocessing context to start processes with
+#   max_idle: The maximum number of idle workers to keep
+#
+class _BlockingActivityPool:
+    def __init__(self, mp_context: multiprocessing.context.BaseContext, max_idle: int):
+        self._mp_context = mp_context
+        self._max_idle = max_idle
+        self._idle_workers: List[_BlockingActivityWorker] = []
+        self._lock = threading.Lock()
+
+    # acquire()
+    #
+    # Get an idle worker, starting a new one if none is available.
+    #
+    # Returns:
+    #   (_BlockingActivityWorker): A worker, which must be released with release()
+    #
+    def acquire(self) -> _BlockingActivityWorker:
+        with self._lock:
+            while self._idle_workers:
+                worker = self._idle_workers.pop()
+                if worker.is_alive():
+                    return worker
+                worker.kill()
+
+        return _BlockingActivityWorker(self._mp_context)
+
+    # release()
+    #
+    # Return a worker which completed its activity to the pool.
+    #
+    # Args:
+    #   worker: The worker
+    #
+    def release(self, worker: _BlockingActivityWorker) -> None:
+        with self._lock:
+            if len(self._idle_workers) < self._max_idle:
+                self._idle_workers.append(worker)
+                return
+
+        worker.kill()
 
 
 class Plugin:
@@ -280,6 +403,9 @@ class Plugin:
         # XXX: investigate why we sometimes get deadlocks there
         __multiprocessing_context = multiprocessing.get_context("spawn")
 
+    # Pool of worker processes shared by the blocking activities of all plugins
+    __blocking_activity_pool = _BlockingActivityPool(__multiprocessing_context, _MAX_IDLE_WORKERS)
+
     def __init__(
         self,
         name: str,
@@ -603,6 +729,9 @@ class Plugin:
         as it will be run in another process. The function should not raise
         an exception.
 
+        The process is reused for running other blocking activities, so the
+        function should not leave any changes to the process state behind.
+
         This should be used whenever there is a potential for a blocking
         syscall to not return in a reasonable (<1s) amount of time.
         For example, you would use this if you were doing a request to a
@@ -621,54 +750,17 @@ class Plugin:
         with self.__context.messenger.timed_activity(
             activity_name, element_name=self._get_full_name(), detail=detail, silent_nested=silent_nested
         ):
-            result_queue = self.__multiprocessing_context.Queue()
-            proc = None
-
-            def kill_proc():
-                if proc and proc.is_alive():
-                    proc.kill()
-                    proc.join()
-
-            def suspend_proc():
-                if proc and proc.is_alive():
-                    with suppress(ProcessLookupError):
-                        os.kill(proc.pid, signal.SIGSTOP)
-
-            def resume_proc():
-                if proc and proc.is_alive():
-                    with suppress(ProcessLookupError):
-                        os.kill(proc.pid, signal.SIGCONT)
-
-            with _signals.suspendable(suspend_proc, resume_proc), _signals.terminator(kill_proc):
-                proc = self.__multiprocessing_context.Process(
-                    target=_background_job_wrapper, args=(result_queue, target, args)
-                )
-                proc.start()
-
-                should_continue = True
-                last_check = False
-
-                while should_continue or last_check:
-                    last_check = False
-
-                    try:
-                        err, result = result_queue.get(timeout=1)
-                        break
-                    except queue.Empty:
-                        if not proc.is_alive() and should_continue:
-                            # Let's check one last time, just in case it stopped
-                            # between our last check and now
-                            last_check = True
-                            should_continue = False
-                        continue
-                else:
-                    raise PluginError("Background process died with error code {}".format(proc.exitcode))
+            worker = self.__blocking_activity_pool.acquire()
 
+            with _signals.suspendable(worker.suspend, worker.resume), _signals.terminator(worker.kill):
                 try:
-                    proc.join(timeout=15)
-                    proc.terminate()
-                except TimeoutError:
-                    raise PluginError("Background process didn't exit after 15 seconds and got killed.")
+                    err, result = worker.run(target, args)
+                except BaseException:
+                    # The worker may be in any state, don't reuse it
+                    worker.kill()
+                    raise
+
+            self.__blocking_activity_pool.release(worker)
 
             if err is not None:
                 raise PluginError("An error happened while running a blocking activity", detail=err)
@@ -863,12 +955,12 @@ class Plugin:
     #
     @contextmanager
     def _output_file(self):
-        log = self.__context.messenger.get_log_handle()
-        if log is None:
-            with open(os.devnull, "w", encoding="utf-8") as output:
-                yield output
-        else:
-            yield log
+        with self.__context.messenger.direct_log_handle() as log:
+            if log is None:
+                with open(os.devnull, "w", encoding="utf-8") as output:
+                    yield output
+            else:
+                yield log
 
     # _configure():
     #
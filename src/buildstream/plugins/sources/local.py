@@ -63,14 +63,20 @@ class LocalSource(Source):
         #
         # As a core plugin, we use some private API to optimize file hashing.
         #
-        # * Use Source._cache_directory() to prepare a Directory
-        # * Do the regular staging activity into the Directory
+        # * Use Source._import_local_directory() to import a directory
+        #   without rehashing files which did not change since last time
+        # * Otherwise use Source._cache_directory() to prepare a Directory
+        #   and do the regular staging activity into the Directory
         # * Use the hash of the cached digest as the unique key
         #
         if not self.__digest:
-            with self._cache_directory() as directory:
-                self.__do_stage(directory)
-                self.__digest = directory._get_digest()
+            if os.path.isdir(self.fullpath) and not os.path.islink(self.fullpath):
+                with self.timed_activity("Staging local files into CAS"):
+                    self.__digest = self._import_local_directory(self.fullpath)
+            else:
+                with self._cache_directory() as directory:
+                    self.__do_stage(directory)
+                    self.__digest = directory._get_digest()
 
         return self.__digest.hash
 
@@ -21,6 +21,8 @@ tar - stage files from tar archives
 **Host dependencies:**
 
   * lzip (for .tar.lz files)
+  * pigz, xz or pbzip2 (optional, for faster decompression of
+    .tar.gz, .tar.xz and .tar.bz2 files respectively)
 
 **Usage:**
 
@@ -52,8 +54,12 @@ See :ref:`built-in functionality doumentation <core_source_builtins>` for
 details on common configuration options for sources.
 """
 
+import bz2
 import functools
+import gzip
+import lzma
 import os
+import shutil
 import sys
 import tarfile
 from contextlib import contextmanager
@@ -63,6 +69,18 @@ from typing import Optional
 from buildstream import DownloadableFileSource, SourceError
 from buildstream import utils
 
+# Buffer size used when decompressing tarballs
+_BUFFER_SIZE = 1024 * 1024
+
+# Compressions which are detected by their magic number, with the python
+# module used to decompress them and a host tool which can decompress them
+# using multiple threads
+_COMPRESSIONS = [
+    (b"\x1f\x8b", gzip, ["pigz", "-d", "-c"]),
+    (b"BZh", bz2, ["pbzip2", "-d", "-c"]),
+    (b"\xfd7zXZ\x00", lzma, ["xz", "-d", "-c", "-T0"]),
+]
+
 
 class ReadableTarInfo(tarfile.TarInfo):
     """
@@ -107,26 +125,59 @@ class TarSource(DownloadableFileSource):
     def get_unique_key(self):
         return super().get_unique_key() + [self.base_dir]
 
-    @contextmanager
-    def _run_lzip(self):
-        assert self.host_lzip
-        with TemporaryFile() as lzip_stdout:
-            with open(self._get_mirror_file(), "r") as lzip_file:
-                self.call([self.host_lzip, "-d"], stdin=lzip_file, stdout=lzip_stdout)
-
-            lzip_stdout.seek(0, 0)
-            yield lzip_stdout
-
     @contextmanager
     def _get_tar(self):
+        mirror_file = self._get_mirror_file()
+
         if self.url.endswith(".lz"):
-            with self._run_lzip() as lzip_dec:
-                with tarfile.open(fileobj=lzip_dec, mode="r:", tarinfo=ReadableTarInfo) as tar:
-                    yield tar
+            assert self.host_lzip
+            module = None
+            decompressor = [self.host_lzip, "-d", "-c"]
         else:
-            with tarfile.open(self._get_mirror_file(), tarinfo=ReadableTarInfo) as tar:
+            with open(mirror_file, "rb") as f:
+                magic = f.read(6)
+            for prefix, module, decompressor in _COMPRESSIONS:
+                if magic.startswith(prefix):
+                    break
+            else:
+                # Uncompressed tarball, or a compression only supported by tarfile
+                with tarfile.open(mirror_file, tarinfo=ReadableTarInfo) as tar:
+                    yield tar
+                return
+
+        # Decompress the tarball once, up front. Reading a compressed tarball
+        # with tarfile directly decompresses it twice, once for listing the
+        # members and once again for extracting them.
+        with self.tempdir() as tempdir, TemporaryFile(dir=tempdir) as decompressed:
+            self._decompress(mirror_file, decompressed, module, decompressor)
+            decompressed.seek(0, 0)
+
+            with tarfile.open(fileobj=decompressed, mode="r:", tarinfo=ReadableTarInfo) as tar:
                 yield tar
 
+    # Decompress a tarball into the given file, using the host tool if
+    # it is available and falling back to the python module otherwise
+    def _decompress(self, mirror_file, fileobj, module, decompressor):
+        try:
+            host_tool = utils.get_host_tool(decompressor[0])
+        except utils.ProgramNotFoundError:
+            host_tool = None
+
+        if host_tool:
+            with open(mirror_file, "rb") as compressed:
+                exit_code = self.call([host_tool] + decompressor[1:], stdin=compressed, stdout=fileobj)
+            if exit_code == 0:
+                return
+            if module is None:
+                raise SourceError("{}: Failed to decompress {}".format(self, os.path.basename(mirror_file)))
+
+            # Let the python module decide what to do with this tarball
+            fileobj.seek(0, 0)
+            fileobj.truncate()
+
+        with module.open(mirror_file, "rb") as compressed:
+            shutil.copyfileobj(compressed, fileobj, _BUFFER_SIZE)
+
     def stage(self, directory):
         try:
             with self._get_tar() as tar:
@@ -147,7 +198,7 @@ class TarSource(DownloadableFileSource):
                             filtered_members.append(member)
                     tar.extractall(path=directory, members=filtered_members)
 
-        except (tarfile.TarError, OSError) as e:
+        except (tarfile.TarError, OSError, EOFError, lzma.LZMAError) as e:
             raise SourceError("{}: Error staging source: {}".format(self, e)) from e
 
     # Assert that a tarfile is safe to extract; specifically, make
@@ -34,7 +34,7 @@ workspace. The node constructed would be specified as follows:
 
 import os
 
-from buildstream import Source, SourceError, Directory, MappingNode
+from buildstream import Source, Directory, MappingNode
 from buildstream.types import SourceRef
 
 
@@ -67,14 +67,13 @@ class WorkspaceSource(Source):
         #
         # As a core plugin, we use some private API to optimize file hashing.
         #
-        # * Use Source._cache_directory() to prepare a Directory
-        # * Do the regular staging activity into the Directory
+        # * Use Source._import_local_directory() to import the workspace
+        #   without rehashing files which did not change since last time
         # * Use the hash of the cached digest as the unique key
         #
         if not self.__digest:
-            with self._cache_directory() as directory:
-                self.__do_stage(directory)
-                self.__digest = directory._get_digest()
+            with self.timed_activity("Staging local files"):
+                self.__digest = self._import_local_directory(self.path, properties=["mtime"])
 
         return self.__digest.hash
 
@@ -114,21 +113,6 @@ class WorkspaceSource(Source):
     def _get_local_path(self) -> str:
         return self.path
 
-    # Staging is implemented internally, we preemptively put it in the CAS
-    # as a side effect of resolving the cache key, at stage time we just
-    # do an internal CAS stage.
-    #
-    def __do_stage(self, directory: Directory) -> None:
-        assert isinstance(directory, Directory)
-        with self.timed_activity("Staging local files"):
-            result = directory._import_files_internal(self.path, properties=["mtime"])
-            assert result is not None
-
-            if result.overwritten or result.ignored:
-                raise SourceError(
-                    "Failed to stage source: files clash with existing directory", reason="ensure-stage-dir-fail"
-                )
-
 
 # Plugin entry point
 def setup():
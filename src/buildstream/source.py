@@ -71,6 +71,9 @@ these methods are mandatory to implement.
 
   Automatically derive a new ref from a symbolic tracking branch
 
+  Sources tracking from the same upstream can share their queries of the
+  upstream with :func:`Source.query_tracking_group() <buildstream.source.Source.query_tracking_group>`
+
 * :func:`Source.fetch() <buildstream.source.Source.fetch>`
 
   Fetch the actual payload for the currently set ref
@@ -215,20 +218,23 @@ Class Reference
 ---------------
 """
 
+import functools
 import os
 from contextlib import contextmanager
-from typing import Iterable, Iterator, Optional, Tuple, Dict, Any, Set, TYPE_CHECKING, Union
+from typing import Callable, Iterable, Iterator, Optional, Tuple, Dict, Any, Set, TYPE_CHECKING, Union
 from dataclasses import dataclass
 
-from . import _yaml, utils
+from . import utils
 from .node import MappingNode
 from .plugin import Plugin
 from .sourcemirror import SourceMirror
 from .types import SourceRef, CoreWarnings
-from ._exceptions import BstError, ImplError, PluginError
+from ._exceptions import BstError, CASCacheError, ImplError, PluginError
 from .exceptions import ErrorDomain
 from ._loader.metasource import MetaSource
 from ._projectrefs import ProjectRefStorage
+from ._trackinggroups import SharedQueryError
+from ._mirrorhealth import is_connection_failure
 from ._cachekey import generate_key
 from .storage import CasBasedDirectory
 from .storage import FileBasedDirectory
@@ -264,6 +270,7 @@ class SourceError(BstError):
 class AliasSubstitution:
     _effective_alias: str
     _mirror: Union[SourceMirror, str]
+    _default_mirror: bool = False
 
 
 class SourceFetcher:
@@ -378,6 +385,21 @@ class Source(Plugin):
       * This source can not be the first source for an element.
     """
 
+    BST_CONCURRENT_SOURCE_FETCHERS = False
+    """Whether the source fetchers of this source can be fetched concurrently
+
+    When set to True, the :class:`.SourceFetcher` objects returned by
+    :func:`Source.get_source_fetchers() <buildstream.source.Source.get_source_fetchers>`
+    are all obtained up front, and are fetched concurrently, rather than being
+    fetched one by one.
+
+    This should only be set if fetching one source fetcher does not depend on
+    another source fetcher having been fetched, and if the source fetchers can
+    safely be fetched from multiple threads at once.
+
+    *Since: 2.3*
+    """
+
     BST_STAGE_VIRTUAL_DIRECTORY = False
     """Whether we can stage this source directly to a virtual directory
 
@@ -659,7 +681,8 @@ class Source(Plugin):
 
            The :func:`SourceFetcher.fetch() <buildstream.source.SourceFetcher.fetch>`
            method will be called on the returned fetchers one by one,
-           before consuming the next fetcher in the list.
+           before consuming the next fetcher in the list, unless
+           :attr:`~buildstream.source.Source.BST_CONCURRENT_SOURCE_FETCHERS` is set.
         """
         return []
 
@@ -889,6 +912,46 @@ class Source(Plugin):
         with utils._tempdir(dir=mirrordir) as tempdir:
             yield tempdir
 
+    def query_tracking_group(self, group: str, query: Callable[[], Any]) -> Any:
+        """Run a tracking query shared by the sources of a tracking group
+
+        Args:
+           group: A string identifying the tracking group, such as the URL of an upstream repository
+           query: A function obtaining what all sources in the tracking group need to track
+
+        Returns:
+           The result of the query
+
+        Raises:
+           The :class:`.SourceError` raised by the query, if it failed. If the query
+           failed in another source of the group, a :class:`.SourceError` naming
+           both sources is raised instead.
+
+        Sources which track from the same upstream can use this in
+        :func:`Source.track() <buildstream.source.Source.track>` to query the
+        upstream only once per session. For instance, sources tracking
+        different branches of the same repository can share a query listing
+        all the branches of the repository, and each pick the ref of their
+        own branch from its result.
+
+        The query of a group is run by the first source of the plugin kind
+        which needs it. Other sources of the same kind in the same group wait
+        for its result, or reuse it, for the rest of the session. A failed
+        query is run again by the next source which needs it.
+
+        *Since: 2.3*
+        """
+        context = self._get_context()
+        try:
+            return context.get_tracking_groups().query((self.get_kind(), group), query, owner=self)
+        except SharedQueryError as e:
+            raise SourceError(
+                "{}: Query of tracking group '{}' failed in {}: {}".format(self, group, e.owner, e.error),
+                detail=getattr(e.error, "detail", None),
+                reason=getattr(e.error, "reason", None),
+                temporary=getattr(e.error, "temporary", False),
+            ) from e.error
+
     def is_resolved(self) -> bool:
         """Get whether the source is resolved.
 
@@ -1217,7 +1280,8 @@ class Source(Plugin):
             else:
                 assert False, "BUG: Unknown action: {}".format(action)
 
-        roundtrip_cache = {}
+        ref_writer = context.get_ref_writer()
+        modified_files = set()
         for key, action in actions.items():
             # Obtain the top level node and its file
             if action == "add":
@@ -1235,11 +1299,8 @@ class Source(Plugin):
                 # We want the path to the node containing the key, not to the key
                 path = full_path[:-1]
 
-            roundtrip_file = roundtrip_cache.get(provenance._filename)
-            if not roundtrip_file:
-                roundtrip_file = roundtrip_cache[provenance._filename] = _yaml.roundtrip_load(
-                    provenance._filename, allow_missing=True
-                )
+            roundtrip_file = ref_writer.load(provenance._filename)
+            modified_files.add(provenance._filename)
 
             # Get the value of the round trip file that we need to change
             process_value(action, roundtrip_file, path, key, to_modify.get(key))
@@ -1247,14 +1308,14 @@ class Source(Plugin):
         #
         # Step 3 - Apply the change in project data
         #
-        for filename, data in roundtrip_cache.items():
-            # This is our roundtrip dump from the track
-            try:
-                _yaml.roundtrip_dump(data, filename)
-            except OSError as e:
-                raise SourceError(
-                    "{}: Error saving source reference to '{}': {}".format(self, filename, e), reason="save-ref-error"
-                ) from e
+        # The RefWriter coalesces the writes of files modified by multiple
+        # sources, the remaining changes are written back when tracking
+        # completes.
+        #
+        try:
+            ref_writer.save(modified_files)
+        except OSError as e:
+            raise SourceError("{}: Error saving source reference: {}".format(self, e), reason="save-ref-error") from e
 
         return True
 
@@ -1360,6 +1421,32 @@ class Source(Plugin):
 
         yield cas_dir
 
+    # _import_local_directory()
+    #
+    # Import a local directory into CAS, remembering the digests of the
+    # imported files along with their status such that only files which
+    # were modified since the directory was last imported are read again.
+    #
+    # This was added specifically to optimize cases where the same host
+    # local directory is imported repeatedly, such as local sources and
+    # workspaces.
+    #
+    # Args:
+    #    path (str): The local directory to import
+    #    properties (list): List of file properties to capture
+    #
+    # Returns:
+    #    (Digest): The digest of the imported directory
+    #
+    def _import_local_directory(self, path, *, properties=None):
+        context = self._get_context()
+        cache = context.get_cascache()
+
+        try:
+            return cache.import_directory(path, properties, use_stat_cache=True)
+        except CASCacheError as e:
+            raise SourceError("{}: {}".format(self, e), reason=e.reason) from e
+
     #############################################################
     #                   Local Private Methods                   #
     #############################################################
@@ -1423,9 +1510,19 @@ class Source(Plugin):
         with context.messenger.silence():
             source_fetchers = self.get_source_fetchers()
 
+        # Fetch the source fetchers concurrently if the plugin allows it
+        #
+        if source_fetchers and self.BST_CONCURRENT_SOURCE_FETCHERS:
+            with context.messenger.silence():
+                source_fetchers = list(source_fetchers)
+
+            context.get_fetch_pool().run(
+                [functools.partial(self.__fetch_source_fetcher, fetcher) for fetcher in source_fetchers]
+            )
+
         # Use the source fetchers if they are provided
         #
-        if source_fetchers:
+        elif source_fetchers:
 
             # Use a contorted loop here, this is to allow us to
             # silence the messages which can result from consuming
@@ -1444,23 +1541,7 @@ class Source(Plugin):
                         # Catching it here and breaking instead.
                         break
 
-                alias = fetcher._get_alias()
-                last_error = None
-                for mirror in project.get_alias_uris(alias, first_pass=self.__first_pass, tracking=False):
-                    try:
-                        fetcher.fetch(mirror)
-                    # FIXME: Need to consider temporary vs. permanent failures,
-                    #        and how this works with retries.
-                    except BstError as e:
-                        last_error = e
-                        continue
-
-                    # No error, we're done with this fetcher
-                    break
-
-                else:
-                    # No break occurred, raise the last detected error
-                    raise last_error
+                self.__fetch_source_fetcher(fetcher)
 
         # Default codepath is to reinstantiate the Source
         #
@@ -1475,11 +1556,12 @@ class Source(Plugin):
                 return
 
             last_error = None
-            for mirror in project.get_alias_uris(alias, first_pass=self.__first_pass, tracking=False):
+            for mirror in self.__get_alias_uris(alias, tracking=False):
 
                 new_source = self.__clone_for_uri(mirror)
                 try:
-                    new_source.fetch(**kwargs)
+                    with self.__record_mirror_health(mirror):
+                        new_source.fetch(**kwargs)
                 # FIXME: Need to consider temporary vs. permanent failures,
                 #        and how this works with retries.
                 except BstError as e:
@@ -1492,6 +1574,26 @@ class Source(Plugin):
             # Re raise the last detected error
             raise last_error
 
+    # Tries to fetch a source fetcher from every mirror, stopping once it succeeds
+    def __fetch_source_fetcher(self, fetcher):
+        alias = fetcher._get_alias()
+        last_error = None
+        for mirror in self.__get_alias_uris(alias, tracking=False):
+            try:
+                with self.__record_mirror_health(mirror):
+                    fetcher.fetch(mirror)
+            # FIXME: Need to consider temporary vs. permanent failures,
+            #        and how this works with retries.
+            except BstError as e:
+                last_error = e
+                continue
+
+            # No error, we're done with this fetcher
+            return
+
+        # Raise the last detected error
+        raise last_error
+
     # Tries to call track for every mirror, stopping once it succeeds
     def __do_track(self, **kwargs):
         project = self._get_project()
@@ -1507,10 +1609,11 @@ class Source(Plugin):
         # NOTE: We are assuming here that tracking only requires substituting the
         #       first alias used
         last_error = None
-        for mirror in reversed(project.get_alias_uris(alias, first_pass=self.__first_pass, tracking=True)):
+        for mirror in self.__get_alias_uris(alias, tracking=True):
             new_source = self.__clone_for_uri(mirror)
             try:
-                ref = new_source.track(**kwargs)  # pylint: disable=assignment-from-none
+                with self.__record_mirror_health(mirror):
+                    ref = new_source.track(**kwargs)  # pylint: disable=assignment-from-none
             # FIXME: Need to consider temporary vs. permanent failures,
             #        and how this works with retries.
             except BstError as e:
@@ -1521,6 +1624,47 @@ class Source(Plugin):
 
         raise last_error
 
+    # Get the substitutions to try for an alias, in the order they should be tried
+    #
+    # Tracking tries the configured alias before mirrors, and is only
+    # affected by mirrors being in back-off, not by how fast they are.
+    #
+    def __get_alias_uris(self, alias, *, tracking):
+        project = self._get_project()
+        context = self._get_context()
+
+        substitutions = project.get_alias_uris(alias, first_pass=self.__first_pass, tracking=tracking)
+        if tracking:
+            substitutions = list(reversed(substitutions))
+
+        if context.adaptive_mirrors:
+            substitutions = context.get_mirror_health().order(substitutions, by_speed=not tracking)
+
+        return substitutions
+
+    # Record the outcome of fetching or tracking with a substitution in the
+    # mirror health table
+    #
+    @contextmanager
+    def __record_mirror_health(self, substitution):
+        context = self._get_context()
+        if not context.adaptive_mirrors:
+            yield
+            return
+
+        mirror_health = context.get_mirror_health()
+        try:
+            with mirror_health.measure(substitution):
+                yield
+        except BstError as e:
+            # Errors reported by the host, such as missing files, do not
+            # mean that the host is unhealthy
+            if is_connection_failure(e):
+                mirror_health.record_failure(substitution)
+            raise
+
+        mirror_health.record_success(substitution)
+
     @classmethod
     def __init_defaults(cls, project, meta):
         if cls.__defaults is None:
@@ -186,36 +186,7 @@ class CasBasedDirectory(Directory):
 
     def export_to_tar(self, tarfile: TarFile, destination_dir: str, mtime: int = BST_ARBITRARY_TIMESTAMP) -> None:
         self._ensure_local()
-        for filename, entry in sorted(self.__index.items()):
-            arcname = os.path.join(destination_dir, filename)
-            if entry.type == FileType.DIRECTORY:
-                tarinfo = tarfilelib.TarInfo(arcname)
-                tarinfo.mtime = mtime
-                tarinfo.type = tarfilelib.DIRTYPE
-                tarinfo.mode = 0o755
-                tarfile.addfile(tarinfo)
-                self.open_directory(filename).export_to_tar(tarfile, arcname, mtime)
-            elif entry.type == FileType.REGULAR_FILE:
-                source_name = self.__cas_cache.objpath(entry.digest)
-                tarinfo = tarfilelib.TarInfo(arcname)
-                tarinfo.mtime = mtime
-                if entry.is_executable:
-                    tarinfo.mode |= stat.S_IXUSR | stat.S_IXGRP | stat.S_IXOTH
-                tarinfo.size = os.path.getsize(source_name)
-                with open(source_name, "rb") as f:
-                    tarfile.addfile(tarinfo, f)
-            elif entry.type == FileType.SYMLINK:
-                assert entry.target is not None
-                tarinfo = tarfilelib.TarInfo(arcname)
-                tarinfo.mtime = mtime
-                tarinfo.mode = 0o777
-                tarinfo.linkname = entry.target
-                tarinfo.type = tarfilelib.SYMTYPE
-                sio = StringIO(entry.target)
-                bio = BytesIO(sio.read().encode("utf8"))
-                tarfile.addfile(tarinfo, bio)
-            else:
-                raise DirectoryError("can not export file type {} to tar".format(entry.type))
+        self.__export_to_tar(tarfile, destination_dir, mtime)
 
     def list_relative_paths(self) -> Iterator[str]:
         yield from self.__list_prefixed_relative_paths()
@@ -545,42 +516,68 @@ class CasBasedDirectory(Directory):
     #
     def _get_digest(self):
         if not self.__digest:
-            # Create updated Directory proto
-            pb2_directory = remote_execution_pb2.Directory()
+            pb2_directory = self.__create_pb2_directory(node_properties=True)
+            self.__digest = self.__cas_cache.add_object(buffer=pb2_directory.SerializeToString())
 
-            if self.__subtree_read_only is not None:
-                node_property = pb2_directory.node_properties.properties.add()
-                node_property.name = "SubtreeReadOnly"
-                node_property.value = "true" if self.__subtree_read_only else "false"
+        return self.__digest
 
-            for name, entry in sorted(self.__index.items()):
-                if entry.type == FileType.DIRECTORY:
-                    dirnode = pb2_directory.directories.add()
-                    dirnode.name = name
-
-                    # Update digests for subdirectories in DirectoryNodes.
-                    # No need to call entry.get_directory().
-                    # If it hasn't been instantiated, digest must be up-to-date.
-                    subdir = entry.directory
-                    if subdir is not None:
-                        dirnode.digest.CopyFrom(subdir._get_digest())
-                    else:
-                        dirnode.digest.CopyFrom(entry.digest)
-                elif entry.type == FileType.REGULAR_FILE:
-                    filenode = pb2_directory.files.add()
-                    filenode.name = name
-                    filenode.digest.CopyFrom(entry.digest)
-                    filenode.is_executable = entry.is_executable
-                    if entry.mtime is not None:
-                        filenode.node_properties.mtime.CopyFrom(entry.mtime)
-                elif entry.type == FileType.SYMLINK:
-                    symlinknode = pb2_directory.symlinks.add()
-                    symlinknode.name = name
-                    symlinknode.target = entry.target
+    # _get_digest_without_properties():
+    #
+    # Return the Digest for this directory, without the node properties of
+    # this directory itself, such as SubtreeReadOnly. Subdirectories keep
+    # their node properties and are referenced by their digest.
+    #
+    # Returns:
+    #   (Digest): The Digest protobuf object for the Directory protobuf
+    #
+    def _get_digest_without_properties(self):
+        if self.__subtree_read_only is None:
+            return self._get_digest()
 
-            self.__digest = self.__cas_cache.add_object(buffer=pb2_directory.SerializeToString())
+        pb2_directory = self.__create_pb2_directory(node_properties=False)
+        return self.__cas_cache.add_object(buffer=pb2_directory.SerializeToString())
 
-        return self.__digest
+    # __create_pb2_directory()
+    #
+    # Create the Directory proto of this directory
+    #
+    # Args:
+    #   node_properties: Whether to include the node properties of this directory
+    #
+    def __create_pb2_directory(self, *, node_properties: bool):
+        pb2_directory = remote_execution_pb2.Directory()
+
+        if node_properties and self.__subtree_read_only is not None:
+            node_property = pb2_directory.node_properties.properties.add()
+            node_property.name = "SubtreeReadOnly"
+            node_property.value = "true" if self.__subtree_read_only else "false"
+
+        for name, entry in sorted(self.__index.items()):
+            if entry.type == FileType.DIRECTORY:
+                dirnode = pb2_directory.directories.add()
+                dirnode.name = name
+
+                # Update digests for subdirectories in DirectoryNodes.
+                # No need to call entry.get_directory().
+                # If it hasn't been instantiated, digest must be up-to-date.
+                subdir = entry.directory
+                if subdir is not None:
+                    dirnode.digest.CopyFrom(subdir._get_digest())
+                else:
+                    dirnode.digest.CopyFrom(entry.digest)
+            elif entry.type == FileType.REGULAR_FILE:
+                filenode = pb2_directory.files.add()
+                filenode.name = name
+                filenode.digest.CopyFrom(entry.digest)
+                filenode.is_executable = entry.is_executable
+                if entry.mtime is not None:
+                    filenode.node_properties.mtime.CopyFrom(entry.mtime)
+            elif entry.type == FileType.SYMLINK:
+                symlinknode = pb2_directory.symlinks.add()
+                symlinknode.name = name
+                symlinknode.target = entry.target
+
+        return pb2_directory
 
     # __open_directory()
     #
@@ -892,6 +889,43 @@ class CasBasedDirectory(Directory):
         else:
             return target
 
+    # __export_to_tar()
+    #
+    # Add the content of this directory to a tarfile, the
+    # directory tree must be available in the local cache.
+    #
+    def __export_to_tar(self, tarfile: TarFile, destination_dir: str, mtime: int) -> None:
+        for filename, entry in sorted(self.__index.items()):
+            arcname = os.path.join(destination_dir, filename)
+            if entry.type == FileType.DIRECTORY:
+                tarinfo = tarfilelib.TarInfo(arcname)
+                tarinfo.mtime = mtime
+                tarinfo.type = tarfilelib.DIRTYPE
+                tarinfo.mode = 0o755
+                tarfile.addfile(tarinfo)
+                self.open_directory(filename).__export_to_tar(tarfile, arcname, mtime)
+            elif entry.type == FileType.REGULAR_FILE:
+                source_name = self.__cas_cache.objpath(entry.digest)
+                tarinfo = tarfilelib.TarInfo(arcname)
+                tarinfo.mtime = mtime
+                if entry.is_executable:
+                    tarinfo.mode |= stat.S_IXUSR | stat.S_IXGRP | stat.S_IXOTH
+                tarinfo.size = entry.digest.size_bytes
+                with open(source_name, "rb") as f:
+                    tarfile.addfile(tarinfo, f)
+            elif entry.type == FileType.SYMLINK:
+                assert entry.target is not None
+                tarinfo = tarfilelib.TarInfo(arcname)
+                tarinfo.mtime = mtime
+                tarinfo.mode = 0o777
+                tarinfo.linkname = entry.target
+                tarinfo.type = tarfilelib.SYMTYPE
+                sio = StringIO(entry.target)
+                bio = BytesIO(sio.read().encode("utf8"))
+                tarfile.addfile(tarinfo, bio)
+            else:
+                raise DirectoryError("can not export file type {} to tar".format(entry.type))
+
     def __invalidate_digest(self) -> None:
         if self.__digest:
             self.__digest = None
@@ -41,21 +41,24 @@ import threading
 import itertools
 from contextlib import contextmanager
 from pathlib import Path
-from typing import Callable, IO, Iterable, Iterator, Optional, Tuple, Union
-from google.protobuf import timestamp_pb2
+from typing import TYPE_CHECKING, Callable, IO, Iterable, Iterator, Optional, Tuple, Union
 
 import psutil
 
 from . import _signals
 from ._exceptions import BstError
 from .exceptions import ErrorDomain
-from ._protos.build.bazel.remote.execution.v2 import remote_execution_pb2
 from . import _site
 
 # Contains utils that have been rewritten in Cython for speed benefits
 # This makes them available when importing from utils
 from ._utils import url_directory_name  # pylint: disable=unused-import
 
+# Protobuf is only imported when it is needed, as this module is imported
+# by shell completion which must start quickly
+if TYPE_CHECKING:
+    from google.protobuf import timestamp_pb2
+
 # The magic number for timestamps: 2011-11-11 11:11:11
 BST_ARBITRARY_TIMESTAMP = calendar.timegm((2011, 11, 11, 11, 11, 11))
 
@@ -121,7 +124,7 @@ class FileListResult:
         """List of files that were written."""
 
 
-def _make_protobuf_timestamp(timestamp: timestamp_pb2.Timestamp, timepoint: float):  # pylint: disable=no-member
+def _make_protobuf_timestamp(timestamp: "timestamp_pb2.Timestamp", timepoint: float):  # pylint: disable=no-member
     """Obtain the Protobuf Timestamp represented by the time given in seconds.
 
     Args:
@@ -133,7 +136,7 @@ def _make_protobuf_timestamp(timestamp: timestamp_pb2.Timestamp, timepoint: floa
     timestamp.nanos = int(math.modf(timepoint)[0] * 1e9)
 
 
-def _get_file_protobuf_mtimestamp(timestamp: timestamp_pb2.Timestamp, fullpath: str):  # pylint: disable=no-member
+def _get_file_protobuf_mtimestamp(timestamp: "timestamp_pb2.Timestamp", fullpath: str):  # pylint: disable=no-member
     """Obtain the Protobuf Timestamp represented by the mtime of the
     file at the given path."""
     assert isinstance(fullpath, str), "Path to file must be a string: {}".format(str(fullpath))
@@ -144,7 +147,7 @@ def _get_file_protobuf_mtimestamp(timestamp: timestamp_pb2.Timestamp, fullpath:
     _make_protobuf_timestamp(timestamp, mtime)
 
 
-def _parse_protobuf_timestamp(timestamp: timestamp_pb2.Timestamp) -> float:  # pylint: disable=no-member
+def _parse_protobuf_timestamp(timestamp: "timestamp_pb2.Timestamp") -> float:  # pylint: disable=no-member
     """Convert Protobuf Timestamp to seconds since epoch.
 
     Args:
@@ -1509,6 +1512,8 @@ def _get_link_mtime(path):
 #    (remote_execution_pb2.Digest): Content digest
 #
 def _message_digest(message_buffer):
+    from ._protos.build.bazel.remote.execution.v2 import remote_execution_pb2
+
     sha = hashlib.sha256(message_buffer)
     digest = remote_execution_pb2.Digest()
     digest.hash = sha.hexdigest()
@@ -0,0 +1,77 @@
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+#
+#  Benchmarks of the sorting of dependencies of loaded elements
+#
+
+import random
+from types import SimpleNamespace
+
+import pytest
+
+from buildstream import Node
+from buildstream._loader import LoadElement, Dependency, DependencyType
+from buildstream._loader.loadelement import sort_dependencies  # pylint: disable=no-name-in-module
+
+pytestmark = pytest.mark.benchmark
+
+# Shapes of element graphs, as the number of elements, the number of
+# layers they are arranged in and the number of dependencies of each
+SHAPES = {
+    "wide": (2000, 2, 20),
+    "deep": (2000, 100, 5),
+    "dense": (1000, 10, 50),
+}
+
+# A stand in for the Loader, with what LoadElement needs of it
+_LOADER = SimpleNamespace(project=SimpleNamespace(junction=None), load_context=SimpleNamespace(task=None))
+
+
+# Build a graph of LoadElements in layers, each element depending on
+# elements of all previous layers, with the dependencies in an arbitrary
+# but reproducible order
+#
+def _generate_graph(elements, layers, fan_in):
+    generator = random.Random(0)
+    previous = []
+    layer_elements = []
+    for layer in range(layers):
+        layer_elements = []
+        for index in range(elements // layers):
+            element = LoadElement(Node.from_dict({"kind": "stack"}), "element-{}-{}.bst".format(layer, index), _LOADER)
+            if previous:
+                for dependency in generator.sample(previous, min(fan_in, len(previous))):
+                    dep_type = generator.choice([DependencyType.ALL, DependencyType.BUILD, DependencyType.RUNTIME])
+                    element.dependencies.append(Dependency(dependency, dep_type))
+            layer_elements.append(element)
+        previous.extend(layer_elements)
+
+    target = LoadElement(Node.from_dict({"kind": "stack"}), "target.bst", _LOADER)
+    for element in layer_elements:
+        target.dependencies.append(Dependency(element, DependencyType.ALL))
+    return target
+
+
+@pytest.mark.parametrize("shape", sorted(SHAPES))
+def test_sort_dependencies(benchmark, shape):
+    elements, layers, fan_in = SHAPES[shape]
+    benchmark.extra_info.update(elements=elements, layers=layers, fan_in=fan_in)
+
+    # The graph is generated anew for every round, as LoadElements
+    # cache what they depend on
+    targets = []
+
+    def generate_graph():
+        targets[:] = [_generate_graph(elements, layers, fan_in)]
+
+    benchmark(lambda: sort_dependencies(targets[0], set()), setup=generate_graph)
@@ -0,0 +1,104 @@
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+#
+#  Benchmarks of the composition of nodes, as done for every element
+#  when loading it, see Element.__extract_config() and friends.
+#
+
+# Pylint doesn't play well with fixtures and dependency injection from pytest
+# pylint: disable=redefined-outer-name
+
+import os
+
+import pytest
+
+import buildstream
+from buildstream import _yaml, Node
+
+pytestmark = pytest.mark.benchmark
+
+# The number of times to do an operation in a round
+ITERATIONS = 1000
+
+DATA_DIR = os.path.dirname(buildstream.__file__)
+
+
+# The defaults of a manual element, as composited from the project
+# configuration and the plugin configuration
+@pytest.fixture
+def defaults():
+    node = _yaml.load(os.path.join(DATA_DIR, "data", "projectconfig.yaml"), shortname=None)
+    plugin = _yaml.load(os.path.join(DATA_DIR, "plugins", "elements", "manual.yaml"), shortname=None)
+    plugin._composite(node)
+    return node
+
+
+# The configuration of an element, appending and prepending to the lists
+# of the defaults, and overriding some of its variables
+@pytest.fixture
+def overlay():
+    return Node.from_dict(
+        {
+            "variables": {
+                "prefix": "/opt/benchmark",
+                "conf-local": "--enable-benchmarks --disable-docs",
+                "command-subdir": "src",
+            },
+            "environment": {"LANG": "C.UTF-8", "PKG_CONFIG_PATH": "%{libdir}/pkgconfig"},
+            "config": {
+                "configure-commands": {"(>)": ["./configure %{conf-args}"]},
+                "build-commands": {"(>)": ["make -j%{max-jobs}", "make check"]},
+                "install-commands": {"(<)": ["mkdir -p %{install-root}"], "(>)": ["make install"]},
+                "strip-commands": {"(=)": ["%{strip-binaries}", "%{fix-pyc-timestamps}"]},
+            },
+            "public": {
+                "bst": {
+                    "split-rules": {
+                        "devel": {"(>)": ["%{libdir}/*.a", "%{includedir}/**"]},
+                        "benchmark": ["%{bindir}/benchmark-*"],
+                    }
+                }
+            },
+        }
+    )
+
+
+def test_composite(benchmark, defaults, overlay):
+    targets = []
+
+    def clone_defaults():
+        targets[:] = [defaults.clone() for _ in range(ITERATIONS)]
+
+    def composite():
+        for target in targets:
+            overlay._composite(target)
+
+    benchmark(composite, setup=clone_defaults)
+
+
+def test_assert_fully_composited(benchmark, defaults, overlay):
+    overlay._composite(defaults)
+
+    def assert_fully_composited():
+        for _ in range(ITERATIONS):
+            defaults._assert_fully_composited()
+
+    benchmark(assert_fully_composited)
+
+
+def test_clone(benchmark, defaults):
+    def clone():
+        for _ in range(ITERATIONS):
+            defaults.clone()
+
+    benchmark(clone)
@@ -0,0 +1,97 @@
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+#
+#  Benchmarks of the overhead of loading and scheduling, run with:
+#
+#      pytest --benchmarks --benchmark-json results.json tests/benchmarks
+#
+#  The number of elements can be scaled with the BST_BENCHMARK_SCALE
+#  environment variable, e.g. BST_BENCHMARK_SCALE=10 for ten times as
+#  many elements as by default.
+#
+
+# Pylint doesn't play well with fixtures and dependency injection from pytest
+# pylint: disable=redefined-outer-name
+
+import os
+
+import pytest
+
+from buildstream._testing import cli  # pylint: disable=unused-import
+from tests.testutils import generate_synthetic_project
+
+pytestmark = pytest.mark.benchmark
+
+SCALE = float(os.environ.get("BST_BENCHMARK_SCALE", "1"))
+
+# Shapes of element graphs, as arguments to generate_synthetic_project()
+SCENARIOS = {
+    "wide": {"elements": 500, "layers": 2, "fan_in": 5},
+    "deep": {"elements": 500, "layers": 50, "fan_in": 2},
+    "dense": {"elements": 300, "layers": 10, "fan_in": 20},
+    "includes": {"elements": 200, "layers": 10, "fan_in": 3, "include_depth": 5},
+    "options": {"elements": 200, "layers": 10, "fan_in": 3, "options": 10},
+    "junctions": {"elements": 200, "layers": 10, "fan_in": 3, "junction_depth": 3},
+}
+
+
+@pytest.fixture(params=sorted(SCENARIOS))
+def synthetic_project(request, tmpdir, benchmark):
+    parameters = dict(SCENARIOS[request.param])
+    parameters["elements"] = max(int(parameters["elements"] * SCALE), parameters["layers"])
+
+    project = os.path.join(str(tmpdir), "project")
+    target = generate_synthetic_project(project, **parameters)
+
+    benchmark.extra_info.update(parameters, scenario=request.param)
+    return project, target
+
+
+def test_load(cli, benchmark, synthetic_project):
+    project, target = synthetic_project
+    result = benchmark(
+        lambda: cli.run(project=project, silent=True, args=["show", "--deps", "none", "--format", "%{name}", target])
+    )
+    result.assert_success()
+
+
+def test_cache_keys(cli, benchmark, synthetic_project):
+    project, target = synthetic_project
+    result = benchmark(
+        lambda: cli.run(
+            project=project, silent=True, args=["show", "--deps", "all", "--format", "%{name} %{full-key}", target]
+        )
+    )
+    result.assert_success()
+
+
+def test_build(cli, tmpdir, benchmark, synthetic_project):
+    project, target = synthetic_project
+    rounds = iter(range(1000))
+
+    # Build in an empty cache every round
+    def use_new_cache():
+        cli.configure({"cachedir": os.path.join(str(tmpdir), "cache-{}".format(next(rounds)))})
+
+    result = benchmark(
+        lambda: cli.run(project=project, silent=True, args=["build", target]), rounds=3, setup=use_new_cache
+    )
+    result.assert_success()
+
+
+def test_build_cached(cli, benchmark, synthetic_project):
+    project, target = synthetic_project
+    cli.run(project=project, silent=True, args=["build", target]).assert_success()
+
+    result = benchmark(lambda: cli.run(project=project, silent=True, args=["build", target]))
+    result.assert_success()
@@ -0,0 +1,108 @@
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+#
+#  Benchmarks of the resolution of variables
+#
+
+# Pylint doesn't play well with fixtures and dependency injection from pytest
+# pylint: disable=redefined-outer-name
+
+import os
+
+import pytest
+
+import buildstream
+from buildstream import _yaml, Node
+from buildstream._variables import Variables  # pylint: disable=no-name-in-module
+
+pytestmark = pytest.mark.benchmark
+
+# The number of times to do an operation in a round
+ITERATIONS = 100
+
+DATA_DIR = os.path.dirname(buildstream.__file__)
+
+
+# A chain of variables, each one referring to the previous one
+#
+@pytest.mark.parametrize("depth", [10, 100, 1000])
+def test_resolve_chain(benchmark, depth):
+    variables = {"var-0": "root"}
+    for level in range(1, depth):
+        variables["var-{}".format(level)] = "%{{var-{}}}/level-{}".format(level - 1, level)
+    node = Node.from_dict(variables)
+    benchmark.extra_info["depth"] = depth
+
+    def resolve():
+        for _ in range(ITERATIONS):
+            Variables(node).check()
+
+    benchmark(resolve)
+
+
+# Many variables, each one referring to a number of others
+#
+@pytest.mark.parametrize("width", [10, 100])
+def test_resolve_wide(benchmark, width):
+    variables = {"var-{}".format(index): "value-{}".format(index) for index in range(width)}
+    for index in range(width):
+        variables["ref-{}".format(index)] = " ".join(
+            "%{{var-{}}}".format((index + offset) % width) for offset in range(10)
+        )
+    node = Node.from_dict(variables)
+    benchmark.extra_info["width"] = width
+
+    def resolve():
+        for _ in range(ITERATIONS):
+            Variables(node).check()
+
+    benchmark(resolve)
+
+
+# The default variables of a project, expanded in the commands of
+# a manual element as done when loading every element
+#
+def test_expand_config(benchmark):
+    defaults = _yaml.load(os.path.join(DATA_DIR, "data", "projectconfig.yaml"), shortname=None)
+    variables_node = defaults.get_mapping("variables")
+    variables_node["max-jobs"] = "8"
+    variables_node["project-name"] = "benchmark"
+    variables_node["element-name"] = "element"
+    config = Node.from_dict(
+        {
+            "configure-commands": ["%{autogen}", "%{configure}"],
+            "build-commands": ["%{make}"],
+            "install-commands": ["%{make-install}", "%{delete-libtool-archives}"],
+            "strip-commands": ["%{strip-binaries}"],
+        }
+    )
+    for name, value in (
+        ("autogen", "./autogen.sh"),
+        ("configure", "./configure %{conf-global} --prefix=%{prefix} --libdir=%{libdir}"),
+        ("conf-global", "--disable-static"),
+        ("make", "make -j%{max-jobs}"),
+        ("make-install", "make -j1 DESTDIR=%{install-root} install"),
+        ("delete-libtool-archives", "find %{install-root} -name '*.la' -delete"),
+    ):
+        variables_node[name] = value
+
+    configs = []
+
+    def clone_config():
+        configs[:] = [config.clone() for _ in range(ITERATIONS)]
+
+    def expand():
+        for node in configs:
+            Variables(variables_node).expand(node)
+
+    benchmark(expand, setup=clone_config)
@@ -0,0 +1,83 @@
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+#
+#  Benchmarks of loading YAML
+#
+
+# Pylint doesn't play well with fixtures and dependency injection from pytest
+# pylint: disable=redefined-outer-name
+
+import os
+
+import pytest
+
+import buildstream
+from buildstream import _yaml
+
+pytestmark = pytest.mark.benchmark
+
+# The number of times to do an operation in a round
+ITERATIONS = 100
+
+DATA_DIR = os.path.dirname(buildstream.__file__)
+
+
+# A large element, with many dependencies, sources, variables and commands
+#
+@pytest.fixture
+def element_file(tmpdir):
+    element = {
+        "kind": "manual",
+        "depends": [{"filename": "dependency-{}.bst".format(index), "type": "build"} for index in range(100)],
+        "sources": [
+            {"kind": "tar", "url": "upstream:source-{}.tar.gz".format(index), "ref": "{:064x}".format(index)}
+            for index in range(50)
+        ],
+        "variables": {"variable-{}".format(index): "%{{prefix}}/value-{}".format(index) for index in range(100)},
+        "config": {
+            "build-commands": ["make -C subdir-{} -j%{{max-jobs}}".format(index) for index in range(100)],
+            "install-commands": ["make -C subdir-{} install".format(index) for index in range(100)],
+        },
+    }
+    filename = os.path.join(str(tmpdir), "element.bst")
+    _yaml.roundtrip_dump(element, filename)
+    return filename
+
+
+def test_load_project_config(benchmark):
+    filename = os.path.join(DATA_DIR, "data", "projectconfig.yaml")
+
+    def load():
+        for _ in range(ITERATIONS):
+            _yaml.load(filename, shortname=None)
+
+    benchmark(load)
+
+
+def test_load_element(benchmark, element_file):
+    def load():
+        for _ in range(ITERATIONS):
+            _yaml.load(element_file, shortname=None)
+
+    benchmark(load)
+
+
+def test_load_data(benchmark, element_file):
+    with open(element_file, encoding="utf-8") as f:
+        data = f.read()
+
+    def load():
+        for _ in range(ITERATIONS):
+            _yaml.load_data(data)
+
+    benchmark(load)
@@ -27,6 +27,11 @@ from buildstream._testing._fixtures import (  # pylint: disable=unused-import
 )
 from buildstream._testing.integration import integration_cache  # pylint: disable=unused-import
 
+from tests.testutils.benchmark import (  # pylint: disable=unused-import
+    benchmark,
+    benchmark_baseline,
+    benchmark_results,
+)
 from tests.testutils.repo.tar import Tar
 
 
@@ -45,6 +50,17 @@ def pytest_addoption(parser):
     parser.addoption("--plugins", action="store_true", default=False, help="Run only plugins tests")
     parser.addoption("--remote-execution", action="store_true", default=False, help="Run remote-execution tests only")
     parser.addoption("--remote-cache", action="store_true", default=False, help="Run remote-cache tests only")
+    parser.addoption("--benchmarks", action="store_true", default=False, help="Run benchmarks only")
+    parser.addoption("--benchmark-json", default=None, help="Write the results of benchmarks to this JSON file")
+    parser.addoption(
+        "--benchmark-baseline", default=None, help="Fail benchmarks which regressed compared to this JSON file"
+    )
+    parser.addoption(
+        "--benchmark-threshold",
+        type=float,
+        default=20.0,
+        help="The slowdown in percent above which benchmarks are considered regressed (default: 20)",
+    )
 
 
 def pytest_collection_modifyitems(session, config, items):
@@ -74,6 +90,16 @@ def pytest_collection_modifyitems(session, config, items):
             if item.get_closest_marker("remotecache"):
                 item.add_marker(pytest.mark.skip("skipping remote-cache test"))
 
+        # With --benchmarks: only run tests marked with 'benchmark'
+        if config.getvalue("benchmarks"):
+            if not item.get_closest_marker("benchmark"):
+                item.add_marker(pytest.mark.skip("skipping non benchmark test"))
+
+        # Without --benchmarks: skip tests marked with 'benchmark'
+        else:
+            if item.get_closest_marker("benchmark"):
+                item.add_marker(pytest.mark.skip("skipping benchmark"))
+
         # With --plugins only run plugins tests
         if config.getvalue("plugins"):
             if not item.get_closest_marker("generic_source_test"):
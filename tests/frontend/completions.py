@@ -16,6 +16,9 @@
 # pylint: disable=redefined-outer-name
 
 import os
+import subprocess
+import sys
+
 import pytest
 from buildstream._testing import cli  # pylint: disable=unused-import
 
@@ -35,10 +38,12 @@ MAIN_OPTIONS = [
     "--default-mirror ",
     "--directory ",
     "--error-lines ",
+    "--event-file ",
     "--fetchers ",
     "--log-file ",
     "--max-jobs ",
     "--message-lines ",
+    "--metrics-file ",
     "--network-retries ",
     "--no-colors ",
     "--no-debug ",
@@ -51,6 +56,7 @@ MAIN_OPTIONS = [
     "--pull-buildtrees ",
     "--pushers ",
     "--strict ",
+    "--trace-file ",
     "--verbose ",
     "--version ",
 ]
@@ -391,3 +397,33 @@ def test_argument_artifact(cli, datafiles):
                 assert False, "unreachable"
 
             assert words in (expected1, expected2)
+
+
+# The modules which are only needed to run commands, and which shell
+# completion must not import to start quickly
+HEAVY_MODULES = ["grpc", "google.protobuf", "ruamel.yaml", "jinja2", "buildstream._context", "buildstream.element"]
+
+
+def test_completion_imports():
+    code = "import sys; import buildstream._frontend.cli; print('\\n'.join(sys.modules))"
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", code],
+        env={**os.environ, "_BST_COMPLETION": "complete"},
+        stdout=subprocess.PIPE,
+        stderr=subprocess.PIPE,
+        universal_newlines=True,
+        check=True,
+    )
+    modules = set(result.stdout.splitlines())
+
+    # Report the slowest imports to help finding what imported them
+    timings = []
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line.split("|")
+        timings.append((int(cumulative), name.strip()))
+    slowest = "\n".join("{:>10}us {}".format(*timing) for timing in sorted(timings, reverse=True)[:20])
+
+    for module in HEAVY_MODULES:
+        assert module not in modules, "{} was imported, slowest imports:\n{}".format(module, slowest)
@@ -35,6 +35,9 @@ class FetchSource(Source):
 
     BST_MIN_VERSION = "2.0"
 
+    # The fetchers are independent, fetch them concurrently
+    BST_CONCURRENT_SOURCE_FETCHERS = True
+
     # Read config to know which URLs to fetch
     def configure(self, node):
         self.original_urls = node.get_str_list("urls")
@@ -507,6 +507,50 @@ def test_incremental(cli, datafiles):
     assert get_buildtree_file_contents(cli, project, element_name, "copy") == "2"
 
 
+# Test that changing a build dependency prevents an incremental build
+@pytest.mark.datafiles(DATA_DIR)
+@pytest.mark.skipif(not HAVE_SANDBOX, reason="Only available with a functioning sandbox")
+def test_incremental_dependency_changed(cli, datafiles):
+    project = str(datafiles)
+    workspace = os.path.join(cli.directory, "workspace")
+    element_path = os.path.join(project, "elements")
+    element_name = "workspace/incremental.bst"
+    dependency_name = "workspace/incremental-dependency.bst"
+    dependency_files = os.path.join(project, "files", "workspace-incremental-dependency")
+
+    os.makedirs(dependency_files)
+    with open(os.path.join(dependency_files, "dependency"), "w", encoding="utf-8") as f:
+        f.write("1")
+    dependency = {"kind": "import", "sources": [{"kind": "local", "path": "files/workspace-incremental-dependency"}]}
+    _yaml.roundtrip_dump(dependency, os.path.join(element_path, dependency_name))
+
+    element = {
+        "kind": "manual",
+        "depends": [{"filename": "base.bst", "type": "build"}, {"filename": dependency_name, "type": "build"}],
+        "sources": [{"kind": "local", "path": "files/workspace-incremental"}],
+        "config": {"build-commands": ["make"]},
+    }
+    _yaml.roundtrip_dump(element, os.path.join(element_path, element_name))
+
+    res = cli.run(project=project, args=["workspace", "open", "--directory", workspace, element_name])
+    res.assert_success()
+
+    # Initial (non-incremental) build of the workspace
+    res = cli.run(project=project, args=["build", element_name])
+    res.assert_success()
+    random_hash = get_buildtree_file_contents(cli, project, element_name, "random")
+
+    # Change the build dependency
+    with open(os.path.join(dependency_files, "dependency"), "w", encoding="utf-8") as f:
+        f.write("2")
+
+    # The build is not incremental, and the user is told why
+    res = cli.run(project=project, args=["build", element_name])
+    res.assert_success()
+    assert "Not performing incremental build: build dependencies changed" in res.stderr
+    assert get_buildtree_file_contents(cli, project, element_name, "random") != random_hash
+
+
 # Test incremental build after partial build / build failure
 @pytest.mark.datafiles(DATA_DIR)
 @pytest.mark.skipif(not HAVE_SANDBOX, reason="Only available with a functioning sandbox")
@@ -0,0 +1,104 @@
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+
+import threading
+
+import pytest
+
+from buildstream._assetcache import AssetCache
+from buildstream._exceptions import AssetCacheError
+
+
+class _Remote:
+    def __init__(self, assets, *, error=False):
+        self.assets = assets
+        self.error = error
+        self.lookups = []
+        self.lock = threading.Lock()
+
+    def init(self):
+        pass
+
+    def fetch_blob(self, uris):
+        return self._fetch(uris, "blob")
+
+    def fetch_directory(self, uris):
+        return self._fetch(uris, "directory")
+
+    def _fetch(self, uris, kind):
+        with self.lock:
+            self.lookups.append((kind, uris[0]))
+        if self.error:
+            raise AssetCacheError("Lookup failed")
+        return self.assets.get(uris[0])
+
+
+# An asset cache with fixed remotes for each project, which does not need
+# buildbox-casd
+class _AssetCache(AssetCache):
+    def __init__(self, project_remotes):  # pylint: disable=super-init-not-called
+        self._resolved_assets = {}
+        self._project_remotes = project_remotes
+
+    def get_remotes(self, project_name, push):
+        return self._project_remotes.get(project_name, []), []
+
+
+def test_resolve_assets():
+    remote = _Remote({"urn:a": "response-a"})
+    cache = _AssetCache({"project": [remote]})
+
+    found = cache.resolve_assets([("project", "urn:a"), ("project", "urn:b"), ("project", "urn:a")], max_workers=4)
+    assert found == {"urn:a"}
+    assert sorted(remote.lookups) == [("blob", "urn:a"), ("blob", "urn:b")]
+
+    # Resolved hits and misses do not need another round trip
+    assert cache.fetch_asset(remote, "urn:a") == "response-a"
+    assert cache.fetch_asset(remote, "urn:b") is None
+    assert len(remote.lookups) == 2
+
+    # Results are only used once
+    assert cache.fetch_asset(remote, "urn:b") is None
+    assert len(remote.lookups) == 3
+
+
+def test_resolve_assets_kinds():
+    remote = _Remote({"urn:a": "response-a"})
+    cache = _AssetCache({"project": [remote]})
+
+    cache.resolve_assets([("project", "urn:a")], directory=True)
+    assert remote.lookups == [("directory", "urn:a")]
+
+    # A directory lookup does not answer a blob lookup
+    assert cache.fetch_asset(remote, "urn:a") == "response-a"
+    assert remote.lookups == [("directory", "urn:a"), ("blob", "urn:a")]
+    assert cache.fetch_asset(remote, "urn:a", directory=True) == "response-a"
+    assert len(remote.lookups) == 2
+
+
+@pytest.mark.parametrize("error", [True, False], ids=["error", "success"])
+def test_resolve_assets_errors(error):
+    remote = _Remote({"urn:a": "response-a"}, error=error)
+    cache = _AssetCache({"project": [remote]})
+
+    found = cache.resolve_assets([("project", "urn:a")])
+    assert found == (set() if error else {"urn:a"})
+
+    # Failed lookups are not recorded, they are retried when fetching
+    if error:
+        with pytest.raises(AssetCacheError):
+            cache.fetch_asset(remote, "urn:a")
+        assert len(remote.lookups) == 2
+    else:
+        assert cache.fetch_asset(remote, "urn:a") == "response-a"
+        assert len(remote.lookups) == 1
@@ -0,0 +1,79 @@
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+
+# Pylint doesn't play well with fixtures and dependency injection from pytest
+# pylint: disable=redefined-outer-name
+
+import multiprocessing
+import os
+import signal
+
+import pytest
+
+from buildstream._exceptions import PluginError
+from buildstream.plugin import _BlockingActivityPool
+
+
+@pytest.fixture
+def pool():
+    pool = _BlockingActivityPool(multiprocessing.get_context("forkserver"), 1)
+    yield pool
+
+    for worker in pool._idle_workers:
+        worker.kill()
+
+
+def test_workers_are_reused(pool):
+    worker = pool.acquire()
+    err, first_pid = worker.run(os.getpid, ())
+    assert err is None
+    assert first_pid != os.getpid()
+    pool.release(worker)
+
+    worker = pool.acquire()
+    err, second_pid = worker.run(os.getpid, ())
+    assert err is None
+    assert second_pid == first_pid
+    pool.release(worker)
+
+
+def test_concurrent_workers(pool):
+    first = pool.acquire()
+    second = pool.acquire()
+    assert first.run(os.getpid, ())[1] != second.run(os.getpid, ())[1]
+
+    # Only one idle worker is kept
+    pool.release(first)
+    pool.release(second)
+    assert pool._idle_workers == [first]
+    assert not second.is_alive()
+
+
+def test_exceptions_are_reported(pool):
+    worker = pool.acquire()
+    err, result = worker.run(os.stat, ("/nonexistent",))
+    assert result is None
+    assert "FileNotFoundError" in err
+
+    # The worker remains usable
+    assert worker.run(os.getpid, ())[0] is None
+    pool.release(worker)
+
+
+def test_dead_worker(pool):
+    worker = pool.acquire()
+    pid = worker.run(os.getpid, ())[1]
+
+    with pytest.raises(PluginError):
+        worker.run(os.kill, (pid, signal.SIGKILL))
+    worker.kill()
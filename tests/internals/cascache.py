@@ -11,12 +11,24 @@
 #  See the License for the specific language governing permissions and
 #  limitations under the License.
 #
+import concurrent.futures
+import contextlib
 import os
+import stat
+import threading
 import time
 from unittest.mock import MagicMock
 
-from buildstream._cas import casdprocessmanager
+import psutil
+import pytest
+
+from buildstream._cas import CASDProcessManager, CASLogLevel, casdprocessmanager
+from buildstream._cas import cascache as cascache_module
+from buildstream._cas import casstatcache
+from buildstream._cas.casstatcache import CASStatCache, _ScannedDirectory
+from buildstream._exceptions import CASCacheError
 from buildstream._messenger import Messenger
+from buildstream._protos.build.buildgrid import local_cas_pb2
 from tests.testutils import casd_cache
 
 
@@ -129,3 +141,216 @@ def test_casd_redirects_stderr_to_file_and_rotate(tmp_path, monkeypatch):
         assert len(existing_log_files) == n_max_log_files
         assert evicted_file not in existing_log_files
         assert existing_log_files[-1].read_text() == "hello\n"
+
+
+def test_staged_trees_are_reused(tmp_path):
+    source = tmp_path.joinpath("source")
+    source.mkdir()
+    source.joinpath("file").write_text("content")
+    source.joinpath("directory").mkdir()
+
+    with casd_cache(tmp_path.joinpath("casd")) as cascache:
+        digest = cascache.import_directory(str(source))
+
+        with cascache.stage_directory(digest, reuse=True) as first_path:
+            # Staged trees are only used by one user at a time
+            with cascache.stage_directory(digest, reuse=True) as concurrent_path:
+                assert concurrent_path != first_path
+
+        # The tree remains staged after its user released it
+        with cascache.stage_directory(digest, reuse=True) as later_path:
+            assert later_path == first_path
+            assert os.path.exists(os.path.join(later_path, "file"))
+
+            # Modified trees are not reused
+            with open(os.path.join(later_path, "new-file"), "w", encoding="utf-8") as f:
+                f.write("content")
+
+        with cascache.stage_directory(digest, reuse=True) as path:
+            assert not os.path.exists(os.path.join(path, "new-file"))
+
+            # Neither are trees whose entries were modified in place
+            os.chmod(os.path.join(path, "directory"), 0o700)
+
+        with cascache.stage_directory(digest, reuse=True) as path:
+            assert stat.S_IMODE(os.stat(os.path.join(path, "directory")).st_mode) != 0o700
+
+        # Staging without reuse always stages a separate copy
+        with cascache.stage_directory(digest) as private_path:
+            assert private_path != path
+
+
+def test_staged_trees_expire(tmp_path, monkeypatch):
+    monkeypatch.setattr(cascache_module, "_STAGED_TREE_IDLE_TIMEOUT", 0.1)
+    source = tmp_path.joinpath("source")
+    source.mkdir()
+
+    with casd_cache(tmp_path.joinpath("casd")) as cascache:
+        digest = cascache.import_directory(str(source))
+
+        with cascache.stage_directory(digest, reuse=True):
+            pass
+
+        # Unused staged trees are released after the idle timeout
+        for _ in range(100):
+            if not cascache._staged_trees._idle_trees:
+                break
+            time.sleep(0.1)
+        assert not cascache._staged_trees._idle_trees
+
+
+def _attach_shared_casd(tmp_path, cache_quota=None):
+    path = str(tmp_path.joinpath("casd"))
+    log_dir = str(tmp_path.joinpath("logs"))
+    return CASDProcessManager(path, log_dir, CASLogLevel.WARNING, cache_quota, None, True, None, shared=True)
+
+
+def test_shared_casd(tmp_path):
+    barrier = threading.Barrier(2, timeout=30)
+    sessions = []
+
+    def attach():
+        barrier.wait()
+        sessions.append(_attach_shared_casd(tmp_path))
+
+    # Sessions starting concurrently attach to the same buildbox-casd,
+    # which is ready once they are attached
+    threads = [threading.Thread(target=attach) for _ in range(2)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    first, second = sessions
+    try:
+        assert first.process is None
+        assert second._socket_path == first._socket_path
+        assert second._shared_pid == first._shared_pid
+        assert casdprocessmanager._accepts_connections(first._socket_path)
+        second.get_local_cas()
+    finally:
+        first.release_resources()
+        second.release_resources()
+
+    # The shared buildbox-casd outlives the sessions and is reused
+    third = _attach_shared_casd(tmp_path)
+    try:
+        assert third._shared_pid == first._shared_pid
+    finally:
+        third.release_resources()
+
+        watchdog = psutil.Process(first._shared_pid)
+        watchdog.terminate()
+        watchdog.wait(timeout=30)
+    assert not os.path.exists(first._socket_path)
+
+
+def test_shared_casd_idle(tmp_path, monkeypatch):
+    monkeypatch.setattr(casdprocessmanager, "_SHARED_CASD_IDLE_TIMEOUT", 1)
+
+    casd = _attach_shared_casd(tmp_path)
+    casd.release_resources()
+
+    # It exits once it has been idle for long enough
+    with contextlib.suppress(psutil.NoSuchProcess):
+        psutil.Process(casd._shared_pid).wait(timeout=60)
+    assert not os.path.exists(casd._socket_path)
+
+
+def test_shared_casd_quota(tmp_path):
+    # The blobs of each session cannot be protected with a shared buildbox-casd
+    with pytest.raises(CASCacheError):
+        _attach_shared_casd(tmp_path, cache_quota=1024 * 1024 * 1024)
+
+
+def test_casd_channels(tmp_path):
+    path = str(tmp_path.joinpath("casd"))
+    casd = CASDProcessManager(
+        path, str(tmp_path.joinpath("logs")), CASLogLevel.WARNING, None, None, True, None, channels=2
+    )
+    try:
+        # Threads are assigned channels in turn, and keep using the same one
+        local_cas = casd.get_local_cas()
+        assert casd.get_local_cas() is local_cas
+
+        with concurrent.futures.ThreadPoolExecutor(max_workers=1) as executor:
+            other_local_cas = executor.submit(casd.get_local_cas).result()
+        assert other_local_cas is not local_cas
+
+        # All channels are usable
+        for stub in [local_cas, other_local_cas]:
+            request = local_cas_pb2.GetLocalDiskUsageRequest()
+            stub.GetLocalDiskUsage(request)
+    finally:
+        casd.release_resources()
+
+
+@pytest.mark.parametrize("properties", [None, ["mtime"]], ids=["no-properties", "mtime"])
+def test_stat_cache_import_directory(tmp_path, properties):
+    source = tmp_path.joinpath("source")
+    source.joinpath("subdir").mkdir(parents=True)
+    source.joinpath("file").write_text("content")
+    source.joinpath("subdir", "script").write_text("#!/bin/sh\n")
+    source.joinpath("subdir", "script").chmod(0o755)
+    source.joinpath("link").symlink_to("file")
+
+    # Backdate the files, recently modified files are not recorded in the stat cache
+    old = time.time() - 60
+    for path in [source.joinpath("file"), source.joinpath("subdir", "script")]:
+        os.utime(path, (old, old))
+
+    with casd_cache(tmp_path.joinpath("casd")) as cascache:
+        expected = cascache.import_directory(str(source), properties)
+
+        # The first import is verified against buildbox-casd, the second one uses the cache
+        assert cascache.import_directory(str(source), properties, use_stat_cache=True) == expected
+        assert cascache.import_directory(str(source), properties, use_stat_cache=True) == expected
+
+        # Modifications are picked up
+        source.joinpath("subdir", "new").write_text("new")
+        source.joinpath("file").write_text("modified")
+        os.utime(source.joinpath("file"), (old + 1, old + 1))
+        expected = cascache.import_directory(str(source), properties)
+        assert cascache.import_directory(str(source), properties, use_stat_cache=True) == expected
+
+
+def test_stat_cache_scan_signature(tmp_path):
+    for i in range(4):
+        subdir = tmp_path.joinpath("dir{}".format(i), "nested")
+        subdir.mkdir(parents=True)
+        subdir.joinpath("file").write_text("content {}".format(i))
+    os.symlink("dir0", str(tmp_path.joinpath("link")))
+
+    start_time = time.time_ns()
+    scanned = _ScannedDirectory.scan(str(tmp_path), start_time)
+    assert sorted(scanned.directories) == ["dir0", "dir1", "dir2", "dir3"]
+    assert scanned.symlinks == {"link": "dir0"}
+    assert scanned.racy
+
+    # The signature only changes when a file changes
+    assert _ScannedDirectory.scan(str(tmp_path), start_time).signature == scanned.signature
+    tmp_path.joinpath("dir2", "nested", "file").write_text("modified content")
+    rescanned = _ScannedDirectory.scan(str(tmp_path), start_time)
+    assert rescanned.signature != scanned.signature
+    assert rescanned.directories["dir1"].signature == scanned.directories["dir1"].signature
+    assert rescanned.directories["dir2"].signature != scanned.directories["dir2"].signature
+
+
+def test_stat_cache_scan_error(tmp_path):
+    with pytest.raises(CASCacheError):
+        _ScannedDirectory.scan(str(tmp_path.joinpath("missing")), time.time_ns())
+
+
+def test_stat_cache_prune(tmp_path, monkeypatch):
+    monkeypatch.setattr(casstatcache, "_MAX_CACHE_FILES", 2)
+    path = tmp_path.joinpath("stat-cache")
+    path.mkdir()
+
+    now = time.time()
+    for name, age in [("recent", 0), ("older", 60), ("oldest", 120), ("expired", casstatcache._CACHE_FILE_EXPIRY + 1)]:
+        path.joinpath(name).write_text("{}")
+        os.utime(path.joinpath(name), (now - age, now - age))
+
+    # The least recently used cache files beyond the maximum are removed, as are expired ones
+    CASStatCache(None, str(path))._prune()
+    assert sorted(os.listdir(str(path))) == ["older", "recent"]
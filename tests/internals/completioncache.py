@@ -0,0 +1,54 @@
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+
+import os
+
+from buildstream._frontend.completioncache import CompletionCache
+
+
+def test_element_path(tmp_path):
+    cache_file = str(tmp_path.joinpath("completion.json"))
+    project_conf = tmp_path.joinpath("project.conf")
+    project_conf.write_text("name: test\nelement-path: elements\n")
+
+    cache = CompletionCache(cache_file)
+    assert cache.get_element_path(str(project_conf)) is None
+    cache.set_element_path(str(project_conf), "elements")
+    cache.save()
+
+    assert CompletionCache(cache_file).get_element_path(str(project_conf)) == "elements"
+
+    # Modifying the project.conf invalidates the cached element path
+    stat = project_conf.stat()
+    os.utime(project_conf, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1000000000))
+    assert CompletionCache(cache_file).get_element_path(str(project_conf)) is None
+
+
+def test_artifactdir(tmp_path, monkeypatch):
+    cache_file = str(tmp_path.joinpath("completion.json"))
+    monkeypatch.setenv("XDG_CONFIG_HOME", str(tmp_path))
+
+    cache = CompletionCache(cache_file)
+    cache.set_artifactdir(None, "/artifacts")
+    cache.save()
+    assert CompletionCache(cache_file).get_artifactdir(None) == "/artifacts"
+
+    # Creating a user configuration invalidates the cached artifact directory
+    tmp_path.joinpath("buildstream.conf").write_text("cachedir: /cache\n")
+    assert CompletionCache(cache_file).get_artifactdir(None) is None
+
+
+def test_corrupted_cache(tmp_path):
+    cache_file = tmp_path.joinpath("completion.json")
+    cache_file.write_text("{")
+    assert CompletionCache(str(cache_file)).get_artifactdir(None) is None
@@ -0,0 +1,139 @@
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+#
+import http.server
+import socket
+import threading
+import urllib.error
+import urllib.request
+
+import pytest
+
+from buildstream.downloadablefilesource import _KeepAliveHTTPHandler
+
+
+# A server answering with a fixed body on persistent connections, and
+# counting the connections it accepted
+class _Handler(http.server.BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def setup(self):
+        super().setup()
+        self.server.connections += 1
+
+    def do_GET(self):  # pylint: disable=invalid-name
+        body = b"hello"
+        self.send_response(200)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+        # Drop the connection without telling the client, as a
+        # server closing idle connections does
+        if self.server.drop_idle:
+            self.close_connection = True
+
+    def log_message(self, *args):  # pylint: disable=arguments-differ
+        pass
+
+
+@pytest.fixture
+def server():
+    httpd = http.server.ThreadingHTTPServer(("127.0.0.1", 0), _Handler)
+    httpd.connections = 0
+    httpd.drop_idle = False
+    thread = threading.Thread(target=httpd.serve_forever)
+    thread.start()
+    yield httpd
+    httpd.shutdown()
+    httpd.server_close()
+    thread.join()
+
+
+# Open the url in a thread, such that a hang fails the test
+def fetch(url):
+    opener = urllib.request.build_opener(_KeepAliveHTTPHandler)
+    results = []
+
+    def run():
+        try:
+            with opener.open(url, timeout=10) as response:
+                results.append(response.read())
+        except Exception as e:  # pylint: disable=broad-except
+            results.append(e)
+
+    thread = threading.Thread(target=run, daemon=True)
+    thread.start()
+    thread.join(timeout=30)
+    assert results, "Request did not complete"
+    return results[0]
+
+
+def test_reuse_connection(server):
+    url = "http://127.0.0.1:{}/file".format(server.server_port)
+    assert fetch(url) == b"hello"
+    assert fetch(url) == b"hello"
+    assert server.connections == 1
+
+
+def test_retry_dropped_idle_connection(server):
+    server.drop_idle = True
+    url = "http://127.0.0.1:{}/file".format(server.server_port)
+    assert fetch(url) == b"hello"
+
+    # The pooled connection was closed by the server, the request is
+    # retried on a new connection
+    assert fetch(url) == b"hello"
+    assert server.connections == 2
+
+
+def test_connection_refused():
+    # Find a port nothing listens on
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        port = sock.getsockname()[1]
+    url = "http://127.0.0.1:{}/file".format(port)
+
+    # Failed connections are not handed out again
+    for _ in range(3):
+        assert isinstance(fetch(url), urllib.error.URLError)
+
+
+def test_connection_dropped():
+    # A server closing every connection without answering
+    listener = socket.socket()
+    listener.bind(("127.0.0.1", 0))
+    listener.listen(8)
+    listener.settimeout(0.1)
+    stop = threading.Event()
+
+    def serve():
+        while not stop.is_set():
+            try:
+                connection, _ = listener.accept()
+            except socket.timeout:
+                continue
+            connection.recv(65536)
+            connection.close()
+
+    thread = threading.Thread(target=serve, daemon=True)
+    thread.start()
+    url = "http://127.0.0.1:{}/file".format(listener.getsockname()[1])
+
+    try:
+        for _ in range(3):
+            assert isinstance(fetch(url), (urllib.error.URLError, ConnectionError))
+    finally:
+        stop.set()
+        thread.join(timeout=10)
+        listener.close()
@@ -0,0 +1,155 @@
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+
+import hashlib
+import multiprocessing
+import os
+import re
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from buildstream import downloadablefilesource
+from buildstream.downloadablefilesource import _download_file, _UrlOpenerCreator
+
+
+class _RequestHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def setup(self):
+        super().setup()
+        with self.server.connections.get_lock():
+            self.server.connections.value += 1
+
+    def do_GET(self):
+        content = self.server.files.get(self.path)
+        if content is None:
+            self.send_error(404)
+            return
+
+        match = re.fullmatch(r"bytes=(\d+)-(\d+)", self.headers.get("Range", ""))
+        if match and self.server.ranges and self.server.honor_ranges:
+            start, end = int(match.group(1)), int(match.group(2)) + 1
+            self.send_response(206)
+            self.send_header("Content-Range", "bytes {}-{}/{}".format(start, end - 1, len(content)))
+            with self.server.range_requests.get_lock():
+                self.server.range_requests.value += 1
+        else:
+            start, end = 0, len(content)
+            self.send_response(200)
+
+        if self.server.ranges:
+            self.send_header("Accept-Ranges", "bytes")
+        self.send_header("Content-Length", str(end - start))
+        self.end_headers()
+
+        try:
+            self.wfile.write(content[start:end])
+        except ConnectionError:
+            # The client closes the connection after reading the first part
+            pass
+
+    def log_message(self, *args):  # pylint: disable=arguments-differ
+        pass
+
+
+class _HttpServer(multiprocessing.Process):
+    def __init__(self, files, *, ranges, honor_ranges):
+        super().__init__()
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), _RequestHandler)
+        self.server.daemon_threads = True
+        self.server.files = files
+        self.server.ranges = ranges
+        self.server.honor_ranges = honor_ranges
+        self.server.connections = multiprocessing.Value("i", 0)
+        self.server.range_requests = multiprocessing.Value("i", 0)
+
+    def run(self):
+        self.server.serve_forever()
+
+    def stop(self):
+        self.terminate()
+        self.join()
+        self.server.server_close()
+
+    def download(self, path, directory):
+        url = "http://127.0.0.1:{}{}".format(self.server.server_port, path)
+        return _download_file(_UrlOpenerCreator(None), url, None, str(directory), False)
+
+
+@contextmanager
+def _http_server(files, *, ranges=True, honor_ranges=True):
+    server = _HttpServer(files, ranges=ranges, honor_ranges=honor_ranges)
+    server.start()
+    try:
+        yield server
+    finally:
+        server.stop()
+
+
+def test_connections_are_reused(tmp_path):
+    files = {"/file{}".format(i): "content {}".format(i).encode() for i in range(3)}
+
+    with _http_server(files) as server:
+        for path, content in files.items():
+            local_file, _, sha256, error, _ = server.download(path, tmp_path)
+            assert error is None
+            with open(local_file, "rb") as f:
+                assert f.read() == content
+            assert sha256 == hashlib.sha256(content).hexdigest()
+
+        assert server.server.connections.value == 1
+
+
+@pytest.mark.parametrize("ranges", [True, False], ids=["ranges", "no-ranges"])
+def test_large_file(tmp_path, monkeypatch, ranges):
+    monkeypatch.setattr(downloadablefilesource, "_RANGED_DOWNLOAD_THRESHOLD", 1024)
+    monkeypatch.setattr(downloadablefilesource, "_BUFFER_SIZE", 4096)
+
+    content = os.urandom(1024 * 1024 + 17)
+
+    with _http_server({"/large": content}, ranges=ranges) as server:
+        local_file, _, sha256, error, _ = server.download("/large", tmp_path)
+        assert error is None
+        with open(local_file, "rb") as f:
+            assert f.read() == content
+        assert sha256 == hashlib.sha256(content).hexdigest()
+
+        if ranges:
+            assert server.server.range_requests.value == downloadablefilesource._RANGED_DOWNLOAD_PARTS - 1
+        else:
+            assert server.server.range_requests.value == 0
+
+
+def test_range_requests_not_honored(tmp_path, monkeypatch):
+    monkeypatch.setattr(downloadablefilesource, "_RANGED_DOWNLOAD_THRESHOLD", 1024)
+    monkeypatch.setattr(downloadablefilesource, "_BUFFER_SIZE", 4096)
+
+    content = os.urandom(1024 * 1024 + 17)
+
+    # The server advertises ranges, but answers range requests with the whole file
+    with _http_server({"/large": content}, honor_ranges=False) as server:
+        local_file, _, sha256, error, _ = server.download("/large", tmp_path)
+        assert error is None
+        with open(local_file, "rb") as f:
+            assert f.read() == content
+        assert sha256 == hashlib.sha256(content).hexdigest()
+
+
+def test_missing_file(tmp_path):
+    with _http_server({}) as server:
+        local_file, _, _, error, cause = server.download("/missing", tmp_path)
+        assert local_file is None
+        assert "404" in error
+        assert cause is None
@@ -0,0 +1,58 @@
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+
+import datetime
+import json
+
+from buildstream._frontend.eventstream import EventStream
+from buildstream._state import State
+
+
+def test_events(tmp_path):
+    path = tmp_path.joinpath("events")
+    state = State(datetime.datetime.now())
+    group = state.add_task_group("Build")
+
+    with open(path, "w", encoding="utf-8") as f:
+        events = EventStream(f)
+        events.connect(state)
+
+        state.add_task("Build:1", "Build", "base.bst")
+        state.remove_task("Build:1")
+        group.add_processed_task()
+
+        state.add_task("Build:2", "Build", "target.bst")
+
+        # Failures are written out immediately
+        state.fail_task("Build:2")
+        lines = path.read_text().splitlines()
+        assert json.loads(lines[-1])["event"] == "task-failed"
+
+        group.add_failed_task("target.bst")
+        state.remove_task("Build:2")
+        events.close()
+
+    events = [json.loads(line) for line in path.read_text().splitlines()]
+    assert [(event["event"], event.get("name")) for event in events] == [
+        ("task-added", "base.bst"),
+        ("task-removed", "base.bst"),
+        ("queue", "Build"),
+        ("task-added", "target.bst"),
+        ("task-failed", "target.bst"),
+        ("queue", "Build"),
+        ("task-removed", "target.bst"),
+    ]
+    assert events[0]["id"] == "Build:1"
+    assert events[0]["action"] == "Build"
+    assert (events[5]["processed"], events[5]["skipped"], events[5]["failed"]) == (1, 0, 1)
+    assert all(event["time"] >= 0 for event in events)
@@ -0,0 +1,162 @@
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+
+import threading
+import time
+
+import pytest
+
+from buildstream._fetchpool import FetchPool
+from buildstream._messenger import Messenger
+from buildstream._signals import TerminateException
+from buildstream._utils import terminate_thread
+
+
+def test_concurrent_operations():
+    pool = FetchPool(Messenger(), 3)
+    barrier = threading.Barrier(3, timeout=10)
+    threads = set()
+
+    def operation():
+        threads.add(threading.get_ident())
+        barrier.wait()
+
+    # All three operations must be running at the same time to pass the barrier
+    pool.run([operation] * 3)
+    assert len(threads) == 3
+
+
+def test_budget():
+    pool = FetchPool(Messenger(), 1)
+    threads = []
+
+    def operation():
+        threads.append(threading.get_ident())
+
+    # Without free slots, operations run one by one in the calling thread
+    pool.run([operation] * 3)
+    assert threads == [threading.get_ident()] * 3
+
+
+def test_nested():
+    pool = FetchPool(Messenger(), 2)
+    count = []
+
+    def inner():
+        count.append(None)
+
+    def outer():
+        pool.run([inner] * 3)
+
+    pool.run([outer] * 3)
+    assert len(count) == 9
+
+
+def test_first_error():
+    pool = FetchPool(Messenger(), 1)
+    done = []
+
+    def succeed():
+        done.append("succeed")
+
+    def fail(message):
+        done.append(message)
+        raise RuntimeError(message)
+
+    # Operations are not started after a failure
+    with pytest.raises(RuntimeError, match="first"):
+        pool.run([succeed, lambda: fail("first"), lambda: fail("second")])
+    assert done == ["succeed", "first"]
+
+
+def test_messenger_context():
+    messenger = Messenger()
+    messenger.setup_new_action_context("Fetch", "element.bst", None)
+    pool = FetchPool(messenger, 2)
+    contexts = []
+    barrier = threading.Barrier(2, timeout=10)
+
+    def operation():
+        contexts.append(messenger.get_thread_context())
+        barrier.wait()
+
+    pool.run([operation] * 2)
+    assert contexts == [messenger.get_thread_context()] * 2
+
+
+def test_terminate():
+    pool = FetchPool(Messenger(), 3)
+    barrier = threading.Barrier(4, timeout=10)
+    terminated = []
+    result = []
+
+    def operation():
+        barrier.wait()
+        try:
+            while True:
+                time.sleep(0.01)
+        except TerminateException:
+            terminated.append(threading.get_ident())
+            raise
+
+    def job():
+        try:
+            pool.run([operation] * 3)
+        except TerminateException:
+            result.append("terminated")
+
+    thread = threading.Thread(target=job)
+    thread.start()
+    barrier.wait()
+
+    # Terminating the job thread also terminates the operations in other threads
+    terminate_thread(thread.ident)
+    thread.join(timeout=10)
+    assert result == ["terminated"]
+
+    for _ in range(3):
+        assert pool._slots.acquire(timeout=10)  # pylint: disable=consider-using-with
+    assert len(set(terminated)) == 3
+
+
+def test_terminate_waiting_for_slot():
+    pool = FetchPool(Messenger(), 1)
+    started = threading.Event()
+    release = threading.Event()
+    result = []
+
+    def hold_slot():
+        started.set()
+        release.wait(timeout=10)
+
+    def job():
+        try:
+            pool.run([lambda: result.append("ran")])
+        except TerminateException:
+            result.append("terminated")
+
+    holder = threading.Thread(target=lambda: pool.run([hold_slot]))
+    holder.start()
+    assert started.wait(timeout=10)
+
+    # A job waiting for a slot can be terminated
+    thread = threading.Thread(target=job)
+    thread.start()
+    time.sleep(0.1)
+    terminate_thread(thread.ident)
+    thread.join(timeout=10)
+    assert result == ["terminated"]
+
+    release.set()
+    holder.join(timeout=10)
+    assert pool._slots.acquire(timeout=10)  # pylint: disable=consider-using-with
@@ -0,0 +1,90 @@
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+
+import subprocess
+import time
+
+from buildstream import _logwriter
+from buildstream._logwriter import LogWriter
+from buildstream._message import Message, MessageType
+from buildstream._messenger import Messenger
+
+
+def test_buffered_writes(tmp_path):
+    path = tmp_path.joinpath("log")
+    with open(path, "w", encoding="utf-8") as f:
+        writer = LogWriter(f)
+        writer.write("first\n")
+        writer.write("second\n")
+        assert path.read_text() == ""
+
+        # Failures are written out immediately, after the buffered text
+        writer.write("failure\n", flush=True)
+        assert path.read_text() == "first\nsecond\nfailure\n"
+
+        writer.write("last\n")
+        writer.close()
+        assert path.read_text() == "first\nsecond\nfailure\nlast\n"
+
+
+def test_periodic_flush(tmp_path):
+    path = tmp_path.joinpath("log")
+    with open(path, "w", encoding="utf-8") as f:
+        writer = LogWriter(f)
+        writer.write("message\n")
+
+        deadline = time.monotonic() + 10 * _logwriter._FLUSH_INTERVAL
+        while path.read_text() == "" and time.monotonic() < deadline:
+            time.sleep(_logwriter._FLUSH_INTERVAL / 10)
+        assert path.read_text() == "message\n"
+        writer.close()
+
+
+def test_bounded_buffer(tmp_path, monkeypatch):
+    monkeypatch.setattr(_logwriter, "_MAX_PENDING", 10)
+    path = tmp_path.joinpath("log")
+    with open(path, "w", encoding="utf-8") as f:
+        writer = LogWriter(f)
+        writer.write("short\n")
+        assert path.read_text() == ""
+        writer.write("long enough\n")
+        assert path.read_text() == "short\nlong enough\n"
+        writer.close()
+
+
+def test_direct_output_ordering(tmp_path):
+    path = tmp_path.joinpath("log")
+    with open(path, "w", encoding="utf-8") as f:
+        writer = LogWriter(f)
+        writer.write("before\n")
+        with writer.direct() as handle:
+            subprocess.run(["echo", "output"], stdout=handle, check=True)
+            writer.write("during\n")
+            subprocess.run(["echo", "more output"], stdout=handle, check=True)
+        writer.close()
+
+    assert path.read_text() == "before\noutput\nduring\nmore output\n"
+
+
+def test_recorded_messages(tmp_path):
+    messenger = Messenger()
+    messenger.set_message_handler(lambda message, is_silenced: None)
+    with messenger.recorded_messages("test", str(tmp_path)) as filename:
+        messenger.message(Message(MessageType.STATUS, "status message"))
+        with messenger.direct_log_handle() as handle:
+            subprocess.run(["echo", "command output"], stdout=handle, check=True)
+
+    with open(filename, encoding="utf-8") as f:
+        lines = f.read().splitlines()
+    assert lines[1].endswith("status message")
+    assert lines[2] == "command output"
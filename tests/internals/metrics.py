@@ -0,0 +1,85 @@
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+
+import datetime
+
+from buildstream._scheduler.metrics import MetricsExporter
+from buildstream._scheduler.resources import Resources, ResourceType
+from buildstream._state import State
+
+
+def _samples(text):
+    lines = text.splitlines()
+    assert lines[-1] == "# EOF"
+    return {line.rsplit(" ", 1)[0]: float(line.rsplit(" ", 1)[1]) for line in lines if not line.startswith("#")}
+
+
+def test_metrics(tmp_path):
+    state = State(datetime.datetime.now())
+    build = state.add_task_group("Build")
+    state.add_task_group("Pull")
+    build.add_processed_task()
+    build.add_skipped_task()
+    build.add_skipped_task()
+    build.add_failed_task("base.bst")
+    state.add_task("Build:1", "Build", "target.bst")
+
+    resources = Resources(4, 2, 1)
+    assert resources.reserve([ResourceType.PROCESS, ResourceType.CACHE])
+
+    filename = tmp_path.joinpath("metrics.prom")
+    MetricsExporter(str(filename), state, resources).write()
+    samples = _samples(filename.read_text())
+
+    assert samples['bst_queue_tasks_total{queue="Build",status="processed"}'] == 1
+    assert samples['bst_queue_tasks_total{queue="Build",status="skipped"}'] == 2
+    assert samples['bst_queue_tasks_total{queue="Build",status="failed"}'] == 1
+    assert samples['bst_queue_tasks_total{queue="Pull",status="processed"}'] == 0
+    assert samples['bst_queue_active_tasks{queue="Build"}'] == 1
+    assert samples['bst_queue_active_tasks{queue="Pull"}'] == 0
+    assert samples['bst_queue_throughput{queue="Build"}'] > 0
+    assert samples["bst_artifact_cache_hit_ratio"] == 0.5
+
+    assert samples['bst_resource_tokens_used{resource="process"}'] == 1
+    assert samples['bst_resource_tokens_used{resource="cache"}'] == 1
+    assert samples['bst_resource_tokens_limit{resource="process"}'] == 4
+    assert samples['bst_resource_tokens_limit{resource="upload"}'] == 1
+
+    # The cache resource is unlimited
+    assert 'bst_resource_tokens_limit{resource="cache"}' not in samples
+
+
+class _Messenger:
+    def __init__(self):
+        self.warnings = []
+
+    def warn(self, brief, *, detail=None):
+        self.warnings.append(brief)
+
+
+def test_write_failure(tmp_path):
+    state = State(datetime.datetime.now())
+    messenger = _Messenger()
+
+    # The directory of the file does not exist
+    filename = tmp_path.joinpath("missing", "metrics.prom")
+    exporter = MetricsExporter(str(filename), state, Resources(4, 2, 1), messenger=messenger)
+
+    # Failures are only reported once
+    exporter.write()
+    exporter.write()
+    assert messenger.warnings == ["Failed to write metrics to {}".format(filename)]
+
+    filename.parent.mkdir()
+    exporter.write()
+    assert filename.exists()
@@ -0,0 +1,152 @@
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+
+import os
+import socket
+import urllib.error
+
+from buildstream.source import AliasSubstitution, SourceError
+from buildstream._mirrorhealth import MirrorHealth, is_connection_failure, record_transfer
+
+FIRST = AliasSubstitution("alias", "https://first.example.com/")
+SECOND = AliasSubstitution("alias", "https://second.example.com/")
+THIRD = AliasSubstitution("alias", "https://third.example.com/")
+DEFAULT = AliasSubstitution("alias", "https://default.example.com/", _default_mirror=True)
+LOCAL = AliasSubstitution("alias", "file:///srv/mirror/")
+
+MIB = 1024 * 1024
+
+
+# Report a transfer from the host of a substitution
+def _transfer(health, substitution, latency, size, duration):
+    with health.measure(substitution):
+        record_transfer(latency, size, duration)
+
+
+def test_configured_order(tmp_path):
+    health = MirrorHealth(os.path.join(str(tmp_path), "mirror-health"))
+
+    # Without any failures the configured order is kept
+    assert health.order([SECOND, FIRST, THIRD]) == [SECOND, FIRST, THIRD]
+
+    health.record_success(SECOND)
+    health.record_success(FIRST)
+    assert health.order([SECOND, FIRST, THIRD]) == [SECOND, FIRST, THIRD]
+
+
+def test_fastest_first(tmp_path):
+    health = MirrorHealth(os.path.join(str(tmp_path), "mirror-health"))
+
+    # Slow throughput
+    _transfer(health, FIRST, 0.1, 8 * MIB, 8.1)
+    # High latency
+    _transfer(health, SECOND, 2.0, 8 * MIB, 3.0)
+    # Fast
+    _transfer(health, THIRD, 0.1, 8 * MIB, 1.1)
+    assert health.order([FIRST, SECOND, THIRD]) == [THIRD, SECOND, FIRST]
+
+    # Tracking keeps the configured order
+    assert health.order([FIRST, SECOND, THIRD], by_speed=False) == [FIRST, SECOND, THIRD]
+
+
+def test_unmeasured_hosts(tmp_path):
+    health = MirrorHealth(os.path.join(str(tmp_path), "mirror-health"))
+
+    # Transfers outside of a measurement are not recorded
+    record_transfer(0.1, 8 * MIB, 1.1)
+    assert health.order([SECOND, FIRST]) == [SECOND, FIRST]
+
+    # Small transfers only measure the latency
+    _transfer(health, SECOND, 5.0, 1024, 5.0)
+    _transfer(health, FIRST, 0.1, 1024, 0.1)
+    assert health.order([SECOND, FIRST]) == [SECOND, FIRST]
+
+    # Unmeasured hosts keep their position relative to the fastest host
+    _transfer(health, SECOND, 0.1, 8 * MIB, 1.1)
+    _transfer(health, THIRD, 0.1, 8 * MIB, 8.1)
+    assert health.order([THIRD, FIRST, SECOND]) == [FIRST, SECOND, THIRD]
+
+
+def test_backoff(tmp_path):
+    health = MirrorHealth(os.path.join(str(tmp_path), "mirror-health"))
+
+    health.record_failure(FIRST)
+
+    # Failing hosts are tried last
+    assert health.order([FIRST, SECOND, THIRD]) == [SECOND, THIRD, FIRST]
+
+    # A success ends the back-off
+    health.record_success(FIRST)
+    assert health.order([FIRST, SECOND, THIRD]) == [FIRST, SECOND, THIRD]
+
+
+def test_default_mirror_stays_first(tmp_path):
+    health = MirrorHealth(os.path.join(str(tmp_path), "mirror-health"))
+
+    health.record_failure(DEFAULT)
+    assert health.order([DEFAULT, FIRST, SECOND]) == [DEFAULT, FIRST, SECOND]
+
+    health.record_success(DEFAULT)
+    _transfer(health, DEFAULT, 1.0, 8 * MIB, 100.0)
+    _transfer(health, FIRST, 0.1, 8 * MIB, 8.1)
+    _transfer(health, SECOND, 0.1, 8 * MIB, 1.1)
+    assert health.order([DEFAULT, FIRST, SECOND]) == [DEFAULT, SECOND, FIRST]
+
+
+def test_local_mirrors_not_recorded(tmp_path):
+    health = MirrorHealth(os.path.join(str(tmp_path), "mirror-health"))
+
+    health.record_failure(LOCAL)
+    assert health.order([LOCAL, FIRST]) == [LOCAL, FIRST]
+
+
+def test_persistence(tmp_path):
+    path = os.path.join(str(tmp_path), "mirror-health")
+
+    health = MirrorHealth(path)
+    health.record_success(SECOND)
+    health.record_failure(FIRST)
+    _transfer(health, THIRD, 0.1, 8 * MIB, 1.1)
+    _transfer(health, SECOND, 0.1, 8 * MIB, 8.1)
+    health.save()
+
+    health = MirrorHealth(path)
+    assert health.order([FIRST, SECOND, THIRD]) == [THIRD, SECOND, FIRST]
+
+    # Corrupted files are ignored
+    with open(path, "w", encoding="utf-8") as f:
+        f.write("{")
+    health = MirrorHealth(path)
+    assert health.order([FIRST, SECOND, THIRD]) == [FIRST, SECOND, THIRD]
+
+
+def test_connection_failures():
+    assert is_connection_failure(ConnectionRefusedError())
+    assert is_connection_failure(socket.timeout())
+    assert is_connection_failure(urllib.error.URLError(socket.gaierror()))
+
+    # Errors reported by the server, or about the content, are not
+    assert not is_connection_failure(urllib.error.HTTPError("https://first.example.com/", 404, "Not Found", {}, None))
+    assert not is_connection_failure(urllib.error.URLError("unknown url type"))
+    assert not is_connection_failure(ValueError("Partial file"))
+    assert not is_connection_failure(None)
+
+    # The cause of source errors is considered
+    try:
+        try:
+            raise ConnectionResetError()
+        except ConnectionResetError as e:
+            raise SourceError("Error mirroring", temporary=True) from e
+    except SourceError as e:
+        assert is_connection_failure(e)
+    assert not is_connection_failure(SourceError("Error mirroring", temporary=True))
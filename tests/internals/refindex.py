@@ -0,0 +1,155 @@
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+
+import os
+import time
+
+import pytest
+
+from buildstream import _refindex
+from buildstream._refindex import RefIndex
+from buildstream._testing._utils.site import have_subsecond_mtime
+
+
+def _write_ref(refdir, ref):
+    path = os.path.join(refdir, ref)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(ref)
+
+
+def _list(index, glob_expr=None):
+    return sorted(ref for _, ref in index.list_refs_mtimes(glob_expr=glob_expr))
+
+
+def test_build_from_directory(tmp_path):
+    refdir = str(tmp_path.joinpath("refs"))
+    _write_ref(refdir, "project/base/1234")
+    _write_ref(refdir, "project/target/5678")
+
+    index = RefIndex(refdir)
+    assert _list(index) == ["project/base/1234", "project/target/5678"]
+    assert os.path.exists(refdir + ".index")
+
+    # Refs are listed from the index once it was built
+    with open(refdir + ".index", "a", encoding="utf-8") as f:
+        f.write("+ 0 project/other/1234\n")
+    assert _list(index) == ["project/base/1234", "project/other/1234", "project/target/5678"]
+
+
+def test_add_remove(tmp_path):
+    refdir = str(tmp_path.joinpath("refs"))
+    _write_ref(refdir, "project/base/1234")
+    index = RefIndex(refdir)
+
+    _write_ref(refdir, "project/target/5678")
+    index.add("project/target/5678")
+    os.unlink(os.path.join(refdir, "project/base/1234"))
+    index.remove("project/base/1234")
+
+    assert _list(index) == ["project/target/5678"]
+    mtimes = dict((ref, mtime) for mtime, ref in index.list_refs_mtimes())
+    assert mtimes["project/target/5678"] == os.path.getmtime(os.path.join(refdir, "project/target/5678"))
+
+    # Another index of the same directory sees the same refs
+    assert _list(RefIndex(refdir)) == ["project/target/5678"]
+
+
+def test_glob(tmp_path):
+    refdir = str(tmp_path.joinpath("refs"))
+    for ref in ("project/base/1234", "project/base/5678", "project/target/1234", "other/base/1234"):
+        _write_ref(refdir, ref)
+    index = RefIndex(refdir)
+
+    assert _list(index, "project/base/*") == ["project/base/1234", "project/base/5678"]
+    assert _list(index, "*/base/1234") == ["other/base/1234", "project/base/1234"]
+    assert _list(index, "project/**") == ["project/base/1234", "project/base/5678", "project/target/1234"]
+    assert _list(index, "project/*") == []
+
+
+def test_compaction(tmp_path, monkeypatch):
+    monkeypatch.setattr(_refindex, "_COMPACT_THRESHOLD", 10)
+    refdir = str(tmp_path.joinpath("refs"))
+    _write_ref(refdir, "project/base/1234")
+    index = RefIndex(refdir)
+
+    for _ in range(20):
+        index.add("project/base/1234")
+
+    assert _list(index) == ["project/base/1234"]
+    # The ref and its three directories remain
+    with open(refdir + ".index", encoding="utf-8") as f:
+        assert len(f.readlines()) == 4
+
+
+def test_lru_order_after_use(tmp_path):
+    refdir = str(tmp_path.joinpath("refs"))
+    index = RefIndex(refdir)
+    for ref in ("project/base/1234", "project/target/5678"):
+        _write_ref(refdir, ref)
+        os.utime(os.path.join(refdir, ref), (time.time() - 60, time.time() - 60))
+        index.add(ref)
+    os.utime(os.path.join(refdir, "project/target/5678"))
+    index.add("project/target/5678")
+    assert [ref for _, ref in sorted(index.list_refs_mtimes())] == ["project/base/1234", "project/target/5678"]
+
+    # Loading an artifact updates its mtime, which is only recorded in
+    # the journal once the index is flushed
+    os.utime(os.path.join(refdir, "project/base/1234"), (time.time() + 60, time.time() + 60))
+    index.touch("project/base/1234")
+    other_index = RefIndex(refdir)
+    assert [ref for _, ref in sorted(other_index.list_refs_mtimes())] == ["project/base/1234", "project/target/5678"]
+
+    index.flush()
+    assert [ref for _, ref in sorted(other_index.list_refs_mtimes())] == ["project/target/5678", "project/base/1234"]
+
+    # Listing refs flushes the index
+    os.utime(os.path.join(refdir, "project/target/5678"), (time.time() + 120, time.time() + 120))
+    index.touch("project/target/5678")
+    assert [ref for _, ref in sorted(index.list_refs_mtimes())] == ["project/base/1234", "project/target/5678"]
+
+
+@pytest.mark.parametrize("change", ["write", "remove"])
+def test_stale_index(tmp_path, change):
+    if not have_subsecond_mtime(str(tmp_path)):
+        pytest.skip("Filesystem does not support subsecond mtime precision: {}".format(tmp_path))
+
+    refdir = str(tmp_path.joinpath("refs"))
+    _write_ref(refdir, "project/base/1234")
+    index = RefIndex(refdir)
+    assert _list(index) == ["project/base/1234"]
+
+    # Refs written or removed without updating the index are noticed
+    # through the mtimes of their directories
+    time.sleep(0.01)
+    if change == "write":
+        _write_ref(refdir, "project/target/5678")
+        assert _list(index) == ["project/base/1234", "project/target/5678"]
+    else:
+        os.unlink(os.path.join(refdir, "project/base/1234"))
+        assert _list(index) == []
+
+
+def test_unwritable_index(tmp_path, monkeypatch):
+    refdir = str(tmp_path.joinpath("refs"))
+    _write_ref(refdir, "project/base/1234")
+    index = RefIndex(refdir)
+
+    def read_only_lock(*_):
+        raise PermissionError()
+
+    # Refs are listed from the directory tree when the index cannot be written
+    monkeypatch.setattr(RefIndex, "_lock", read_only_lock)
+    index.add("project/base/1234")
+    assert _list(index) == ["project/base/1234"]
+    assert not os.path.exists(refdir + ".index")
@@ -0,0 +1,59 @@
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+
+import pytest
+
+from buildstream import _yaml
+from buildstream._refwriter import RefWriter
+
+
+def test_changes_are_coalesced(tmp_path):
+    filename = str(tmp_path.joinpath("project.refs"))
+    writer = RefWriter(3600)
+
+    # The first change is written immediately
+    writer.load(filename)["first"] = "1"
+    writer.save([filename])
+    assert _yaml.roundtrip_load(filename) == {"first": "1"}
+
+    # Further changes wait for the next checkpoint, but are visible to later loads
+    writer.load(filename)["second"] = "2"
+    writer.save([filename])
+    assert writer.load(filename) == {"first": "1", "second": "2"}
+    assert _yaml.roundtrip_load(filename) == {"first": "1"}
+
+    writer.flush()
+    assert _yaml.roundtrip_load(filename) == {"first": "1", "second": "2"}
+
+
+def test_zero_interval_writes_immediately(tmp_path):
+    filename = str(tmp_path.joinpath("element.bst"))
+    writer = RefWriter(0)
+
+    for i in range(3):
+        writer.load(filename)["ref"] = str(i)
+        writer.save([filename])
+        assert _yaml.roundtrip_load(filename) == {"ref": str(i)}
+
+
+def test_write_error(tmp_path):
+    filename = str(tmp_path.joinpath("missing", "project.refs"))
+    writer = RefWriter(0)
+
+    writer.load(filename)["ref"] = "1"
+    with pytest.raises(OSError):
+        writer.save([filename])
+
+    # The file remains to be written
+    with pytest.raises(OSError):
+        writer.flush()
@@ -55,6 +55,27 @@ def test_import(tmpdir, datafiles, backend):
         assert "bin/hello" in c.list_relative_paths()
 
 
+@pytest.mark.datafiles(DATA_DIR)
+def test_import_casdir_root_properties(tmpdir, datafiles):
+    original = os.path.join(str(datafiles), "original")
+
+    with casd_cache(os.path.join(str(tmpdir), "cas")) as cas_cache:
+        sandbox_root = CasBasedDirectory(cas_cache)
+        sandbox_root._import_files_internal(original, properties=["mtime"])
+        expected = sandbox_root._get_digest()
+
+        sandbox_root._set_subtree_read_only(True)
+        assert sandbox_root._get_digest() != expected
+
+        # Importing into a new directory drops the properties of the root only
+        capture = CasBasedDirectory(cas_cache)
+        capture._import_files_internal(sandbox_root, collect_result=False)
+        assert capture._get_digest() == expected
+
+        # Capturing the directory by digest gives the same digest
+        assert sandbox_root._get_digest_without_properties() == expected
+
+
 @pytest.mark.parametrize(
     "directories",
     [
@@ -0,0 +1,75 @@
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+#
+import io
+import shutil
+import tarfile
+
+import pytest
+
+from buildstream import utils
+from buildstream._stream import _open_tarball, _PARALLEL_COMPRESSORS
+
+# Single threaded tools accepting the same arguments as the parallel
+# compressors, which are not necessarily installed on the host
+STAND_INS = {"pigz": "gzip", "xz": "xz", "pbzip2": "bzip2"}
+
+CONTENTS = {"file": b"contents\n" * 1000, "directory/other": b"other\n"}
+
+
+def write_tarball(path, compression):
+    with open(path, "wb") as f, _open_tarball(f, compression) as tf:
+        for name, data in CONTENTS.items():
+            info = tarfile.TarInfo(name)
+            info.size = len(data)
+            tf.addfile(info, io.BytesIO(data))
+
+
+def read_tarball(path, compression):
+    with tarfile.open(path, mode="r:" + compression) as tf:
+        return {member.name: tf.extractfile(member).read() for member in tf.getmembers() if member.isfile()}
+
+
+@pytest.mark.parametrize("compression", ["gz", "xz", "bz2"])
+def test_compressors(tmp_path, monkeypatch, compression):
+    compressor = _PARALLEL_COMPRESSORS[compression][0]
+    real_which = shutil.which
+    if not real_which(STAND_INS[compressor]):
+        pytest.skip("{} is not available".format(STAND_INS[compressor]))
+
+    # Compress through the stand in of the parallel compressor
+    searched = []
+
+    def which_stand_in(name, **kwargs):
+        searched.append(name)
+        return real_which(STAND_INS.get(name, name), **kwargs)
+
+    monkeypatch.setattr(utils.shutil, "which", which_stand_in)
+    parallel = str(tmp_path.joinpath("parallel.tar"))
+    write_tarball(parallel, compression)
+    assert searched == [compressor]
+
+    # Compress in process, as when no parallel compressor is found
+    monkeypatch.setattr(utils.shutil, "which", lambda name, **kwargs: None)
+    in_process = str(tmp_path.joinpath("in-process.tar"))
+    write_tarball(in_process, compression)
+
+    # Both read back the same
+    assert read_tarball(parallel, compression) == CONTENTS
+    assert read_tarball(in_process, compression) == CONTENTS
+
+
+def test_uncompressed(tmp_path):
+    path = str(tmp_path.joinpath("uncompressed.tar"))
+    write_tarball(path, None)
+    assert read_tarball(path, "") == CONTENTS
@@ -0,0 +1,85 @@
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+
+import json
+import threading
+
+from buildstream._messenger import Messenger
+from buildstream._tracing import _Tracer, TRACER, Categories
+
+
+def test_disabled():
+    tracer = _Tracer()
+    assert not tracer.enabled
+    with tracer.span("span", Categories.ACTIVITY):
+        pass
+    tracer.complete_async("wait", Categories.QUEUE, 0, 1)
+    tracer.stop()
+
+
+def test_trace_events(tmp_path):
+    filename = str(tmp_path.joinpath("trace.json"))
+    tracer = _Tracer()
+    tracer.start(filename)
+
+    with tracer.span("outer", Categories.JOB, element="element.bst"):
+        with tracer.span("inner", Categories.ACTIVITY):
+            pass
+
+    thread = threading.Thread(target=lambda: tracer.complete("other", Categories.CASD, 1, 2), name="other-thread")
+    thread.start()
+    thread.join()
+
+    tracer.complete_async("wait", Categories.QUEUE, 10, 20, queue="Build")
+    tracer.stop()
+    assert not tracer.enabled
+
+    with open(filename, encoding="utf-8") as f:
+        events = json.load(f)["traceEvents"]
+
+    spans = {event["name"]: event for event in events if event["ph"] == "X"}
+    outer, inner = spans["outer"], spans["inner"]
+    assert outer["args"] == {"element": "element.bst"}
+    assert outer["tid"] == inner["tid"]
+    assert outer["ts"] <= inner["ts"]
+    assert inner["ts"] + inner["dur"] <= outer["ts"] + outer["dur"]
+    assert spans["other"]["tid"] != outer["tid"]
+
+    thread_names = {event["args"]["name"] for event in events if event["ph"] == "M"}
+    assert "other-thread" in thread_names
+
+    begin, end = [event for event in events if event["name"] == "wait"]
+    assert (begin["ph"], begin["ts"], end["ph"], end["ts"]) == ("b", 10, "e", 20)
+    assert begin["id"] == end["id"]
+    assert begin["args"] == {"queue": "Build"}
+
+
+def test_timed_activity(tmp_path):
+    filename = str(tmp_path.joinpath("trace.json"))
+    messenger = Messenger()
+    messenger.set_message_handler(lambda message, is_silenced: None)
+
+    TRACER.start(filename)
+    try:
+        with messenger.timed_activity("Activity", element_name="element.bst"):
+            pass
+    finally:
+        TRACER.stop()
+
+    with open(filename, encoding="utf-8") as f:
+        events = json.load(f)["traceEvents"]
+
+    (event,) = [event for event in events if event["ph"] == "X"]
+    assert event["name"] == "Activity"
+    assert event["cat"] == Categories.ACTIVITY
+    assert event["args"] == {"element": "element.bst"}
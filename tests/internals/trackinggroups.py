@@ -0,0 +1,100 @@
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+
+import threading
+
+import pytest
+
+from buildstream._trackinggroups import TrackingGroups, SharedQueryError
+
+
+def test_query_once():
+    groups = TrackingGroups()
+    started = threading.Event()
+    release = threading.Event()
+    queries = []
+
+    def query():
+        queries.append(None)
+        started.set()
+        release.wait(timeout=10)
+        return {"main": "abc", "next": "def"}
+
+    results = []
+    thread = threading.Thread(target=lambda: results.append(groups.query("repo", query)))
+    thread.start()
+    started.wait(timeout=10)
+
+    # Sources in the same group wait for the running query
+    waiter = threading.Thread(target=lambda: results.append(groups.query("repo", query)))
+    waiter.start()
+    release.set()
+    thread.join()
+    waiter.join()
+
+    # And later sources reuse its result
+    results.append(groups.query("repo", query))
+
+    assert len(queries) == 1
+    assert results == [{"main": "abc", "next": "def"}] * 3
+
+    # Other groups run their own query
+    assert groups.query("other-repo", lambda: "other") == "other"
+
+
+def test_failed_query():
+    groups = TrackingGroups()
+
+    def fail():
+        raise RuntimeError("Failed to query repository")
+
+    with pytest.raises(RuntimeError):
+        groups.query("repo", fail)
+
+    # Failures are not recorded
+    assert groups.query("repo", lambda: "refs") == "refs"
+
+
+def test_failed_shared_query():
+    groups = TrackingGroups()
+    started = threading.Event()
+    release = threading.Event()
+
+    def fail():
+        started.set()
+        release.wait(timeout=10)
+        raise RuntimeError("Failed to query repository")
+
+    errors = {}
+
+    def run_query(owner):
+        try:
+            groups.query("repo", fail, owner=owner)
+        except Exception as e:  # pylint: disable=broad-except
+            errors[owner] = e
+
+    thread = threading.Thread(target=run_query, args=("first-source",))
+    thread.start()
+    started.wait(timeout=10)
+    waiter = threading.Thread(target=run_query, args=("second-source",))
+    waiter.start()
+    release.set()
+    thread.join()
+    waiter.join()
+
+    # The source running the query gets its own error, the waiting
+    # source learns which source ran the query which failed
+    assert isinstance(errors["first-source"], RuntimeError)
+    assert isinstance(errors["second-source"], SharedQueryError)
+    assert errors["second-source"].owner == "first-source"
+    assert errors["second-source"].error is errors["first-source"]
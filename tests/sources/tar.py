@@ -17,7 +17,9 @@
 
 import os
 from shutil import copyfile
+import stat
 import subprocess
+import sys
 import tarfile
 import tempfile
 import urllib.parse
@@ -58,6 +60,37 @@ def _assemble_tar_lz(workingdir, srcdir, dstfile):
     os.chdir(old_dir)
 
 
+def _assemble_tar_compressed(workingdir, srcdir, dstfile, compression):
+    old_dir = os.getcwd()
+    os.chdir(workingdir)
+    with tarfile.open(dstfile, "w:" + compression) as tar:
+        tar.add(srcdir)
+    os.chdir(old_dir)
+
+
+# Create a host tool running the given shell command
+def _create_host_tool(directory, name, command):
+    path = os.path.join(directory, name)
+    with open(path, "w", encoding="utf-8") as f:
+        f.write("#!/bin/sh\n{}\n".format(command))
+    os.chmod(path, 0o755)
+    return path
+
+
+# Replace the given host tools, a tool of None is not found on the host
+def _patch_host_tools(monkeypatch, tools):
+    get_host_tool = utils.get_host_tool
+
+    def patched_get_host_tool(name):
+        if name not in tools:
+            return get_host_tool(name)
+        if tools[name] is None:
+            raise utils.ProgramNotFoundError("Did not find '{}' in PATH".format(name))
+        return tools[name]
+
+    monkeypatch.setattr(utils, "get_host_tool", patched_get_host_tool)
+
+
 # Test that without ref, consistency is set appropriately.
 @pytest.mark.datafiles(os.path.join(DATA_DIR, "no-ref"))
 def test_no_ref(cli, tmpdir, datafiles):
@@ -561,3 +594,139 @@ def test_malicious_out_of_basedir_hardlinks(cli, tmpdir, datafiles):
     result.assert_success()
     result = cli.run(project=project, args=["source", "fetch", "malicious_target.bst"])
     result.assert_main_error(ErrorDomain.STREAM, None)
+
+
+# Test that a tarball which was already downloaded is not downloaded again
+# for a source with another url
+@pytest.mark.datafiles(os.path.join(DATA_DIR, "fetch"))
+def test_fetch_shared_download(cli, tmpdir, datafiles):
+    project = str(datafiles)
+    generate_project(project, config={"aliases": {"tmpdir": "file:///" + str(tmpdir)}})
+
+    # Create a local tar
+    src_tar = os.path.join(str(tmpdir), "a.tar.gz")
+    _assemble_tar(os.path.join(str(datafiles), "content"), "a", src_tar)
+
+    # Track and fetch it
+    result = cli.run(project=project, args=["source", "track", "target.bst"])
+    result.assert_success()
+    result = cli.run(project=project, args=["source", "fetch", "target.bst"])
+    result.assert_success()
+
+    # Fetch the same tarball from a url which does not exist
+    generate_element(
+        project,
+        "other.bst",
+        {
+            "kind": "import",
+            "sources": [{"kind": "tar", "url": "tmpdir:/missing.tar.gz", "ref": utils.sha256sum(src_tar)}],
+        },
+    )
+    result = cli.run(project=project, args=["source", "fetch", "other.bst"])
+    result.assert_success()
+
+    # Check that the staged content is the same
+    checkoutdir = os.path.join(str(tmpdir), "checkout")
+    result = cli.run(project=project, args=["build", "other.bst"])
+    result.assert_success()
+    result = cli.run(project=project, args=["artifact", "checkout", "other.bst", "--directory", checkoutdir])
+    result.assert_success()
+
+    original_dir = os.path.join(str(datafiles), "content", "a")
+    assert list_dir_contents(original_dir) == list_dir_contents(checkoutdir)
+
+
+# Test that a downloaded tarball is stored only once, the mirror file
+# being the object in CAS
+@pytest.mark.datafiles(os.path.join(DATA_DIR, "fetch"))
+def test_fetch_single_copy(cli, tmpdir, datafiles):
+    project = str(datafiles)
+    generate_project(project, config={"aliases": {"tmpdir": "file:///" + str(tmpdir)}})
+
+    # Create a local tar
+    src_tar = os.path.join(str(tmpdir), "a.tar.gz")
+    _assemble_tar(os.path.join(str(datafiles), "content"), "a", src_tar)
+    sha256 = utils.sha256sum(src_tar)
+
+    result = cli.run(project=project, args=["source", "track", "target.bst"])
+    result.assert_success()
+    result = cli.run(project=project, args=["source", "fetch", "target.bst"])
+    result.assert_success()
+
+    mirror_files = [
+        os.path.join(root, filename)
+        for root, _, filenames in os.walk(os.path.join(cli.directory, "sources"))
+        for filename in filenames
+        if filename == sha256
+    ]
+    assert len(mirror_files) == 1
+
+    cas_object = os.path.join(cli.directory, "cas", "objects", sha256[:2], sha256[2:])
+    assert os.path.samefile(mirror_files[0], cas_object)
+
+    # The shared file is read-only, such that it cannot be modified in place
+    assert not os.stat(mirror_files[0]).st_mode & (stat.S_IWUSR | stat.S_IWGRP | stat.S_IWOTH)
+
+
+# Test that compressed tarballs are decompressed with the multithreaded
+# host tool when it is available, and with the python module otherwise
+@pytest.mark.datafiles(os.path.join(DATA_DIR, "fetch"))
+@pytest.mark.parametrize(
+    "compression, host_tool, module",
+    [("gz", "pigz", "gzip"), ("bz2", "pbzip2", "bz2"), ("xz", "xz", "lzma")],
+)
+@pytest.mark.parametrize("host_tool_state", ["missing", "available", "failing"])
+def test_stage_host_decompressor(cli, tmpdir, datafiles, monkeypatch, compression, host_tool, module, host_tool_state):
+    project = str(datafiles)
+    generate_project(project, config={"aliases": {"tmpdir": "file:///" + str(tmpdir)}})
+    checkoutdir = os.path.join(str(tmpdir), "checkout")
+    marker = os.path.join(str(tmpdir), "host-tool-used")
+
+    # The compression is detected from the content, not from the file name
+    src_tar = os.path.join(str(tmpdir), "a.tar.gz")
+    _assemble_tar_compressed(os.path.join(str(datafiles), "content"), "a", src_tar, compression)
+
+    if host_tool_state == "missing":
+        tool = None
+    elif host_tool_state == "available":
+        script = "import {0}, shutil, sys; shutil.copyfileobj({0}.open(sys.stdin.buffer), sys.stdout.buffer)"
+        tool = _create_host_tool(
+            str(tmpdir), host_tool, 'touch {}\nexec {} -c "{}"'.format(marker, sys.executable, script.format(module))
+        )
+    else:
+        tool = _create_host_tool(str(tmpdir), host_tool, "touch {}\nexit 1".format(marker))
+    _patch_host_tools(monkeypatch, {host_tool: tool})
+
+    result = cli.run(project=project, args=["source", "track", "target.bst"])
+    result.assert_success()
+    result = cli.run(project=project, args=["build", "target.bst"])
+    result.assert_success()
+    result = cli.run(project=project, args=["artifact", "checkout", "target.bst", "--directory", checkoutdir])
+    result.assert_success()
+
+    # A failing host tool falls back to the python module
+    assert os.path.exists(marker) == (host_tool_state != "missing")
+
+    original_dir = os.path.join(str(datafiles), "content", "a")
+    assert list_dir_contents(original_dir) == list_dir_contents(checkoutdir)
+
+
+# Test that failing to decompress an lzip tarball is reported as a source error
+@pytest.mark.datafiles(os.path.join(DATA_DIR, "fetch"))
+def test_stage_corrupt_lzip(cli, tmpdir, datafiles, monkeypatch):
+    project = str(datafiles)
+    generate_project(project, config={"aliases": {"tmpdir": "file:///" + str(tmpdir)}})
+
+    with open(os.path.join(str(tmpdir), "a.tar.lz"), "wb") as f:
+        f.write(b"LZIP corrupt content")
+
+    # Use a host tool behaving like lzip does on a corrupt stream, lzip
+    # may not be installed
+    lzip = _create_host_tool(str(tmpdir), "lzip", "echo 'lzip: Data error' >&2\nexit 2")
+    _patch_host_tools(monkeypatch, {"lzip": lzip})
+
+    result = cli.run(project=project, args=["source", "track", "target-lz.bst"])
+    result.assert_success()
+    result = cli.run(project=project, args=["build", "target-lz.bst"])
+    result.assert_main_error(ErrorDomain.STREAM, None)
+    result.assert_task_error(ErrorDomain.SOURCE, None)
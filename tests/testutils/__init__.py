@@ -23,6 +23,7 @@ from .artifactshare import create_artifact_share, create_split_share, assert_sha
 from .casd import casd_cache
 from .context import dummy_context
 from .element_generators import create_element_size
+from .synthetic_project import generate_synthetic_project
 from .junction import generate_junction
 from .runner_integration import wait_for_cache_granularity
 from .python_repo import setup_pypi_repo
@@ -0,0 +1,141 @@
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+#
+import json
+import platform
+import statistics
+import sys
+import time
+
+import pytest
+
+
+# Benchmark()
+#
+# Measures the time a function takes over a number of rounds, and records
+# the result for the session's report.
+#
+# When a baseline is given, the result is compared with the result of the
+# benchmark of the same name in the baseline, and the benchmark fails if
+# its fastest round is slower than the fastest round of the baseline by
+# more than the given threshold.
+#
+# Args:
+#    name (str): The name of the benchmark
+#    results (list): The list to record the result in
+#    baseline (dict): The results of the baseline, by name, or None
+#    threshold (float): The allowed slowdown relative to the baseline, in percent
+#
+class Benchmark:
+    def __init__(self, name, results, baseline=None, threshold=0.0):
+        self.name = name
+        self.extra_info = {}  # Additional information to record, such as the parameters
+        self._results = results
+        self._baseline = baseline
+        self._threshold = threshold
+
+    # __call__()
+    #
+    # Measure a function
+    #
+    # Args:
+    #    function (callable): The function to measure
+    #    rounds (int): The number of times to run the function
+    #    setup (callable): A function to run before every round, which is not measured
+    #
+    # Returns:
+    #    The return value of the last call to the function
+    #
+    def __call__(self, function, *, rounds=5, setup=None):
+        timings = []
+        result = None
+        for _ in range(rounds):
+            if setup:
+                setup()
+            start = time.perf_counter()
+            result = function()
+            timings.append(time.perf_counter() - start)
+
+        stats = {
+            "name": self.name,
+            "rounds": rounds,
+            "min": min(timings),
+            "max": max(timings),
+            "mean": statistics.mean(timings),
+            "median": statistics.median(timings),
+            "stddev": statistics.stdev(timings) if rounds > 1 else 0.0,
+            "extra_info": self.extra_info,
+        }
+        self._results.append(stats)
+
+        if self._baseline and self.name in self._baseline:
+            self._compare(stats, self._baseline[self.name])
+
+        return result
+
+    # Compare the fastest rounds, which are the least affected by
+    # whatever else runs on the machine
+    def _compare(self, stats, baseline):
+        change = (stats["min"] - baseline["min"]) / baseline["min"] * 100
+        stats["baseline"] = {"min": baseline["min"], "change": change}
+
+        if change > self._threshold:
+            pytest.fail(
+                "{} regressed by {:.1f}% compared to the baseline ({:.6f}s instead of {:.6f}s, threshold {}%)".format(
+                    self.name, change, stats["min"], baseline["min"], self._threshold
+                ),
+                pytrace=False,
+            )
+
+
+# The results of all benchmarks of the session, written to the file given
+# with --benchmark-json at the end of the session
+#
+@pytest.fixture(scope="session")
+def benchmark_results(request):
+    results = []
+    yield results
+
+    filename = request.config.getvalue("benchmark_json")
+    if filename and results:
+        report = {
+            "machine_info": {
+                "python": sys.version,
+                "implementation": platform.python_implementation(),
+                "system": platform.system(),
+                "machine": platform.machine(),
+            },
+            "benchmarks": results,
+        }
+        with open(filename, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+
+
+# The results of the baseline given with --benchmark-baseline, as
+# written with --benchmark-json by an earlier session, by name
+#
+@pytest.fixture(scope="session")
+def benchmark_baseline(request):
+    filename = request.config.getvalue("benchmark_baseline")
+    if not filename:
+        return None
+
+    with open(filename, encoding="utf-8") as f:
+        report = json.load(f)
+    return {result["name"]: result for result in report["benchmarks"]}
+
+
+@pytest.fixture
+def benchmark(request, benchmark_results, benchmark_baseline):
+    threshold = request.config.getvalue("benchmark_threshold")
+    return Benchmark(request.node.nodeid, benchmark_results, benchmark_baseline, threshold)
@@ -0,0 +1,148 @@
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+#
+import os
+
+from buildstream import _yaml
+
+
+# generate_synthetic_project()
+#
+# Generates a project with a synthetic graph of elements, for measuring
+# the overhead of loading and scheduling independently of what elements
+# actually do.
+#
+# The elements are arranged in layers, each element depending on
+# `fan_in` elements of the previous layer, such that the number of
+# reverse dependencies of each element grows with the ratio of the width
+# of successive layers. Elements of the first layer are import elements
+# importing a single small file, the other elements are stack elements,
+# and a single "target.bst" stack element depends on the last layer.
+#
+# Building the project thus runs no commands in a sandbox, and its cost
+# is dominated by BuildStream itself.
+#
+# Args:
+#    project_dir (str): The directory to generate the project in
+#    elements (int): The number of elements in the layers
+#    layers (int): The number of layers
+#    fan_in (int): The number of dependencies of each element
+#    include_depth (int): The depth of the chain of files each element includes
+#    options (int): The number of project options elements have conditionals on
+#    junction_depth (int): The depth of the chain of junctions to a subproject
+#                          which the elements of the first layer depend on
+#
+# Returns:
+#    (str): The name of the target element
+#
+def generate_synthetic_project(
+    project_dir, *, elements=100, layers=10, fan_in=3, include_depth=0, options=0, junction_depth=0
+):
+    project_conf = {"name": "synthetic", "min-version": "2.0", "element-path": "elements"}
+
+    if options:
+        project_conf["options"] = {
+            "option{}".format(i): {"type": "bool", "description": "Option {}".format(i), "default": False}
+            for i in range(options)
+        }
+
+    _yaml.roundtrip_dump(project_conf, os.path.join(project_dir, "project.conf"))
+    os.makedirs(os.path.join(project_dir, "elements"), exist_ok=True)
+
+    # A chain of include files, each one including the next
+    for depth in range(include_depth):
+        include = {"variables": {"include-{}".format(depth): "level {}".format(depth)}}
+        if depth + 1 < include_depth:
+            include["(@)"] = ["include/level-{}.yml".format(depth + 1)]
+        _write(project_dir, "include/level-{}.yml".format(depth), include)
+
+    # A chain of subprojects, the deepest one holding a single element
+    base_dependencies = []
+    if junction_depth:
+        _generate_junction_chain(project_dir, junction_depth)
+        base_dependencies.append(":".join("junction.bst" for _ in range(junction_depth)) + ":base.bst")
+
+    # Spread the elements over the layers
+    widths = [elements // layers + (1 if layer < elements % layers else 0) for layer in range(layers)]
+    widths = [width for width in widths if width]
+
+    previous = []
+    for layer, width in enumerate(widths):
+        current = []
+        for index in range(width):
+            name = "layer-{}/element-{}.bst".format(layer, index)
+
+            if layer == 0:
+                files = "files/{}/{}".format(layer, index)
+                _write(project_dir, files + "/file", None, content=name)
+                element = {
+                    "kind": "import",
+                    "sources": [{"kind": "local", "path": files}],
+                    "depends": list(base_dependencies),
+                }
+            else:
+                # Pick dependencies spread over the previous layer, such
+                # that elements share some of their dependencies
+                count = min(fan_in, len(previous))
+                step = len(previous) // count
+                depends = {previous[(index + i * step) % len(previous)] for i in range(count)}
+                element = {"kind": "stack", "depends": sorted(depends)}
+
+            if include_depth:
+                element["(@)"] = ["include/level-0.yml"]
+
+            if options:
+                element["variables"] = {
+                    "(?)": [{"option{}".format(i): {"option-{}".format(i): "enabled"}} for i in range(options)]
+                }
+
+            _write(project_dir, "elements/" + name, element)
+            current.append(name)
+
+        previous = current
+
+    _write(project_dir, "elements/target.bst", {"kind": "stack", "depends": previous})
+
+    return "target.bst"
+
+
+# Generates a chain of subprojects, each one with a junction
+# to the next one
+#
+def _generate_junction_chain(project_dir, depth):
+    parent_dir = project_dir
+    for level in range(depth):
+        subproject_path = "subproject-{}".format(level)
+        subproject_dir = os.path.join(parent_dir, subproject_path)
+
+        junction = {"kind": "junction", "sources": [{"kind": "local", "path": subproject_path}]}
+        _write(parent_dir, "elements/junction.bst", junction)
+        _write(
+            subproject_dir,
+            "project.conf",
+            {"name": "subproject-{}".format(level), "min-version": "2.0", "element-path": "elements"},
+        )
+        parent_dir = subproject_dir
+
+    _write(parent_dir, "files/base/base", None, content="base")
+    _write(parent_dir, "elements/base.bst", {"kind": "import", "sources": [{"kind": "local", "path": "files/base"}]})
+
+
+def _write(directory, path, data, *, content=None):
+    fullpath = os.path.join(directory, path)
+    os.makedirs(os.path.dirname(fullpath), exist_ok=True)
+    if data is None:
+        with open(fullpath, "w", encoding="utf-8") as f:
+            f.write(content)
+    else:
+        _yaml.roundtrip_dump(data, fullpath)